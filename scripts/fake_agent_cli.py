@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Fake agent CLI for load tests
+
+Accepts the command line the job executor builds (--print @prompt.md
+--verbose --output-format stream-json --model ...) and writes Claude-style
+stream-json events to stdout at a fixed rate, without calling any model.
+Select it for a model through MODEL_CLI_MAPPING, e.g.
+
+    MODEL_CLI_MAPPING="claude-opus-4=$PWD/scripts/fake_agent_cli.py"
+
+The executor passes its usual flags only, so the output is shaped by
+environment variables (or the equivalent flags when run by hand):
+
+    FAKE_AGENT_EVENTS=200        assistant events to emit
+    FAKE_AGENT_RATE=50           events per second; 0 emits as fast as possible
+    FAKE_AGENT_LINE_BYTES=200    text per assistant event
+    FAKE_AGENT_TOOL_EVERY=10     every n-th event is a tool call and result; 0 disables
+    FAKE_AGENT_PARTIAL=false     precede each message with text deltas, as --include-partial-messages does
+    FAKE_AGENT_SOLUTION=false    write solution.tex to the working directory
+    FAKE_AGENT_EXIT_CODE=0       exit code once done
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+SOLUTION_TEX = """\\documentclass{article}
+\\begin{document}
+\\section{Solution}
+This solution was written by the fake agent CLI.
+\\end{document}
+"""
+
+
+def parse_args(argv=None):
+    env = os.environ.get
+    parser = argparse.ArgumentParser(description="Emit fake agent stream-json events")
+    parser.add_argument("--print", dest="prompt", default="@prompt.md", help="Prompt or @file, as the real CLIs take it")
+    parser.add_argument("--model", default="fake")
+    parser.add_argument("--output-format", default="stream-json")
+    parser.add_argument("--events", type=int, default=int(env("FAKE_AGENT_EVENTS", "200")))
+    parser.add_argument("--rate", type=float, default=float(env("FAKE_AGENT_RATE", "50")))
+    parser.add_argument("--line-bytes", type=int, default=int(env("FAKE_AGENT_LINE_BYTES", "200")))
+    parser.add_argument("--tool-every", type=int, default=int(env("FAKE_AGENT_TOOL_EVERY", "10")))
+    parser.add_argument("--partial", action="store_true", default=env("FAKE_AGENT_PARTIAL", "false").lower() == "true")
+    parser.add_argument("--solution", action="store_true", default=env("FAKE_AGENT_SOLUTION", "false").lower() == "true")
+    parser.add_argument("--exit-code", type=int, default=int(env("FAKE_AGENT_EXIT_CODE", "0")))
+    # --verbose, --disallowedTools and whatever else the real CLIs take are accepted and ignored
+    args, _ = parser.parse_known_args(argv)
+    if args.output_format != "stream-json":
+        parser.error("only --output-format stream-json is supported")
+    return args
+
+
+def text_of_size(index: int, size: int) -> str:
+    prefix = f"Step {index}: "
+    return prefix + "x" * max(size - len(prefix), 0)
+
+
+def events(args):
+    """Yield the events of one fake session, in order"""
+    session_id = f"fake-{os.getpid()}"
+    yield {"type": "system", "subtype": "init", "session_id": session_id, "model": args.model}
+    for index in range(args.events):
+        message_id = f"msg_{index}"
+        if args.tool_every and index % args.tool_every == args.tool_every - 1:
+            tool_id = f"toolu_{index}"
+            yield {"type": "assistant", "message": {"id": message_id, "role": "assistant", "content": [
+                {"type": "tool_use", "id": tool_id, "name": "Write",
+                 "input": {"file_path": "notes.md", "content": text_of_size(index, args.line_bytes)}},
+            ]}, "session_id": session_id}
+            yield {"type": "user", "message": {"role": "user", "content": [
+                {"type": "tool_result", "tool_use_id": tool_id, "content": "File written", "is_error": False},
+            ]}, "session_id": session_id}
+            continue
+        text = text_of_size(index, args.line_bytes)
+        if args.partial:
+            yield {"type": "stream_event", "event": {"type": "message_start", "message": {"id": message_id}}}
+            for start in range(0, len(text), 64):
+                yield {"type": "stream_event", "event": {
+                    "type": "content_block_delta", "index": 0,
+                    "delta": {"type": "text_delta", "text": text[start:start + 64]},
+                }}
+        yield {"type": "assistant", "message": {"id": message_id, "role": "assistant", "content": [
+            {"type": "text", "text": text},
+        ]}, "session_id": session_id}
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if args.prompt.startswith("@"):
+        # Read the prompt like the real CLI would, so a missing file fails the same way
+        Path(args.prompt[1:]).read_text()
+
+    started = time.monotonic()
+    emitted = 0
+    for event in events(args):
+        if event["type"] == "assistant" and args.rate > 0:
+            # Pace against the start time so slow writes don't accumulate drift
+            delay = started + emitted / args.rate - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            emitted += 1
+        sys.stdout.write(json.dumps(event) + "\n")
+        sys.stdout.flush()
+
+    if args.solution:
+        Path("solution.tex").write_text(SOLUTION_TEX)
+
+    duration_ms = int((time.monotonic() - started) * 1000)
+    sys.stdout.write(json.dumps({
+        "type": "result",
+        "subtype": "success" if args.exit_code == 0 else "error",
+        "is_error": args.exit_code != 0,
+        "duration_ms": duration_ms,
+        "num_turns": args.events,
+        "result": "Done",
+    }) + "\n")
+    sys.stdout.flush()
+    return args.exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+End-to-end load test of the scheduler and API
+
+Starts a server on a temporary jobs directory with the fake agent CLI
+(scripts/fake_agent_cli.py) standing in for the model CLI, submits N jobs,
+keeps M dashboard pollers and job-page pollers busy while they run, and
+reports:
+
+- submission-to-start latency (createdAt to startedAt of each job)
+- log ingest throughput (log lines and bytes written per second)
+- API latency per route (p50, p99) as seen by the clients
+- CPU seconds per job of the server process and of the agent processes
+
+Runs offline on one Linux box. Use --output to keep the report as JSON and
+the --max-* options to fail (exit 1) on a regression, e.g.
+
+    uv run python scripts/load_test.py --jobs 50 --pollers 10 --job-pollers 20 \\
+        --output load.json --max-api-p99-ms 250 --max-start-p99 5
+
+With --url the load goes to a server that is already running; start it
+with MODEL_CLI_MAPPING pointing the model at the fake CLI.
+"""
+import argparse
+import asyncio
+import json
+import os
+import secrets
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+PROJECT_ROOT = Path(__file__).parent.parent
+FAKE_AGENT_CLI = Path(__file__).parent / "fake_agent_cli.py"
+# Fields the dashboard asks for in its change feed
+DASHBOARD_FIELDS = "status,model,exercise,createdAt,solutionPdfCreated,solutionTexCreated"
+REPORT_FIELDS = "status,createdAt,startedAt,completedAt,logIngest,resources"
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile, or None without values"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(q / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[float]:
+    """Parse the server's timestamps, e.g. 2025-01-01T00:00:00.000000+00:00Z"""
+    if not value:
+        return None
+    return datetime.fromisoformat(value.removesuffix("Z")).timestamp()
+
+
+def cpu_seconds(pid: int) -> Tuple[float, float]:
+    """CPU seconds of a process itself and of its reaped children"""
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    own = (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+    children = (int(fields[13]) + int(fields[14])) / CLOCK_TICKS
+    return own, children
+
+
+class Latencies:
+    """Client-side request latencies per route"""
+
+    def __init__(self):
+        self.seconds: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    async def request(self, client: httpx.AsyncClient, route: str, method: str, url: str, **kwargs) -> httpx.Response:
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.errors[route] += 1
+            raise
+        self.seconds[route].append(time.perf_counter() - started)
+        if response.status_code >= 400:
+            self.errors[route] += 1
+        return response
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        return {
+            route: {
+                "requests": len(values),
+                "errors": self.errors[route],
+                "p50Ms": round(percentile(values, 50) * 1000, 2),
+                "p99Ms": round(percentile(values, 99) * 1000, 2),
+            }
+            for route, values in sorted(self.seconds.items())
+        }
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(args, jobs_dir: Path) -> Tuple[subprocess.Popen, str]:
+    """Start the API server with the fake agent CLI behind args.model"""
+    port = free_port()
+    env = {
+        **os.environ,
+        "PYTHONPATH": str(PROJECT_ROOT / "src"),
+        "JOBS_DIR": str(jobs_dir),
+        "PDF_CACHE_DIR": str(jobs_dir.parent / "pdf-cache"),
+        "MODEL_CLI_MAPPING": f"{args.model}={FAKE_AGENT_CLI}",
+        "MAX_CONCURRENT_JOBS": str(args.concurrency),
+        "FAKE_AGENT_EVENTS": str(args.events),
+        "FAKE_AGENT_RATE": str(args.rate),
+        "FAKE_AGENT_LINE_BYTES": str(args.line_bytes),
+    }
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "math_agent.main:app",
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=PROJECT_ROOT, env=env,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            if httpx.get(f"{url}/data/models", timeout=1).status_code == 200:
+                return process, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("Server did not start within 30s")
+
+
+async def dashboard_poller(client: httpx.AsyncClient, latencies: Latencies, stop: asyncio.Event, interval: float):
+    """Poll the change feed the way the dashboard does"""
+    seq, etag = 0, None
+    while not stop.is_set():
+        headers = {"If-None-Match": etag} if etag else {}
+        try:
+            response = await latencies.request(client, "GET /jobs/changes", "GET", "/jobs/changes",
+                                               params={"since": seq, "fields": DASHBOARD_FIELDS}, headers=headers)
+            if response.status_code == 200:
+                seq, etag = response.json()["seq"], response.headers.get("ETag")
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(interval)
+
+
+async def job_page_poller(client: httpx.AsyncClient, latencies: Latencies, stop: asyncio.Event, interval: float,
+                          job_name: str, submitted: asyncio.Event):
+    """Follow one job's status and log the way the job page does"""
+    await submitted.wait()
+    cursor, etag = 0, None
+    while not stop.is_set():
+        headers = {"If-None-Match": etag} if etag else {}
+        try:
+            response = await latencies.request(client, "GET /jobs/{job_name}", "GET", f"/jobs/{job_name}",
+                                               params={"since": cursor}, headers=headers)
+            if response.status_code == 200:
+                cursor, etag = response.json()["cursor"], response.headers.get("ETag")
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(interval)
+
+
+async def submit_jobs(client: httpx.AsyncClient, latencies: Latencies, args, job_names: List[str],
+                      exercise: str, submitted: Dict[str, asyncio.Event]) -> List[str]:
+    """Create the jobs; returns the names the server refused"""
+    slots = asyncio.Semaphore(args.submit_concurrency)
+    refused = []
+
+    async def submit(job_name: str):
+        async with slots:
+            response = await latencies.request(client, "POST /jobs/create", "POST", "/jobs/create", json={
+                "name": job_name, "model": args.model, "exercise": exercise, "prompt": "Solve the exercise.",
+            })
+        if response.status_code != 200:
+            refused.append(job_name)
+        submitted[job_name].set()
+
+    await asyncio.gather(*(submit(job_name) for job_name in job_names))
+    return refused
+
+
+async def wait_for_jobs(client: httpx.AsyncClient, job_names: List[str], timeout: float) -> Dict[str, dict]:
+    """Wait until every job has finished; returns the statuses of the run's jobs"""
+    wanted = set(job_names)
+    deadline = time.monotonic() + timeout
+    while True:
+        response = await client.get("/jobs", params={"fields": REPORT_FIELDS})
+        response.raise_for_status()
+        statuses = {name: status for name, status in response.json().items() if name in wanted}
+        finished = [s for s in statuses.values() if s.get("status") in ("completed", "error", "cancelled")]
+        if len(finished) == len(wanted) or time.monotonic() > deadline:
+            return statuses
+        await asyncio.sleep(0.5)
+
+
+def build_report(args, statuses: Dict[str, dict], latencies: Latencies, refused: List[str],
+                 wall_seconds: float, cpu: Optional[Tuple[float, float]]) -> dict:
+    counts: Dict[str, int] = defaultdict(int)
+    for status in statuses.values():
+        counts[status.get("status", "unknown")] += 1
+
+    start_latencies = []
+    started, finished = [], []
+    lines = bytes_ = 0
+    agent_cpu = []
+    for status in statuses.values():
+        created_at, started_at = parse_timestamp(status.get("createdAt")), parse_timestamp(status.get("startedAt"))
+        if created_at is not None and started_at is not None:
+            start_latencies.append(started_at - created_at)
+            started.append(started_at)
+        completed_at = parse_timestamp(status.get("completedAt"))
+        if completed_at is not None:
+            finished.append(completed_at)
+        ingest = status.get("logIngest") or {}
+        lines += ingest.get("lines", 0)
+        bytes_ += ingest.get("bytes", 0)
+        agent = (status.get("resources") or {}).get("agent")
+        if agent:
+            agent_cpu.append(agent.get("cpuUserSeconds", 0.0) + agent.get("cpuSystemSeconds", 0.0))
+
+    ingest_seconds = max(finished) - min(started) if started and finished else 0.0
+    jobs = len(statuses) or 1
+    report = {
+        "config": {
+            "jobs": args.jobs, "pollers": args.pollers, "jobPollers": args.job_pollers,
+            "pollInterval": args.poll_interval, "concurrency": args.concurrency,
+            "events": args.events, "rate": args.rate, "lineBytes": args.line_bytes,
+        },
+        "jobs": {"submitted": args.jobs - len(refused), "refused": len(refused), **counts,
+                 "wallSeconds": round(wall_seconds, 3)},
+        "startLatency": {
+            "p50": _round(percentile(start_latencies, 50)),
+            "p99": _round(percentile(start_latencies, 99)),
+            "max": _round(max(start_latencies, default=None)),
+        },
+        "logIngest": {
+            "lines": lines,
+            "bytes": bytes_,
+            "linesPerSecond": round(lines / ingest_seconds, 1) if ingest_seconds > 0 else 0.0,
+            "bytesPerSecond": round(bytes_ / ingest_seconds, 1) if ingest_seconds > 0 else 0.0,
+        },
+        "api": latencies.summary(),
+        "cpu": {
+            "agentSecondsPerJob": _round(sum(agent_cpu) / len(agent_cpu) if agent_cpu else None),
+        },
+    }
+    if cpu is not None:
+        report["cpu"]["serverSecondsPerJob"] = _round(cpu[0] / jobs)
+    return report
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 4) if value is not None else None
+
+
+def check_limits(args, report: dict) -> List[str]:
+    """Regressions against the --max-* options"""
+    violations = []
+    if report["jobs"]["refused"] or report["jobs"].get("completed", 0) != report["jobs"]["submitted"]:
+        violations.append(f"Not every job completed: {report['jobs']}")
+    for route, summary in report["api"].items():
+        if args.max_api_p99_ms is not None and summary["p99Ms"] > args.max_api_p99_ms:
+            violations.append(f"{route} p99 {summary['p99Ms']}ms > {args.max_api_p99_ms}ms")
+    start_p99 = report["startLatency"]["p99"]
+    if args.max_start_p99 is not None and start_p99 is not None and start_p99 > args.max_start_p99:
+        violations.append(f"Start latency p99 {start_p99}s > {args.max_start_p99}s")
+    server_cpu = report["cpu"].get("serverSecondsPerJob")
+    if args.max_server_cpu_per_job is not None and server_cpu is not None and server_cpu > args.max_server_cpu_per_job:
+        violations.append(f"Server CPU {server_cpu}s per job > {args.max_server_cpu_per_job}s")
+    return violations
+
+
+def print_report(report: dict):
+    jobs = report["jobs"]
+    print(f"Jobs: {jobs}")
+    print("Start latency (s): " + ", ".join(f"{k} {v}" for k, v in report["startLatency"].items()))
+    ingest = report["logIngest"]
+    print(f"Log ingest: {ingest['lines']} lines, {ingest['linesPerSecond']} lines/s, {ingest['bytesPerSecond']} B/s")
+    print(f"CPU per job (s): {report['cpu']}")
+    print(f"{'Route':<24} {'requests':>9} {'errors':>7} {'p50 ms':>9} {'p99 ms':>9}")
+    for route, summary in report["api"].items():
+        print(f"{route:<24} {summary['requests']:>9} {summary['errors']:>7} {summary['p50Ms']:>9} {summary['p99Ms']:>9}")
+
+
+async def run(args, url: str, server_pid: Optional[int]) -> dict:
+    run_id = secrets.token_hex(3)
+    job_names = [f"load-{run_id}-{i:04d}" for i in range(args.jobs)]
+    latencies = Latencies()
+    stop = asyncio.Event()
+    submitted = {job_name: asyncio.Event() for job_name in job_names}
+    limits = httpx.Limits(max_connections=args.pollers + args.job_pollers + args.submit_concurrency + 1)
+
+    async with httpx.AsyncClient(base_url=url, timeout=60, limits=limits) as client:
+        exercise = args.exercise
+        if exercise is None:
+            exercises = (await client.get("/data/exercises")).json()
+            if not exercises:
+                raise RuntimeError("No exercises in data/exercises; pass --exercise")
+            exercise = exercises[0]
+
+        cpu_before = cpu_seconds(server_pid) if server_pid else None
+        started = time.monotonic()
+        pollers = [asyncio.create_task(dashboard_poller(client, latencies, stop, args.poll_interval))
+                   for _ in range(args.pollers)]
+        pollers += [
+            asyncio.create_task(job_page_poller(client, latencies, stop, args.poll_interval,
+                                                job_names[i % len(job_names)], submitted[job_names[i % len(job_names)]]))
+            for i in range(args.job_pollers if job_names else 0)
+        ]
+        refused = await submit_jobs(client, latencies, args, job_names, exercise, submitted)
+        statuses = await wait_for_jobs(client, job_names, args.timeout)
+        wall_seconds = time.monotonic() - started
+        stop.set()
+        await asyncio.gather(*pollers)
+        cpu_after = cpu_seconds(server_pid) if server_pid else None
+
+    cpu = None
+    if cpu_before is not None and cpu_after is not None:
+        cpu = (cpu_after[0] - cpu_before[0], cpu_after[1] - cpu_before[1])
+    return build_report(args, statuses, latencies, refused, wall_seconds, cpu)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="End-to-end load test with the fake agent CLI")
+    parser.add_argument("--jobs", type=int, default=50, help="Jobs to submit")
+    parser.add_argument("--pollers", type=int, default=5, help="Dashboard pollers")
+    parser.add_argument("--job-pollers", type=int, default=10, help="Job page pollers, spread over the jobs")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds between polls of each poller")
+    parser.add_argument("--submit-concurrency", type=int, default=8, help="Job submissions in flight")
+    parser.add_argument("--concurrency", type=int, default=50, help="MAX_CONCURRENT_JOBS of the started server")
+    parser.add_argument("--model", default="claude-opus-4", help="Model mapped to the fake CLI")
+    parser.add_argument("--exercise", help="Exercise for every job (default: the first one)")
+    parser.add_argument("--events", type=int, default=200, help="Assistant events per fake agent run")
+    parser.add_argument("--rate", type=float, default=50, help="Events per second per fake agent; 0 is unthrottled")
+    parser.add_argument("--line-bytes", type=int, default=200, help="Text bytes per event")
+    parser.add_argument("--timeout", type=float, default=600, help="Seconds to wait for the jobs to finish")
+    parser.add_argument("--url", help="Load an already running server instead of starting one")
+    parser.add_argument("--server-pid", type=int, help="PID of the --url server, for CPU accounting")
+    parser.add_argument("--keep", action="store_true", help="Keep the temporary jobs directory")
+    parser.add_argument("--output", type=Path, help="Write the report as JSON")
+    parser.add_argument("--max-api-p99-ms", type=float, help="Fail if any route's p99 latency exceeds this")
+    parser.add_argument("--max-start-p99", type=float, help="Fail if the p99 submission-to-start latency (s) exceeds this")
+    parser.add_argument("--max-server-cpu-per-job", type=float, help="Fail if server CPU seconds per job exceed this")
+    args = parser.parse_args()
+
+    workdir = None
+    server = None
+    try:
+        if args.url:
+            url, server_pid = args.url, args.server_pid
+        else:
+            workdir = Path(tempfile.mkdtemp(prefix="math-agent-load-"))
+            server, url = start_server(args, workdir / "jobs")
+            server_pid = server.pid
+        report = asyncio.run(run(args, url, server_pid))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+        if workdir is not None:
+            if args.keep:
+                print(f"Jobs kept in {workdir / 'jobs'}")
+            else:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(report)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+
+    violations = check_limits(args, report)
+    for violation in violations:
+        print(f"FAIL: {violation}")
+    return 1 if violations else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,31 +1,29 @@
 """Data management routes"""
 import logging
+from typing import Optional
 
 from fastapi import APIRouter, HTTPException
 
 from ...core.models import PromptSaveRequest
-from ...config import EXERCISES_DIR, PROMPTS_DIR
+from ...config import PROMPTS_DIR
+from ...app_state import exercise_catalog
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/data", tags=["data"])
 
 
 @router.get("/exercises")
-async def list_exercises():
-    """List available exercises"""
-    exercises = []
+async def list_exercises(course: Optional[str] = None, sheet: Optional[int] = None, details: bool = False):
+    """
+    List available exercises, optionally of one course and/or sheet.
     
-    if EXERCISES_DIR.exists():
-        try:
-            for course_dir in sorted(EXERCISES_DIR.iterdir()):
-                if course_dir.is_dir():
-                    for exercise_file in sorted(course_dir.glob("*.tex")):
-                        exercises.append(f"{course_dir.name}/{exercise_file.stem}")
-        except Exception as e:
-            logger.error(f"Failed to list exercises: {e}")
-            # Return what we have so far instead of crashing
-    
-    return exercises
+    Returns "course/exercise" ids, or with details=true their metadata
+    (course, name, sheet, number, digest, size).
+    """
+    exercises = exercise_catalog.list(course=course, sheet=sheet)
+    if details:
+        return [exercise.to_dict() for exercise in exercises]
+    return [exercise.id for exercise in exercises]
 
 
 @router.get("/models")
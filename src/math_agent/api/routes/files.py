@@ -0,0 +1,67 @@
+"""Job file routes that need more than the static /jobfiles mount"""
+import gzip
+import logging
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse, StreamingResponse
+
+from ...config import JOBS_DIR
+from ...services.job_log import ARCHIVE_SUFFIX, resolve_log
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/jobfiles", tags=["files"])
+
+LOG_MEDIA_TYPE = "application/x-ndjson"
+
+
+@router.get("/{job_name}/log.jsonl")
+async def get_job_log(job_name: str, request: Request):
+    """
+    Download a job's log, whether or not it has been archived.
+
+    Archived logs are sent compressed as-is to clients that accept gzip
+    and decompressed on the fly for the others.
+    """
+    if "/" in job_name or job_name in (".", ".."):
+        raise HTTPException(status_code=404, detail="Log not found")
+    
+    path = resolve_log(JOBS_DIR / job_name / "log.jsonl")
+    if path is None:
+        raise HTTPException(status_code=404, detail="Log not found")
+    
+    if not path.name.endswith(ARCHIVE_SUFFIX):
+        return FileResponse(path, media_type=LOG_MEDIA_TYPE)
+    
+    headers = {"Vary": "Accept-Encoding"}
+    if _accepts_gzip(request.headers.get("accept-encoding", "")):
+        headers["Content-Encoding"] = "gzip"
+        return FileResponse(path, media_type=LOG_MEDIA_TYPE, headers=headers)
+    
+    def decompress():
+        # Sync generator: Starlette iterates it in a worker thread
+        with gzip.open(path, 'rb') as f:
+            while chunk := f.read(1 << 16):
+                yield chunk
+    
+    return StreamingResponse(decompress(), media_type=LOG_MEDIA_TYPE, headers=headers)
+
+
+def _accepts_gzip(accept_encoding: str) -> bool:
+    """Check whether an Accept-Encoding header allows gzip, honouring q-values"""
+    qualities = {}
+    for item in accept_encoding.split(","):
+        coding, *params = [part.strip() for part in item.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding:
+            qualities[coding.lower()] = quality
+    for coding in ("gzip", "x-gzip", "*"):
+        if coding in qualities:
+            return qualities[coding] > 0
+    return False
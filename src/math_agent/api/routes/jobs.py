@@ -1,54 +1,383 @@
 """Job management routes"""
+import asyncio
+import hashlib
 import json
 import logging
+import secrets
+import shutil
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime, timezone
 from base64 import b64decode
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
 
-from ...core.models import JobCreateRequest, JobStatusEnum
-from ...core.utils import atomic_write_json
-from ...config import JOBS_DIR, DATA_DIR, PROMPTS_DIR
-from ...app_state import job_manager
+from ...core.models import JobCreateRequest, JobBatchRequest, JobStatusEnum, ACTIVE_STATUSES, FINISHED_STATUSES
+from ...core.utils import atomic_write_json, fsync_paths
+from ...config import (
+    JOBS_DIR, PROMPTS_DIR, LOG_STREAM_KEEPALIVE, MAX_BATCH_JOBS, MAX_UPLOAD_BYTES, MAX_UPLOAD_FILE_BYTES,
+)
+from ...services.resources import summarize_usage
+from ...services.upload import MultipartUpload, UploadError, UploadTooLarge
+from ...services.job_log import log_size, read_log_entries, resolve_log
+from ...app_state import blob_store, exercise_catalog, job_index, job_manager, log_hub
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/jobs", tags=["jobs"])
 
+# Distinguishes ETags issued by this process from those of earlier runs
+_ETAG_EPOCH = secrets.token_hex(4)
+
 
 @router.get("")
-async def list_jobs():
-    """List all jobs with their status"""
-    jobs = {}
-    
-    if JOBS_DIR.exists():
-        for job_dir in JOBS_DIR.iterdir():
-            if job_dir.is_dir():
-                status_file = job_dir / "status.json"
-                if status_file.exists():
+async def list_jobs(
+    request: Request,
+    response: Response,
+    status: Optional[str] = Query(None, description="Comma-separated statuses"),
+    model: Optional[str] = None,
+    exercise: Optional[str] = None,
+    sweep: Optional[str] = None,
+    created_after: Optional[str] = Query(None, description="Inclusive ISO 8601 lower bound on createdAt"),
+    created_before: Optional[str] = Query(None, description="Exclusive ISO 8601 upper bound on createdAt"),
+    sort: str = Query("-createdAt", description="Field to sort by, prefixed with - for descending"),
+    limit: Optional[int] = Query(None, ge=1),
+    offset: int = Query(0, ge=0),
+    fields: Optional[str] = Query(None, description="Comma-separated status fields to return"),
+):
+    """
+    List jobs with their status, newest first.
+
+    Filters, sorting and pagination are answered by the job catalog. The
+    number of matching jobs before pagination is returned in the
+    X-Total-Count header. The ETag is the catalog's change sequence
+    number plus a digest of the query, so an unchanged listing is answered
+    with 304 Not Modified without querying the catalog.
+    """
+    statuses = sorted(set(status.split(","))) if status else []
+    etag = _etag(job_index.seq(), _query_digest(
+        status=statuses, model=model, exercise=exercise, sweep=sweep,
+        created_after=created_after, created_before=created_before,
+        sort=sort, limit=limit, offset=offset, fields=fields,
+    ))
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    
+    try:
+        total, jobs = job_index.query(
+            statuses=statuses,
+            model=model,
+            exercise=exercise,
+            sweep=sweep,
+            created_after=created_after,
+            created_before=created_before,
+            sort=sort,
+            limit=limit,
+            offset=offset,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    response.headers["X-Total-Count"] = str(total)
+    return {name: _project(job, fields) for name, job in jobs}
+
+
+@router.get("/changes")
+async def list_job_changes(
+    request: Request,
+    response: Response,
+    since: int = Query(0, ge=0),
+    fields: Optional[str] = Query(None, description="Comma-separated status fields to return"),
+):
+    """
+    List jobs created, changed or removed since a change sequence number.
+
+    Pass the returned seq as `since` on the next call. Removed jobs map to
+    null. If `since` is ahead of the server (e.g. its catalog was rebuilt),
+    every job is returned with reset set, and the client should replace
+    its state instead of merging. Supports If-None-Match like GET /jobs.
+    """
+    etag = _etag(since, job_index.seq(), _query_digest(fields=fields))
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    
+    seq, changes = job_index.changes(since)
+    reset = since > seq
+    if reset:
+        seq, changes = job_index.changes(0)
+    
+    return {
+        "seq": seq,
+        "reset": reset,
+        "changes": {name: _project(job, fields) if job is not None else None for name, job in changes}
+    }
+
+
+@router.get("/resources")
+async def get_resource_usage(group_by: str = Query("model", pattern="^(model|exercise|sweep)$")):
+    """CPU, memory, I/O and wall time of agent and compile phases, aggregated per model, exercise or sweep"""
+    return {"groupBy": group_by, "groups": summarize_usage(job_index.all(), group_by)}
+
+
+@router.post("/batch")
+async def create_batch(request: JobBatchRequest):
+    """
+    Create a sweep: one job per model × exercise × prompt × replicate.
+
+    Each exercise and prompt is read and stored in the blob store once,
+    workspaces only link to them, metadata is written without per-file
+    fsync and synced once, and the jobs are queued together. Nothing is
+    created if any job name is invalid or taken.
+    """
+    if not request.models or not request.exercises or not request.prompts or request.replicates < 1:
+        raise HTTPException(status_code=400, detail="Models, exercises, prompts and replicates must not be empty")
+    
+    total = len(request.models) * len(request.exercises) * len(request.prompts) * request.replicates
+    if total > MAX_BATCH_JOBS:
+        raise HTTPException(status_code=400, detail=f"Batch of {total} jobs exceeds limit of {MAX_BATCH_JOBS}")
+    
+    sweep_id = request.sweep or f"sweep-{datetime.now(timezone.utc):%Y%m%d-%H%M%S}-{secrets.token_hex(2)}"
+    if not _is_valid_name(sweep_id):
+        raise HTTPException(status_code=400, detail="Invalid sweep id")
+    
+    # Look up every exercise and read every prompt once
+    exercises = {}
+    for exercise in request.exercises:
+        exercise_parts = exercise.split("/")
+        if len(exercise_parts) != 2:
+            raise HTTPException(status_code=400, detail=f"Invalid exercise format: {exercise}")
+        catalog_entry = exercise_catalog.get(exercise)
+        if catalog_entry is None:
+            raise HTTPException(status_code=404, detail=f"Exercise not found: {exercise}")
+        course, exercise_name = exercise_parts
+        exercises[exercise] = (course, exercise_name, blob_store.put(catalog_entry.content, catalog_entry.digest))
+    
+    prompts = {}
+    for prompt_index, prompt in enumerate(request.prompts):
+        if prompt.startswith("@"):
+            prompt_name = prompt[1:]
+            prompt_file = PROMPTS_DIR / f"{prompt_name}.md"
+            if not prompt_file.exists():
+                raise HTTPException(status_code=404, detail=f"Prompt not found: {prompt_name}")
+            prompts[prompt] = (prompt_name, blob_store.put(prompt_file.read_bytes()))
+        else:
+            prompts[prompt] = (f"p{prompt_index + 1}", blob_store.put(prompt.encode()))
+    
+    # Expand the matrix and validate every name before touching the disk
+    jobs = []
+    for model in request.models:
+        for exercise, (course, exercise_name, exercise_digest) in exercises.items():
+            for prompt_label, prompt_digest in prompts.values():
+                for replicate in range(1, request.replicates + 1):
                     try:
-                        with open(status_file, 'r') as f:
-                            jobs[job_dir.name] = json.load(f)
-                    except (FileNotFoundError, json.JSONDecodeError) as e:
-                        logger.error(f"Failed to read status for {job_dir.name}: {e}")
-                        # Skip this job instead of crashing
+                        name = request.nameTemplate.format(
+                            sweep=sweep_id, model=model, course=course, exercise=exercise_name,
+                            prompt=prompt_label, replicate=replicate, index=len(jobs)
+                        )
+                    except (KeyError, IndexError, ValueError) as e:
+                        raise HTTPException(status_code=400, detail=f"Invalid name template: {e}")
+                    jobs.append({
+                        "name": name,
+                        "model": model,
+                        "exercise": exercise,
+                        "inputs": {f"{exercise_name}.tex": exercise_digest, "prompt.md": prompt_digest},
+                    })
+    
+    names = [job["name"] for job in jobs]
+    invalid = [name for name in names if not _is_valid_name(name)]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Invalid job names: {invalid[:10]}")
+    if len(set(names)) != len(names):
+        raise HTTPException(status_code=400, detail="Name template produces duplicate job names")
+    existing = [name for name in names if (JOBS_DIR / name).exists()]
+    if existing:
+        raise HTTPException(status_code=409, detail=f"Jobs already exist: {existing[:10]}")
+    
+    created_at = datetime.now(timezone.utc).isoformat() + "Z"
+    try:
+        statuses = await asyncio.to_thread(
+            _write_batch_jobs, jobs, sweep_id, created_at, request.disallowedTools
+        )
+    except FileExistsError as e:
+        # Created by someone else between the check above and the write
+        raise HTTPException(status_code=409, detail=f"Job already exists: {Path(e.filename).name}")
+    except Exception as e:
+        logger.error(f"Failed to create sweep {sweep_id}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to create sweep jobs")
+    
+    job_index.update_many(statuses)
+    
+    # Queue the whole sweep at once
+    await job_manager.submit_jobs(names)
+    
+    return {"message": "Sweep created successfully", "sweep": sweep_id, "job_names": names}
+
+
+def _write_batch_jobs(jobs: List[Dict[str, Any]], sweep_id: str, created_at: str,
+                      disallowed_tools: Optional[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Write workspaces, status and log for a sweep, syncing once at the end.
+
+    Either every job is created or, if one fails (e.g. its directory was
+    created concurrently), none: the directories written so far are removed.
+    """
+    statuses = {}
+    created = []
+    try:
+        for job in jobs:
+            job_dir = JOBS_DIR / job["name"]
+            job_dir.mkdir()
+            created.append(job_dir)
+            workspace_dir = job_dir / "workspace"
+            workspace_dir.mkdir()
+            _link_inputs(workspace_dir, job["inputs"])
+            
+            status = {
+                "status": JobStatusEnum.SETUP.value,
+                "createdAt": created_at,
+                "model": job["model"],
+                "exercise": job["exercise"],
+                "disallowedTools": disallowed_tools,
+                "sweep": sweep_id,
+                "inputs": job["inputs"]
+            }
+            atomic_write_json(job_dir / "status.json", status, fsync=False)
+            _write_creation_log(job_dir, status)
+            statuses[job["name"]] = status
+        
+        # Flush the sweep's files and directory entries once, after all writes were issued
+        fsync_paths(
+            path for job_dir in created
+            for path in (job_dir / "status.json", job_dir / "log.jsonl", job_dir / "workspace", job_dir)
+        )
+        fsync_paths([JOBS_DIR])
+    except BaseException:
+        for job_dir in created:
+            shutil.rmtree(job_dir, ignore_errors=True)
+        raise
+    return statuses
+
+
+def _link_inputs(workspace_dir: Path, inputs: Dict[str, str]) -> None:
+    """Place exercise and prompt inputs from the blob store; the agent only reads them"""
+    for filename, digest in inputs.items():
+        blob_store.materialize(digest, workspace_dir / filename, read_only=True)
+
+
+@router.get("/sweeps/{sweep_id}")
+async def get_sweep(sweep_id: str):
+    """Get the status of every job in a sweep, with counts per status"""
+    jobs = _sweep_jobs(sweep_id)
     
+    counts: Dict[str, int] = {}
+    for status in jobs.values():
+        counts[status["status"]] = counts.get(status["status"], 0) + 1
+    
+    return {"sweep": sweep_id, "counts": counts, "jobs": jobs}
+
+
+@router.post("/sweeps/{sweep_id}/cancel")
+async def cancel_sweep(sweep_id: str):
+    """Cancel every queued or running job in a sweep"""
+    jobs = _sweep_jobs(sweep_id)
+    
+    cancelled = []
+    for job_name, status in jobs.items():
+        if status["status"] in ACTIVE_STATUSES:
+            await _cancel(job_name, status)
+            cancelled.append(job_name)
+    
+    return {"message": f"Cancelled {len(cancelled)} jobs", "cancelled": cancelled}
+
+
+def _sweep_jobs(sweep_id: str) -> Dict[str, Dict[str, Any]]:
+    _, jobs = job_index.query(sweep=sweep_id, sort="name")
+    jobs = dict(jobs)
+    if not jobs:
+        raise HTTPException(status_code=404, detail="Sweep not found")
     return jobs
 
 
+def _etag(*parts: Any) -> str:
+    """Build a weak ETag; the process epoch keeps tags from before a restart from matching"""
+    return 'W/"' + "-".join(str(part) for part in (_ETAG_EPOCH, *parts)) + '"'
+
+
+def _query_digest(**params: Any) -> str:
+    """Short digest of normalized query parameters, so each distinct query gets its own ETag"""
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def _not_modified(request: Request, etag: str) -> bool:
+    """Check If-None-Match against an ETag, using weak comparison"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag.removeprefix("W/") in {tag.strip().removeprefix("W/") for tag in header.split(",")}
+
+
+def _stat_signature(path: Path) -> Optional[Tuple[int, int]]:
+    """Get a file's (mtime in nanoseconds, size), or None if it is missing"""
+    try:
+        st = path.stat()
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def _project(job: Dict[str, Any], fields: Optional[str]) -> Dict[str, Any]:
+    """Keep only the requested comma-separated status fields"""
+    if not fields:
+        return job
+    return {key: job[key] for key in fields.split(",") if key in job}
+
+
+# Paths of collection routes, which /jobs/{job_name} can never reach
+_RESERVED_NAMES = {"batch", "changes", "resources", "sweeps"}
+
+
+def _is_valid_name(name: str) -> bool:
+    # Dot names are reserved for the jobs directory's own files, e.g. .blobs
+    return (bool(name) and "/" not in name and "\\" not in name and not name.startswith(".")
+            and name not in _RESERVED_NAMES)
+
+
 @router.get("/{job_name}")
-async def get_job_details(job_name: str):
-    """Get job status and log"""
+async def get_job_details(job_name: str, request: Request, response: Response,
+                          since: int = Query(0, ge=0)):
+    """
+    Get job status and log.
+
+    Pass the returned cursor as `since` on the next call to receive only
+    the log entries appended in between. The ETag is derived from the
+    status and log file sizes and mtimes, so an unchanged job is answered
+    with 304 Not Modified without reading either file.
+    """
     job_dir = JOBS_DIR / job_name
     
     if not job_dir.exists():
         raise HTTPException(status_code=404, detail="Job not found")
     
-    # Read status
     status_file = job_dir / "status.json"
-    if not status_file.exists():
+    log_file = job_dir / "log.jsonl"
+    status_stat = _stat_signature(status_file)
+    if status_stat is None:
         raise HTTPException(status_code=404, detail="Job status not found")
     
+    log_path = resolve_log(log_file)
+    etag = _etag(since, *status_stat, *(_stat_signature(log_path) if log_path else ()))
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    
+    # Read status
     try:
         with open(status_file, 'r') as f:
             status = json.load(f)
@@ -56,40 +385,176 @@ async def get_job_details(job_name: str):
         logger.error(f"Failed to read status for {job_name}: {e}")
         raise HTTPException(status_code=500, detail="Failed to read job status")
     
-    # Read log entries
-    log_file = job_dir / "log.jsonl"
-    log_entries = []
-    
-    if log_file.exists():
-        with open(log_file, 'r') as f:
-            for line in f:
-                if line.strip():
-                    try:
-                        log_entries.append(json.loads(line))
-                    except json.JSONDecodeError:
-                        # Handle malformed log entries
-                        log_entries.append({
-                            "type": "system",
-                            "content": f"Malformed log entry: {line[:100]}..."
-                        })
+    # Read log entries after the cursor; start over if the log shrank
+    reset = since > log_size(log_file)
+    if reset:
+        since = 0
+    log_entries, cursor = read_log_entries(log_file, since)
     
     return {
         "status": status,
-        "log": log_entries
+        "log": log_entries,
+        "cursor": cursor,
+        "reset": reset
     }
 
 
+@router.get("/{job_name}/stream")
+async def stream_job(job_name: str, request: Request, since: int = Query(0, ge=0)):
+    """
+    Stream job status and log as Server-Sent Events.
+
+    Sends the log entries already on disk after `since` (or the
+    Last-Event-ID of a reconnecting client), then live entries as the
+    executor produces them. Event ids are log cursors.
+    """
+    job_dir = JOBS_DIR / job_name
+    
+    if not job_dir.exists():
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    last_event_id = request.headers.get("last-event-id", "")
+    if last_event_id.isdigit():
+        since = int(last_event_id)
+    
+    async def event_stream():
+        # Subscribe before reading the disk so no entry falls in between
+        subscription = log_hub.subscribe(job_name)
+        try:
+            status = job_index.get(job_name)
+            if status is None:
+                yield _sse("end", {"reason": "not_found"})
+                return
+            yield _sse("status", status)
+            
+            log_file = job_dir / "log.jsonl"
+            cursor = since if since <= log_size(log_file) else 0
+            entries, cursor = read_log_entries(log_file, cursor)
+            if entries:
+                yield _sse("log", entries, cursor)
+            
+            if status["status"] in FINISHED_STATUSES:
+                yield _sse("end", {"reason": "finished"})
+                return
+            
+            while True:
+                event = await subscription.get(timeout=LOG_STREAM_KEEPALIVE)
+                if event is None:
+                    # Catch status changes made outside this process
+                    status = job_index.get(job_name)
+                    if status is not None and status["status"] in FINISHED_STATUSES:
+                        entries, cursor = read_log_entries(log_file, cursor)
+                        if entries:
+                            yield _sse("log", entries, cursor)
+                        yield _sse("status", status)
+                        yield _sse("end", {"reason": "finished"})
+                        return
+                    # Comment line keeps proxies from closing an idle stream
+                    yield ": keepalive\n\n"
+                    continue
+                if event.event == "log":
+                    if event.offset <= cursor:
+                        continue  # Already sent from disk
+                    cursor = event.offset
+                yield _sse(event.event, event.data, event.offset)
+                if event.event == "end":
+                    return
+        finally:
+            log_hub.unsubscribe(subscription)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _sse(event: str, data, event_id: Optional[int] = None) -> str:
+    """Format one Server-Sent Event"""
+    message = f"event: {event}\n"
+    if event_id is not None:
+        message += f"id: {event_id}\n"
+    return message + f"data: {json.dumps(data)}\n\n"
+
+
 @router.post("/create")
 async def create_job(request: JobCreateRequest):
     """Create a new job"""
-    # Validate job name
-    if not request.name or "/" in request.name or "\\" in request.name:
+    _check_new_job_name(request.name)
+    
+    # Store additional files
+    attachments = {}
+    if request.additionalFiles:
+        for filename, content_b64 in request.additionalFiles.items():
+            try:
+                attachments[filename] = blob_store.put(b64decode(content_b64))
+            except Exception as e:
+                # Log error properly instead of print
+                logger.error(f"Failed to save file {filename}: {e}")
+                # Continue processing other files
+    
+    return await _create_job(request, attachments)
+
+
+@router.post("/upload")
+async def create_job_upload(request: Request):
+    """
+    Create a new job from a multipart/form-data request.
+
+    Takes the JobCreateRequest fields as form fields and attachments as file
+    parts. Attachments are streamed into the blob store chunk by chunk
+    instead of arriving as base64 in memory. Sending the fields before the
+    files gets a taken job name rejected before any file is transferred.
+    """
+    def check_field(name: str, value: str):
+        if name == "name":
+            _check_new_job_name(value)
+    
+    try:
+        upload = MultipartUpload(request.headers.get("content-type", ""), blob_store,
+                                 max_file_bytes=MAX_UPLOAD_FILE_BYTES, max_bytes=MAX_UPLOAD_BYTES,
+                                 on_field=check_field)
+    except UploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        async for chunk in request.stream():
+            await asyncio.to_thread(upload.feed, chunk)
+        upload.finish()
+    except UploadTooLarge as e:
+        upload.abort()
+        raise HTTPException(status_code=413, detail=str(e))
+    except UploadError as e:
+        upload.abort()
+        raise HTTPException(status_code=400, detail=str(e))
+    except BaseException:
+        upload.abort()
+        raise
+    
+    fields = {key: value for key, value in upload.fields.items() if key in JobCreateRequest.model_fields}
+    fields.pop("additionalFiles", None)
+    try:
+        job_request = JobCreateRequest(**fields)
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+    
+    return await _create_job(job_request, upload.files)
+
+
+def _check_new_job_name(name: str) -> None:
+    """Reject invalid and taken job names"""
+    if not _is_valid_name(name):
         raise HTTPException(status_code=400, detail="Invalid job name")
     
     # Check if job already exists
-    job_dir = JOBS_DIR / request.name
-    if job_dir.exists():
+    if (JOBS_DIR / name).exists():
         raise HTTPException(status_code=409, detail="Job already exists")
+
+
+async def _create_job(request: JobCreateRequest, attachments: Dict[str, str]) -> Dict[str, str]:
+    """Create a job's workspace from stored attachments, write its status and queue it"""
+    _check_new_job_name(request.name)
+    job_dir = JOBS_DIR / request.name
     
     # Create job directory
     try:
@@ -106,15 +571,15 @@ async def create_job(request: JobCreateRequest):
         raise HTTPException(status_code=400, detail="Invalid exercise format")
     
     course, exercise_name = exercise_parts
-    exercises_dir = DATA_DIR / "exercises"
-    exercise_file = exercises_dir / course / f"{exercise_name}.tex"
-    
-    if not exercise_file.exists():
+    exercise = exercise_catalog.get(request.exercise)
+    if exercise is None:
         raise HTTPException(status_code=404, detail="Exercise not found")
     
-    # Copy exercise to workspace
+    # Link exercise into workspace
+    inputs = {}
     try:
-        (workspace_dir / f"{exercise_name}.tex").write_text(exercise_file.read_text())
+        inputs[f"{exercise_name}.tex"] = blob_store.put(exercise.content, exercise.digest)
+        _link_inputs(workspace_dir, inputs)
     except Exception as e:
         logger.error(f"Failed to copy exercise file: {e}")
         raise HTTPException(status_code=500, detail="Failed to copy exercise file")
@@ -129,23 +594,22 @@ async def create_job(request: JobCreateRequest):
             raise HTTPException(status_code=404, detail="Prompt not found")
         prompt_content = prompt_file.read_text()
     
-    # Save prompt to workspace
+    # Link prompt into workspace
     try:
-        (workspace_dir / "prompt.md").write_text(prompt_content)
+        inputs["prompt.md"] = blob_store.put(prompt_content.encode())
+        blob_store.materialize(inputs["prompt.md"], workspace_dir / "prompt.md", read_only=True)
     except Exception as e:
         logger.error(f"Failed to save prompt: {e}")
         raise HTTPException(status_code=500, detail="Failed to save prompt")
     
-    # Save additional files
-    if request.additionalFiles:
-        for filename, content_b64 in request.additionalFiles.items():
-            try:
-                content = b64decode(content_b64)
-                (workspace_dir / filename).write_bytes(content)
-            except Exception as e:
-                # Log error properly instead of print
-                logger.error(f"Failed to save file {filename}: {e}")
-                # Continue processing other files
+    # Copy additional files, which the agent may edit
+    for filename, digest in attachments.items():
+        try:
+            blob_store.materialize(digest, workspace_dir / filename)
+            inputs[filename] = digest
+        except Exception as e:
+            logger.error(f"Failed to save file {filename}: {e}")
+            # Continue processing other files
     
     # Create initial status
     status = {
@@ -153,25 +617,31 @@ async def create_job(request: JobCreateRequest):
         "createdAt": datetime.now(timezone.utc).isoformat() + "Z",
         "model": request.model,
         "exercise": request.exercise,
-        "disallowedTools": request.disallowedTools
+        "disallowedTools": request.disallowedTools,
+        "inputs": inputs
     }
     
-    atomic_write_json(job_dir / "status.json", status)
+    job_index.write(request.name, status)
     
     # Create initial log entry
+    _write_creation_log(job_dir, status)
+    
+    # Queue the job for execution
+    await job_manager.submit_job(request.name)
+    
+    return {"message": "Job created successfully", "job_name": request.name}
+
+
+def _write_creation_log(job_dir: Path, status: Dict[str, Any]) -> None:
+    """Start a job's log with its creation entry"""
     log_entry = {
         "timestamp": status["createdAt"],
         "type": "system",
-        "content": f"Job created with model {request.model} for exercise {request.exercise}"
+        "content": f"Job created with model {status['model']} for exercise {status['exercise']}"
     }
     
     with open(job_dir / "log.jsonl", 'w') as f:
         f.write(json.dumps(log_entry) + "\n")
-    
-    # Queue the job for execution
-    await job_manager.submit_job(request.name)
-    
-    return {"message": "Job created successfully", "job_name": request.name}
 
 
 @router.post("/{job_name}/cancel")
@@ -183,26 +653,26 @@ async def cancel_job(job_name: str):
         raise HTTPException(status_code=404, detail="Job not found")
     
     # Check current status
-    status_file = job_dir / "status.json"
-    if not status_file.exists():
+    status = job_index.get(job_name)
+    if status is None:
         raise HTTPException(status_code=404, detail="Job status not found")
     
-    try:
-        with open(status_file, 'r') as f:
-            status = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError) as e:
-        logger.error(f"Failed to read status for {job_name}: {e}")
-        raise HTTPException(status_code=500, detail="Failed to read job status")
-    
-    if status["status"] not in [JobStatusEnum.SETUP.value, JobStatusEnum.RUNNING.value]:
+    if status["status"] not in ACTIVE_STATUSES:
         raise HTTPException(status_code=400, detail=f"Cannot cancel job in {status['status']} state")
     
-    # Cancel via job manager
+    await _cancel(job_name, status)
+    
+    return {"message": "Job cancelled successfully"}
+
+
+async def _cancel(job_name: str, status: Dict[str, Any]) -> None:
+    """Cancel a job through the job manager, or mark it cancelled if not running"""
     success = await job_manager.cancel_job(job_name)
     if not success:
         # Fallback: update status directly
+        status = dict(status)
         status["status"] = JobStatusEnum.CANCELLED.value
         status["completedAt"] = datetime.now(timezone.utc).isoformat() + "Z"
-        atomic_write_json(status_file, status)
-    
-    return {"message": "Job cancelled successfully"}
\ No newline at end of file
+        job_index.write(job_name, status)
+        log_hub.publish_status(job_name, status)
+        log_hub.close(job_name)
\ No newline at end of file
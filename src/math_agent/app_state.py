@@ -1,6 +1,27 @@
 """Simple app state module to hold shared instances"""
+from math_agent.services.blob_store import BLOBS_DIRNAME, BlobStore
+from math_agent.services.exercise_catalog import ExerciseCatalog
+from math_agent.services.job_index import JobIndex
 from math_agent.services.job_manager import JobManager
-from math_agent.config import JOBS_DIR
+from math_agent.services.log_hub import LogHub
+from math_agent.services.pdf_cache import PdfCache
+from math_agent.config import EXERCISES_DIR, JOBS_DIR
+
+# In-memory job status index shared by the API routes and the job manager
+job_index = JobIndex(JOBS_DIR)
+
+# Live log/status fan-out from running executors to streaming clients
+log_hub = LogHub()
+
+# Workspace inputs (exercises, prompts, additional files), stored once by content hash
+blob_store = BlobStore(JOBS_DIR / BLOBS_DIRNAME)
+
+# Exercises with their metadata, read once and refreshed from file mtimes
+exercise_catalog = ExerciseCatalog(EXERCISES_DIR)
+
+# Compiled PDFs shared across jobs with identical LaTeX sources
+pdf_cache = PdfCache()
 
 # Initialize job manager - it will be started when first job is submitted
-job_manager = JobManager(JOBS_DIR)
\ No newline at end of file
+job_manager = JobManager(JOBS_DIR, job_index=job_index, log_hub=log_hub,
+                         pdf_cache=pdf_cache)
\ No newline at end of file
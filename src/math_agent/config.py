@@ -1,27 +1,80 @@
 from pathlib import Path
 import os
+import socket
+
+
+def _parse_mapping(value: str) -> dict:
+    """Parse "name=value,name=value" into a dict of strings"""
+    mapping = {}
+    for item in value.split(","):
+        if "=" in item:
+            name, mapped = item.split("=", 1)
+            mapping[name.strip()] = mapped.strip()
+    return mapping
+
+
+def _parse_limits(value: str) -> dict:
+    """Parse "name=limit,name=limit" into a dict of ints"""
+    limits = {}
+    for item in value.split(","):
+        if "=" in item:
+            name, limit = item.split("=", 1)
+            limits[name.strip()] = int(limit)
+    return limits
+
 
 # Just simple constants
 PROJECT_ROOT = Path(__file__).parent.parent.parent
 DATA_DIR = PROJECT_ROOT / "data"
-JOBS_DIR = PROJECT_ROOT / "jobs"
+JOBS_DIR = Path(os.getenv("JOBS_DIR", str(PROJECT_ROOT / "jobs")))
 STATIC_DIR = PROJECT_ROOT / "static"
 EXERCISES_DIR = DATA_DIR / "exercises"
 PROMPTS_DIR = DATA_DIR / "prompts"
 
 # Ensure directories exist
-JOBS_DIR.mkdir(exist_ok=True)
+JOBS_DIR.mkdir(parents=True, exist_ok=True)
 DATA_DIR.mkdir(exist_ok=True)
 PROMPTS_DIR.mkdir(exist_ok=True)
 
 # Job Manager Configuration
-JOB_SCAN_INTERVAL = int(os.getenv("JOB_SCAN_INTERVAL", "5"))  # seconds
+JOB_SCAN_INTERVAL = float(os.getenv("JOB_SCAN_INTERVAL", "5"))  # seconds between checks for external jobs; 0 disables
 MAX_CONCURRENT_JOBS = int(os.getenv("MAX_CONCURRENT_JOBS", "2"))
 
+MAX_BATCH_JOBS = int(os.getenv("MAX_BATCH_JOBS", "5000"))  # jobs per POST /jobs/batch
+MAX_UPLOAD_FILE_BYTES = int(os.getenv("MAX_UPLOAD_FILE_BYTES", str(512 * 1024 ** 2)))  # per attachment of POST /jobs/upload
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(2 * 1024 ** 3)))  # whole body of POST /jobs/upload
+
+# Several nodes sharing JOBS_DIR (e.g. over NFS) claim jobs through lease files.
+# JOB_LEASE_TTL is how long a lease lives without renewal; 0 means this process
+# owns the jobs directory alone and takes no leases.
+JOB_LEASE_TTL = float(os.getenv("JOB_LEASE_TTL", "0"))
+NODE_ID = os.getenv("NODE_ID", f"{socket.gethostname()}-{os.getpid()}")
+# An API-only node sets RUN_WORKERS=false and leaves execution to worker nodes
+RUN_WORKERS = os.getenv("RUN_WORKERS", "true").lower() == "true"
+# What a restarted single node does with jobs still marked running: "requeue" or "error"
+ORPHAN_POLICIES = ("requeue", "error")
+ORPHAN_POLICY = os.getenv("ORPHAN_POLICY", "requeue")
+
+# Job Index Configuration
+JOB_INDEX_REFRESH_INTERVAL = float(os.getenv("JOB_INDEX_REFRESH_INTERVAL", "2"))  # seconds
+EXERCISE_CATALOG_REFRESH_INTERVAL = float(os.getenv("EXERCISE_CATALOG_REFRESH_INTERVAL", "2"))  # seconds
+# SQLite catalog of job statuses; defaults to the jobs directory. Point it at a
+# local disk when JOBS_DIR is on NFS, where SQLite locking is unreliable.
+JOB_CATALOG_PATH = os.getenv("JOB_CATALOG_PATH")
+
 # LaTeX Configuration
 PDFLATEX_COMMAND = os.getenv("PDFLATEX_COMMAND", "pdflatex")
 PDFLATEX_ARGS = ["-interaction=nonstopmode"]
-PDFLATEX_RUNS = int(os.getenv("PDFLATEX_RUNS", "2"))  # Run twice for references
+# Rerun until references settle; PDFLATEX_RUNS is the setting's former name
+PDFLATEX_MAX_RUNS = int(os.getenv("PDFLATEX_MAX_RUNS", os.getenv("PDFLATEX_RUNS", "5")))
+# Compilation runs in its own pool so agent slots are freed as soon as the agent exits
+LATEX_WORKERS = int(os.getenv("LATEX_WORKERS", str(os.cpu_count() or 1)))
+# Compiled PDFs are cached by content hash of the tex sources; 0 disables the cache
+PDF_CACHE_DIR = Path(os.getenv("PDF_CACHE_DIR", str(PROJECT_ROOT / ".cache" / "pdf")))
+PDF_CACHE_MAX_BYTES = int(os.getenv("PDF_CACHE_MAX_BYTES", str(1024 ** 3)))
+
+# Seconds between /proc samples of agent and pdflatex processes; 0 samples only at start and exit
+RESOURCE_SAMPLE_INTERVAL = float(os.getenv("RESOURCE_SAMPLE_INTERVAL", "1"))
 
 # Model to CLI tool mapping
 MODEL_CLI_MAPPING = {
@@ -29,5 +82,34 @@ MODEL_CLI_MAPPING = {
     "claude-sonnet-4": "claude",
     "gemini-2.5-pro": "gemini",
     "gemini-2.5-flash": "gemini",
+    # Overrides and additions, e.g. "claude-opus-4=/opt/bin/claude" or a fake CLI for load tests
+    **_parse_mapping(os.getenv("MODEL_CLI_MAPPING", "")),
 }
-DEFAULT_CLI_TOOL = "gemini"  # Fallback for unknown models
\ No newline at end of file
+DEFAULT_CLI_TOOL = "gemini"  # Fallback for unknown models
+
+# Scheduling lanes: each CLI tool (provider) is limited independently, e.g.
+# CLI_CONCURRENCY_LIMITS="claude=4,gemini=2". Tools not listed get MAX_CONCURRENT_JOBS.
+CLI_CONCURRENCY_LIMITS = _parse_limits(os.getenv("CLI_CONCURRENCY_LIMITS", ""))
+# Optional tighter limits for single models, e.g. "claude-opus-4=1"
+MODEL_CONCURRENCY_LIMITS = _parse_limits(os.getenv("MODEL_CONCURRENCY_LIMITS", ""))
+# Optional jobs started per minute per CLI tool, e.g. "claude=20"
+CLI_RATE_LIMITS = _parse_limits(os.getenv("CLI_RATE_LIMITS", ""))
+# Optional adaptive limit on agent jobs running at once across all CLI tools,
+# between ADAPTIVE_MIN_JOBS and ADAPTIVE_MAX_JOBS, driven by host load and memory
+ADAPTIVE_CONCURRENCY = os.getenv("ADAPTIVE_CONCURRENCY", "false").lower() == "true"
+ADAPTIVE_MIN_JOBS = int(os.getenv("ADAPTIVE_MIN_JOBS", "1"))
+ADAPTIVE_MAX_JOBS = int(os.getenv("ADAPTIVE_MAX_JOBS", str(os.cpu_count() or 1)))
+ADAPTIVE_INTERVAL = float(os.getenv("ADAPTIVE_INTERVAL", "10"))  # seconds between adjustments
+ADAPTIVE_MAX_LOAD = float(os.getenv("ADAPTIVE_MAX_LOAD", "1.0"))  # 1-minute load average per CPU
+ADAPTIVE_MIN_FREE_MEMORY = float(os.getenv("ADAPTIVE_MIN_FREE_MEMORY", "0.1"))  # fraction of total memory
+
+# Log Writer Configuration
+LOG_FLUSH_BYTES = int(os.getenv("LOG_FLUSH_BYTES", str(64 * 1024)))  # flush when this much is buffered
+LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", "0.2"))  # seconds an entry may stay buffered
+# Keep the agent's unmerged stream-json events in stream.jsonl next to the log
+KEEP_RAW_STREAM = os.getenv("KEEP_RAW_STREAM", "false").lower() == "true"
+LOG_ARCHIVE_LEVEL = int(os.getenv("LOG_ARCHIVE_LEVEL", "6"))  # gzip level for finished jobs' logs; 0 keeps them plain
+
+# Live Log Stream Configuration
+LOG_STREAM_BUFFER_SIZE = int(os.getenv("LOG_STREAM_BUFFER_SIZE", "1000"))  # events per subscriber
+LOG_STREAM_KEEPALIVE = float(os.getenv("LOG_STREAM_KEEPALIVE", "15"))  # seconds
@@ -1,7 +1,7 @@
 """
 Pydantic models for the math agent system.
 """
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 from enum import Enum
 from pydantic import BaseModel
 
@@ -10,11 +10,27 @@ class JobStatusEnum(str, Enum):
     """Enumeration of valid job statuses"""
     SETUP = "setup"
     RUNNING = "running"
+    COMPILING = "compiling"  # Agent finished; solution.tex waits for or is in pdflatex
     COMPLETED = "completed"
     ERROR = "error"
     CANCELLED = "cancelled"
 
 
+# Statuses of jobs that are queued or in progress and can be cancelled
+ACTIVE_STATUSES = (
+    JobStatusEnum.SETUP.value,
+    JobStatusEnum.RUNNING.value,
+    JobStatusEnum.COMPILING.value,
+)
+
+# Statuses after which a job produces no more output
+FINISHED_STATUSES = (
+    JobStatusEnum.COMPLETED.value,
+    JobStatusEnum.ERROR.value,
+    JobStatusEnum.CANCELLED.value,
+)
+
+
 class JobCreateRequest(BaseModel):
     """Request model for creating a new job"""
     name: str
@@ -25,6 +41,18 @@ class JobCreateRequest(BaseModel):
     additionalFiles: Optional[Dict[str, str]] = {}
 
 
+class JobBatchRequest(BaseModel):
+    """Request model for creating a sweep of jobs over models × exercises × prompts"""
+    models: List[str]
+    exercises: List[str]
+    prompts: List[str]  # Prompt content or @saved_prompt_name, as in JobCreateRequest
+    replicates: int = 1
+    # Fields: {sweep}, {model}, {course}, {exercise}, {prompt}, {replicate}, {index}
+    nameTemplate: str = "{sweep}-{model}-{exercise}-{prompt}-r{replicate}"
+    sweep: Optional[str] = None  # Generated if not given
+    disallowedTools: Optional[str] = ""
+
+
 class PromptSaveRequest(BaseModel):
     """Request model for saving a prompt"""
     name: str
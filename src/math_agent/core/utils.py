@@ -5,10 +5,10 @@ import json
 import os
 import tempfile
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterable
 
 
-def atomic_write_json(file_path: Path, data: Any, indent: int = 2) -> None:
+def atomic_write_json(file_path: Path, data: Any, indent: int = 2, fsync: bool = True) -> None:
     """
     Write JSON data to a file atomically.
     
@@ -18,6 +18,8 @@ def atomic_write_json(file_path: Path, data: Any, indent: int = 2) -> None:
         file_path: Path to the file to write
         data: Data to serialize as JSON
         indent: JSON indentation level
+        fsync: Whether to fsync before replacing; callers writing many files
+            can skip it and sync once at the end
     """
     # Write to temporary file in same directory (for same filesystem)
     temp_fd, temp_path = tempfile.mkstemp(
@@ -31,7 +33,8 @@ def atomic_write_json(file_path: Path, data: Any, indent: int = 2) -> None:
         with os.fdopen(temp_fd, 'w') as f:
             json.dump(data, f, indent=indent)
             f.flush()
-            os.fsync(f.fileno())
+            if fsync:
+                os.fsync(f.fileno())
         
         # Atomically replace the original file
         os.replace(temp_path, file_path)
@@ -41,4 +44,14 @@ def atomic_write_json(file_path: Path, data: Any, indent: int = 2) -> None:
             os.unlink(temp_path)
         except Exception:
             pass
-        raise
\ No newline at end of file
+        raise
+
+
+def fsync_paths(paths: Iterable[Path]) -> None:
+    """fsync files and directories, e.g. after writing many of them without fsync"""
+    for path in paths:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
@@ -4,17 +4,20 @@ Math Agent Backend Server
 
 FastAPI server providing API endpoints for the math agent system.
 """
+import asyncio
 import logging
+import time
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, Request
+from fastapi.responses import FileResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 import uvicorn
 
 from .config import STATIC_DIR, DATA_DIR, JOBS_DIR
-from .app_state import job_manager
-from .api.routes import jobs_router, data_router
+from .app_state import blob_store, job_index, job_manager
+from .core.metrics import HTTP_REQUEST_DURATION, REGISTRY
+from .api.routes import jobs_router, data_router, files_router
 
 logger = logging.getLogger(__name__)
 
@@ -26,17 +29,42 @@ async def lifespan(app: FastAPI):
     logger.info("Starting job manager...")
     await job_manager.start()
     logger.info("Job manager started successfully")
+    # Drop stored inputs that no job refers to, e.g. attachments of failed uploads
+    referenced = {digest for status in job_index.all().values() for digest in status.get("inputs", {}).values()}
+    await asyncio.to_thread(blob_store.collect, referenced)
     yield
-    # Shutdown (if needed in future)
-    # await job_manager.stop()
+    # Running jobs keep their status and are recovered on the next start
+    await job_manager.stop()
 
 
 # Create FastAPI app
 app = FastAPI(title="Math Agent API", lifespan=lifespan)
 
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    """Time every request by its route template, e.g. /jobs/{job_name}"""
+    started = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    HTTP_REQUEST_DURATION.observe(
+        time.perf_counter() - started,
+        method=request.method,
+        route=getattr(route, "path", "unmatched"),
+        status=str(response.status_code)
+    )
+    return response
+
+
 # Include routers
 app.include_router(jobs_router)
 app.include_router(data_router)
+# Routes for single job files; everything else under /jobfiles is served by the mount below
+app.include_router(files_router)
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics in the text exposition format"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
 
 @app.get("/")
 async def serve_dashboard():
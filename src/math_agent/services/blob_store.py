@@ -0,0 +1,213 @@
+"""
+Content-addressed store for job workspace inputs.
+
+Exercises, prompts and additional files are stored once, keyed by the
+SHA-256 of their content, under jobs/.blobs, and placed in workspaces by
+materialize(). Creating a job therefore writes only its metadata, and a
+sweep of 500 jobs keeps one copy of each exercise and prompt.
+
+Inputs the agent only reads (exercises, prompts) are materialized
+read-only: a reflink where the filesystem supports it (btrfs, XFS), a
+hard link otherwise and a copy as the last resort, e.g. across
+filesystems. An agent that wants to change one has to replace the file,
+which leaves the blob untouched; only an agent running as root could
+write through a hard link into the shared blob.
+
+Attachments are materialized writable, as the agent may edit them: a
+reflink, which is a separate inode whose extents are copied on write,
+or else a plain copy. Without reflink support (ext4, NFS) each job thus
+pays one copy of its attachments: about 4 ms per 10 MB on ext4 with the
+blob in the page cache, more when it has to be read from disk.
+
+Blobs are never removed while a job may still need them: collect(), run
+at server startup, removes those that no job refers to and that have not
+been stored or reused for a day.
+"""
+
+import fcntl
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+BLOBS_DIRNAME = ".blobs"
+
+# Unreferenced blobs younger than this (seconds) may belong to a job being created
+GC_MIN_AGE = 24 * 3600
+
+# ioctl(2) request to clone a file's extents (Linux FICLONE)
+_FICLONE = 0x40049409
+
+
+def digest_bytes(data: bytes) -> str:
+    """The key of some content in the store"""
+    return "sha256:" + hashlib.sha256(data).hexdigest()
+
+
+class BlobStore:
+    """Stores workspace inputs once and links them into workspaces"""
+
+    def __init__(self, root: Path):
+        self.root = root
+
+    def put(self, data: bytes, digest: Optional[str] = None) -> str:
+        """
+        Store content unless it is already there; returns its digest.
+
+        Args:
+            data: The content
+            digest: Its key, if the caller already has it (e.g. Exercise.digest),
+                so that stored content is not hashed again
+        """
+        digest = digest or digest_bytes(data)
+        if self._touch(self.path(digest)):
+            return digest
+        writer = self.writer()
+        try:
+            writer.write(data)
+        except BaseException:
+            writer.abort()
+            raise
+        return writer.commit()
+
+    def writer(self) -> "BlobWriter":
+        """Start storing content that arrives in chunks"""
+        return BlobWriter(self)
+
+    def materialize(self, digest: str, dest: Path, read_only: bool = False) -> str:
+        """
+        Place a blob at dest.
+
+        Args:
+            digest: The blob to place
+            dest: Path of the new file
+            read_only: Make dest read-only, which allows hard linking the blob
+
+        Returns:
+            How it was placed: "reflink", "hardlink" or "copy"
+        """
+        src = self.path(digest)
+        if not src.exists():
+            raise FileNotFoundError(f"Blob {digest} is not in the store")
+
+        if self._reflink(src, dest):
+            if read_only:
+                os.chmod(dest, 0o444)
+            return "reflink"
+        if read_only:
+            try:
+                os.link(src, dest)
+                return "hardlink"
+            except OSError as e:
+                logger.debug(f"Cannot hard link {digest} to {dest}: {e}")
+        shutil.copyfile(src, dest)
+        if read_only:
+            os.chmod(dest, 0o444)
+        return "copy"
+
+    def collect(self, referenced: Iterable[str], min_age: float = GC_MIN_AGE) -> int:
+        """
+        Remove blobs no job refers to, e.g. attachments of uploads that failed.
+
+        Blobs are shared by content, so one stored for a failed upload may
+        already be in use by a job being created concurrently. Only blobs
+        that were neither stored nor reused for min_age seconds are removed.
+
+        Returns:
+            The number of blobs removed
+        """
+        keep = {digest.partition(":")[2] for digest in referenced}
+        cutoff = time.time() - min_age
+        removed = 0
+        for path in self.root.glob("??/*"):
+            if path.name in keep:
+                continue
+            try:
+                if path.stat().st_mtime > cutoff:
+                    continue
+                path.unlink()
+            except FileNotFoundError:
+                continue
+            removed += 1
+        if removed:
+            logger.info(f"Removed {removed} unreferenced blobs")
+        return removed
+
+    def path(self, digest: str) -> Path:
+        algorithm, _, hexdigest = digest.partition(":")
+        if algorithm != "sha256" or len(hexdigest) != 64 or not all(c in "0123456789abcdef" for c in hexdigest):
+            raise ValueError(f"Invalid blob digest: {digest}")
+        return self.root / hexdigest[:2] / hexdigest
+
+    @staticmethod
+    def _touch(path: Path) -> bool:
+        """Mark a stored blob as just used, so collect() leaves it alone; False if it is missing"""
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    @staticmethod
+    def _reflink(src: Path, dest: Path) -> bool:
+        """Clone src to dest if the filesystem shares extents; False otherwise"""
+        try:
+            with open(src, 'rb') as s, open(dest, 'xb') as d:
+                try:
+                    fcntl.ioctl(d.fileno(), _FICLONE, s.fileno())
+                except OSError:
+                    cloned = False
+                else:
+                    cloned = True
+        except OSError:
+            return False
+        if not cloned:
+            dest.unlink(missing_ok=True)
+            return False
+        return True
+
+
+class BlobWriter:
+    """Writes one blob chunk by chunk, hashing it on the way"""
+
+    def __init__(self, store: BlobStore):
+        self.store = store
+        self.size = 0
+        self._hash = hashlib.sha256()
+        store.root.mkdir(parents=True, exist_ok=True)
+        fd, self._tmp = tempfile.mkstemp(dir=store.root, prefix=".", suffix=".tmp")
+        self._file = os.fdopen(fd, 'wb')
+
+    def write(self, data: bytes) -> None:
+        self._hash.update(data)
+        self._file.write(data)
+        self.size += len(data)
+
+    def commit(self) -> str:
+        """Move the content into the store; returns its digest"""
+        self._file.close()
+        digest = "sha256:" + self._hash.hexdigest()
+        path = self.store.path(digest)
+        if self.store._touch(path):
+            os.unlink(self._tmp)
+            return digest
+        try:
+            path.parent.mkdir(exist_ok=True)
+            os.chmod(self._tmp, 0o444)
+            # Identical content from a concurrent writer may land first; either copy is fine
+            os.replace(self._tmp, path)
+        except BaseException:
+            Path(self._tmp).unlink(missing_ok=True)
+            raise
+        return digest
+
+    def abort(self) -> None:
+        """Discard what was written"""
+        self._file.close()
+        Path(self._tmp).unlink(missing_ok=True)
@@ -0,0 +1,172 @@
+"""
+In-memory catalog of the exercises under data/exercises.
+
+Exercises are read once and kept in memory together with their metadata:
+course, sheet and exercise number (parsed from names like
+sheet_01_ex_02), size and content hash. Job creation and the submit page
+are served from the catalog instead of walking and reading the exercises
+directory on every request.
+
+Refreshing is incremental. A course directory is listed again only when
+its mtime changed (an exercise was added, removed or renamed), and an
+exercise file is read again only when its mtime or size changed, so an
+up-to-date refresh costs one stat per directory and per exercise.
+"""
+
+import logging
+import re
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .blob_store import digest_bytes
+from ..config import EXERCISES_DIR, EXERCISE_CATALOG_REFRESH_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+EXERCISE_NAME_PATTERN = re.compile(r"sheet_(\d+)_ex_(\d+)")
+
+
+@dataclass(frozen=True)
+class Exercise:
+    """One exercise file and its metadata"""
+    course: str
+    name: str
+    sheet: Optional[int]  # None if the name does not follow sheet_NN_ex_NN
+    number: Optional[int]
+    digest: str  # Same key as in the blob store
+    size: int
+    content: bytes
+
+    @property
+    def id(self) -> str:
+        return f"{self.course}/{self.name}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Metadata for the API, without the content"""
+        return {
+            "id": self.id,
+            "course": self.course,
+            "name": self.name,
+            "sheet": self.sheet,
+            "number": self.number,
+            "digest": self.digest,
+            "size": self.size,
+        }
+
+
+def parse_exercise_name(name: str) -> Tuple[Optional[int], Optional[int]]:
+    """Get (sheet, exercise number) from a name like sheet_01_ex_02"""
+    match = EXERCISE_NAME_PATTERN.fullmatch(name)
+    if not match:
+        return None, None
+    return int(match.group(1)), int(match.group(2))
+
+
+class ExerciseCatalog:
+    """Keeps exercises in memory, in sync with the exercises directory"""
+
+    def __init__(self, exercises_dir: Path = EXERCISES_DIR,
+                 refresh_interval: float = EXERCISE_CATALOG_REFRESH_INTERVAL):
+        self.exercises_dir = exercises_dir
+        self.refresh_interval = refresh_interval
+        self._exercises: Dict[str, Exercise] = {}
+        # Exercise id -> (mtime in nanoseconds, size) of its file
+        self._signatures: Dict[str, Tuple[int, int]] = {}
+        # Directory -> mtime in nanoseconds when it was last listed
+        self._dir_mtimes: Dict[Path, int] = {}
+        self._courses: List[str] = []
+        self._last_refresh: Optional[float] = None
+
+    def get(self, exercise_id: str) -> Optional[Exercise]:
+        """Get one exercise, re-reading it if its file changed"""
+        self.refresh_if_stale()
+        course, _, name = exercise_id.partition("/")
+        if not course or not name or "/" in name or course.startswith(".") or name.startswith("."):
+            return None
+        self._refresh_exercise(course, name)
+        return self._exercises.get(exercise_id)
+
+    def list(self, course: Optional[str] = None, sheet: Optional[int] = None) -> List[Exercise]:
+        """Get the exercises of a course and/or sheet, ordered by course and name"""
+        self.refresh_if_stale()
+        return [
+            exercise for _, exercise in sorted(self._exercises.items())
+            if (course is None or exercise.course == course) and (sheet is None or exercise.sheet == sheet)
+        ]
+
+    def refresh_if_stale(self) -> None:
+        """Refresh from disk if the last refresh is older than the interval"""
+        now = time.monotonic()
+        if self._last_refresh is None or now - self._last_refresh >= self.refresh_interval:
+            self.refresh()
+
+    def refresh(self) -> None:
+        """Pick up exercises added, changed or removed since the last refresh"""
+        try:
+            if self._listing_changed(self.exercises_dir):
+                self._courses = sorted(
+                    path.name for path in self.exercises_dir.iterdir()
+                    if path.is_dir() and not path.name.startswith(".")
+                )
+            courses = self._courses if self.exercises_dir.is_dir() else []
+            for course in courses:
+                course_dir = self.exercises_dir / course
+                if self._listing_changed(course_dir):
+                    names = {path.stem for path in course_dir.glob("*.tex") if not path.name.startswith(".")}
+                    known = {exercise.name for exercise in self._exercises.values() if exercise.course == course}
+                    for name in known | names:
+                        self._refresh_exercise(course, name)
+                else:
+                    for exercise in [e for e in self._exercises.values() if e.course == course]:
+                        self._refresh_exercise(course, exercise.name)
+
+            for exercise_id in [i for i, e in self._exercises.items() if e.course not in courses]:
+                self._forget(exercise_id)
+        except OSError as e:
+            logger.error(f"Failed to refresh exercise catalog: {e}")
+            # Keep what we have; retry on the next refresh
+        self._last_refresh = time.monotonic()
+
+    def _listing_changed(self, directory: Path) -> bool:
+        """Check whether a directory's entries may have changed since it was last listed"""
+        try:
+            mtime = directory.stat().st_mtime_ns
+        except (FileNotFoundError, NotADirectoryError):
+            self._dir_mtimes.pop(directory, None)
+            return False
+        if self._dir_mtimes.get(directory) == mtime:
+            return False
+        # Recorded before listing, so a change during the listing is seen next time
+        self._dir_mtimes[directory] = mtime
+        return True
+
+    def _refresh_exercise(self, course: str, name: str) -> None:
+        """Reload one exercise if its file's mtime or size changed"""
+        exercise_id = f"{course}/{name}"
+        path = self.exercises_dir / course / f"{name}.tex"
+        try:
+            st = path.stat()
+        except (FileNotFoundError, NotADirectoryError):
+            self._forget(exercise_id)
+            return
+        signature = (st.st_mtime_ns, st.st_size)
+        if self._signatures.get(exercise_id) == signature:
+            return
+
+        try:
+            content = path.read_bytes()
+        except OSError as e:
+            logger.error(f"Failed to read exercise {exercise_id}: {e}")
+            return
+        sheet, number = parse_exercise_name(name)
+        self._exercises[exercise_id] = Exercise(
+            course=course, name=name, sheet=sheet, number=number,
+            digest=digest_bytes(content), size=len(content), content=content,
+        )
+        self._signatures[exercise_id] = signature
+
+    def _forget(self, exercise_id: str) -> None:
+        self._exercises.pop(exercise_id, None)
+        self._signatures.pop(exercise_id, None)
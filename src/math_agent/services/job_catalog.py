@@ -0,0 +1,258 @@
+"""
+SQLite catalog of job statuses for the math agent system.
+
+status.json stays the source of truth; the catalog is a write-through
+copy that answers filtered, sorted and paginated listings from indexes
+instead of materialising every job. It also stores each status file's
+stat signature, so that a restarted server only re-reads the status
+files that changed while it was down.
+
+Every insert, update and removal is stamped with the next value of a
+persistent change sequence, so that pollers can ask for just the jobs
+that changed since the sequence number they last saw. The sequence is a
+counter row in the database, advanced inside each write transaction, so
+processes sharing the catalog (see job_lease) never hand out the same
+number twice.
+"""
+
+import json
+import logging
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+CATALOG_FILENAME = ".catalog.sqlite3"
+
+# Bump when the schema changes; older catalogs are rebuilt from status files
+SCHEMA_VERSION = 3
+
+# Sortable status fields and their columns
+SORT_COLUMNS = {
+    "createdAt": "created_at",
+    "completedAt": "completed_at",
+    "name": "name",
+    "status": "status",
+    "model": "model",
+    "exercise": "exercise",
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    name TEXT PRIMARY KEY,
+    status TEXT,
+    model TEXT,
+    exercise TEXT,
+    sweep TEXT,
+    created_at TEXT,
+    completed_at TEXT,
+    mtime_ns INTEGER,
+    size INTEGER,
+    seq INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS removed (
+    name TEXT PRIMARY KEY,
+    seq INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS counter (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    seq INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO counter (id, seq) VALUES (0, 0);
+CREATE INDEX IF NOT EXISTS jobs_seq ON jobs (seq);
+CREATE INDEX IF NOT EXISTS removed_seq ON removed (seq);
+CREATE INDEX IF NOT EXISTS jobs_created_at ON jobs (created_at);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+CREATE INDEX IF NOT EXISTS jobs_model ON jobs (model, created_at);
+CREATE INDEX IF NOT EXISTS jobs_exercise ON jobs (exercise, created_at);
+CREATE INDEX IF NOT EXISTS jobs_sweep ON jobs (sweep);
+"""
+
+Signature = Optional[Tuple[int, int]]
+
+
+class JobCatalog:
+    """Mirrors job statuses into an indexed SQLite table"""
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        try:
+            self._conn = self._connect()
+        except sqlite3.DatabaseError as e:
+            # The catalog is only a copy of the status files; rebuild it
+            logger.error(f"Discarding unreadable job catalog {db_path}: {e}")
+            for suffix in ("", "-wal", "-shm"):
+                Path(f"{db_path}{suffix}").unlink(missing_ok=True)
+            self._conn = self._connect()
+
+    @property
+    def seq(self) -> int:
+        """Sequence number of the latest change, by any process"""
+        return self._conn.execute("SELECT seq FROM counter").fetchone()[0]
+
+    def _connect(self) -> sqlite3.Connection:
+        # Only used from the event loop thread, one statement at a time
+        conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                conn.executescript(
+                    "DROP TABLE IF EXISTS jobs; DROP TABLE IF EXISTS removed; DROP TABLE IF EXISTS counter;"
+                )
+            with conn:
+                conn.executescript(_SCHEMA)
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        except sqlite3.DatabaseError:
+            conn.close()
+            raise
+        return conn
+
+    def load(self) -> Dict[str, Tuple[Dict[str, Any], Signature]]:
+        """Get every cataloged status with its status.json signature"""
+        rows = self._conn.execute("SELECT name, data, mtime_ns, size FROM jobs")
+        catalog = {}
+        for name, data, mtime_ns, size in rows:
+            signature = (mtime_ns, size) if mtime_ns is not None else None
+            catalog[name] = (json.loads(data), signature)
+        return catalog
+
+    def upsert_many(self, rows: Iterable[Tuple[str, Dict[str, Any], Signature]]) -> None:
+        """Insert or replace statuses in one transaction"""
+        rows = list(rows)
+        if not rows:
+            return
+        with self._conn:
+            first_seq = self._allocate_seqs(len(rows))
+            params = [
+                (
+                    name,
+                    first_seq + i,
+                    status.get("status"),
+                    status.get("model"),
+                    status.get("exercise"),
+                    status.get("sweep"),
+                    status.get("createdAt"),
+                    status.get("completedAt"),
+                    signature[0] if signature else None,
+                    signature[1] if signature else None,
+                    json.dumps(status),
+                )
+                for i, (name, status, signature) in enumerate(rows)
+            ]
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO jobs "
+                "(name, seq, status, model, exercise, sweep, created_at, completed_at, mtime_ns, size, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                params,
+            )
+            self._conn.executemany("DELETE FROM removed WHERE name = ?", [(p[0],) for p in params])
+
+    def delete_many(self, names: Iterable[str]) -> None:
+        """Remove jobs whose directories are gone, remembering the removal"""
+        names = list(names)
+        if not names:
+            return
+        with self._conn:
+            first_seq = self._allocate_seqs(len(names))
+            params = [(name, first_seq + i) for i, name in enumerate(names)]
+            self._conn.executemany("DELETE FROM jobs WHERE name = ?", [(p[0],) for p in params])
+            self._conn.executemany("INSERT OR REPLACE INTO removed (name, seq) VALUES (?, ?)", params)
+
+    def changes(self, since: int) -> List[Tuple[str, Optional[Dict[str, Any]]]]:
+        """Get jobs changed after a sequence number; removed jobs have status None"""
+        changed: List[Tuple[int, str, Optional[Dict[str, Any]]]] = [
+            (seq, name, json.loads(data))
+            for seq, name, data in self._conn.execute(
+                "SELECT seq, name, data FROM jobs WHERE seq > ?", (since,)
+            )
+        ]
+        changed.extend(
+            (seq, name, None)
+            for seq, name in self._conn.execute("SELECT seq, name FROM removed WHERE seq > ?", (since,))
+        )
+        changed.sort(key=lambda change: change[0])
+        return [(name, status) for _, name, status in changed]
+
+    def query(
+        self,
+        statuses: Sequence[str] = (),
+        model: Optional[str] = None,
+        exercise: Optional[str] = None,
+        sweep: Optional[str] = None,
+        created_after: Optional[str] = None,
+        created_before: Optional[str] = None,
+        sort: str = "-createdAt",
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> Tuple[int, List[Tuple[str, Dict[str, Any]]]]:
+        """
+        Find jobs matching all given filters.
+
+        Args:
+            statuses: Match any of these statuses (all if empty)
+            model: Exact model name
+            exercise: Exact exercise ("course/exercise")
+            sweep: Exact sweep id
+            created_after: Inclusive lower bound on createdAt (ISO 8601 prefix)
+            created_before: Exclusive upper bound on createdAt (ISO 8601 prefix)
+            sort: A SORT_COLUMNS key, prefixed with "-" for descending order
+            limit: Maximum number of jobs to return (all if None)
+            offset: Number of matching jobs to skip
+
+        Returns:
+            The total number of matches and one page of (name, status) pairs
+
+        Raises:
+            ValueError: If the sort field is unknown
+        """
+        descending = sort.startswith("-")
+        column = SORT_COLUMNS.get(sort.lstrip("-"))
+        if column is None:
+            raise ValueError(f"Cannot sort by {sort.lstrip('-')}")
+
+        where = []
+        params: List[Any] = []
+        if statuses:
+            where.append(f"status IN ({', '.join('?' for _ in statuses)})")
+            params.extend(statuses)
+        for clause, value in (
+            ("model = ?", model),
+            ("exercise = ?", exercise),
+            ("sweep = ?", sweep),
+            ("created_at >= ?", created_after),
+            ("created_at < ?", created_before),
+        ):
+            if value is not None:
+                where.append(clause)
+                params.append(value)
+        where_sql = f" WHERE {' AND '.join(where)}" if where else ""
+
+        total = self._conn.execute(f"SELECT COUNT(*) FROM jobs{where_sql}", params).fetchone()[0]
+
+        direction = "DESC" if descending else "ASC"
+        # Name breaks ties so that pages are stable
+        sql = f"SELECT name, data FROM jobs{where_sql} ORDER BY {column} {direction}, name {direction}"
+        page_params = list(params)
+        if limit is not None or offset:
+            sql += " LIMIT ? OFFSET ?"
+            page_params.extend([limit if limit is not None else -1, offset])
+        rows = self._conn.execute(sql, page_params).fetchall()
+
+        return total, [(name, json.loads(data)) for name, data in rows]
+
+    def _allocate_seqs(self, count: int) -> int:
+        """
+        Reserve count sequence numbers in the current transaction; returns the first.
+
+        The UPDATE takes the database's write lock, which is held until the
+        transaction commits, so concurrent writers get disjoint ranges and
+        commit them in order.
+        """
+        self._conn.execute("UPDATE counter SET seq = seq + ?", (count,))
+        return self._conn.execute("SELECT seq FROM counter").fetchone()[0] - count + 1
+
+    def close(self) -> None:
+        self._conn.close()
@@ -8,6 +8,7 @@ including running the AI agent, managing output, and compiling LaTeX.
 import asyncio
 import json
 import logging
+import time
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Optional, Dict, Any
@@ -15,24 +16,74 @@ from typing import Optional, Dict, Any
 import aiofiles
 
 from ..core.utils import atomic_write_json
-from ..core.models import JobStatusEnum
-from ..config import PDFLATEX_COMMAND, PDFLATEX_ARGS, PDFLATEX_RUNS, MODEL_CLI_MAPPING, DEFAULT_CLI_TOOL
+from ..core.models import JobStatusEnum, FINISHED_STATUSES
+from ..core.metrics import PDFLATEX_DURATION
+from .job_index import JobIndex
+from .job_log import JobLogWriter, archive_log
+from .latex import aux_state, needs_rerun
+from .log_hub import LogHub
+from .resources import ProcessMonitor, merge_usage
+from .stream_coalescer import StreamCoalescer
+from .pdf_cache import PdfCache
+from ..config import (
+    PDFLATEX_COMMAND, PDFLATEX_ARGS, PDFLATEX_MAX_RUNS, MODEL_CLI_MAPPING, DEFAULT_CLI_TOOL,
+    KEEP_RAW_STREAM,
+)
 
 logger = logging.getLogger(__name__)
 
+# Seconds a terminated process gets to exit before it is killed
+TERMINATE_GRACE = 10.0
+
+
+def cli_tool_for_model(model: str) -> str:
+    """Get the CLI tool that runs a model"""
+    cli_tool = MODEL_CLI_MAPPING.get(model)
+    if not cli_tool:
+        logger.warning(f"Unknown model {model}, defaulting to {DEFAULT_CLI_TOOL} CLI")
+        cli_tool = DEFAULT_CLI_TOOL
+    return cli_tool
+
 
 class JobExecutor:
     """Executes math agent jobs"""
     
-    def __init__(self, job_dir: Path):
+    def __init__(self, job_dir: Path, job_index: Optional[JobIndex] = None,
+                 log_hub: Optional[LogHub] = None, pdf_cache: Optional[PdfCache] = None):
         self.job_dir = job_dir
+        self.job_name = job_dir.name
+        self.job_index = job_index
+        self.log_hub = log_hub
+        self.pdf_cache = pdf_cache
         self.workspace_dir = job_dir / "workspace"
         self.status_file = job_dir / "status.json"
         self.log_file = job_dir / "log.jsonl"
         self.process: Optional[asyncio.subprocess.Process] = None
+        self.latex_passes: list[Dict[str, Any]] = []
+        # Resource usage per phase ("agent", "compile"), recorded in status
+        self.resources: Dict[str, Dict[str, Any]] = {}
+        self._monitor: Optional[ProcessMonitor] = None
+        self._monitor_phase: Optional[str] = None
+        self.log_writer = JobLogWriter(self.log_file, on_flush=self._on_log_flushed)
+        # Stream-json events are merged into per-message records before logging
+        self.coalescer = StreamCoalescer()
+        self.raw_log_file = job_dir / "stream.jsonl"
+        self.raw_writer = JobLogWriter(self.raw_log_file) if KEEP_RAW_STREAM else None
+        # Set when another node took the job over; its status is no longer ours to write
+        self.abandoned = False
         
     async def execute(self):
-        """Execute the job"""
+        """Execute the job: run the agent, then compile its solution if needed"""
+        if await self.run_agent():
+            await self.compile()
+            
+    async def run_agent(self) -> bool:
+        """
+        Run the agent and record its outcome.
+
+        Returns True if the job is left in compiling state, waiting for
+        compile() to turn solution.tex into a PDF.
+        """
         try:
             # Update status to running
             await self._update_status(JobStatusEnum.RUNNING, startedAt=datetime.now(timezone.utc).isoformat() + "Z")
@@ -52,32 +103,32 @@ class JobExecutor:
                 stdout=asyncio.subprocess.PIPE,
                 stderr=asyncio.subprocess.PIPE
             )
+            self._start_monitor("agent")
             
             # Stream output to log
             await self._stream_output()
             
             # Wait for completion
             return_code = await self.process.wait()
+            await self._stop_monitor()
+            self.process = None
             
             if return_code == 0:
                 # Check for solution files
                 solution_tex = self.workspace_dir / "solution.tex"
                 solution_pdf = self.workspace_dir / "solution.pdf"
                 
-                updates = {
-                    "status": JobStatusEnum.COMPLETED,
-                    "completedAt": datetime.now(timezone.utc).isoformat() + "Z",
-                    "solutionTexCreated": solution_tex.exists()
-                }
-                
-                # Try to compile PDF if tex exists
+                # Hand the PDF over to the compile stage if tex exists
                 if solution_tex.exists() and not solution_pdf.exists():
-                    pdf_created = await self._compile_pdf()
-                    updates["solutionPdfCreated"] = pdf_created
-                else:
-                    updates["solutionPdfCreated"] = solution_pdf.exists()
+                    await self._update_status(JobStatusEnum.COMPILING, solutionTexCreated=True)
+                    return True
                 
-                await self._update_status(**updates)
+                await self._update_status(
+                    JobStatusEnum.COMPLETED,
+                    completedAt=datetime.now(timezone.utc).isoformat() + "Z",
+                    solutionTexCreated=solution_tex.exists(),
+                    solutionPdfCreated=solution_pdf.exists()
+                )
             else:
                 await self._update_status(
                     JobStatusEnum.ERROR,
@@ -86,30 +137,83 @@ class JobExecutor:
                 )
                 
         except asyncio.CancelledError:
-            # Job was cancelled
-            if self.process:
-                self.process.terminate()
-                await self.process.wait()
-            await self._update_status(
-                JobStatusEnum.CANCELLED,
-                completedAt=datetime.now(timezone.utc).isoformat() + "Z"
-            )
+            await self._handle_cancel()
             raise
             
         except Exception as e:
             logger.exception("Job execution failed")
+            # Don't leave the agent running unattended, e.g. when logging its output failed
+            await self._stop_process()
+            await self._stop_monitor()
+            self.process = None
             await self._update_status(
                 JobStatusEnum.ERROR,
                 completedAt=datetime.now(timezone.utc).isoformat() + "Z",
                 error=str(e)
             )
+        return False
+            
+    async def compile(self):
+        """Compile solution.tex to PDF and mark the job completed"""
+        try:
+            pdf_created, cache_result = await self._compile_pdf_cached()
+            extra = {"pdfCache": cache_result} if cache_result else {}
+            if self.latex_passes:
+                extra["latexPasses"] = self.latex_passes
+            await self._update_status(
+                JobStatusEnum.COMPLETED,
+                completedAt=datetime.now(timezone.utc).isoformat() + "Z",
+                solutionPdfCreated=pdf_created,
+                **extra
+            )
+        except asyncio.CancelledError:
+            await self._handle_cancel()
+            raise
+            
+    async def _handle_cancel(self):
+        """Stop the current subprocess and record the cancellation"""
+        await self._stop_process()
+        if self.abandoned:
+            await self._stop_monitor()
+            await self.log_writer.close()
+            if self.raw_writer is not None:
+                await self.raw_writer.close()
+            return
+        await self._update_status(
+            JobStatusEnum.CANCELLED,
+            completedAt=datetime.now(timezone.utc).isoformat() + "Z"
+        )
             
     async def cancel(self):
         """Cancel the running job"""
-        if self.process and self.process.returncode is None:
-            self.process.terminate()
+        await self._stop_process()
+
+    async def _stop_process(self):
+        """Terminate the current subprocess, killing it if it does not exit in time"""
+        if not self.process or self.process.returncode is not None:
+            return
+        self.process.terminate()
+        try:
+            await asyncio.wait_for(self.process.wait(), timeout=TERMINATE_GRACE)
+        except asyncio.TimeoutError:
+            logger.warning(f"Job {self.job_name}: process ignored SIGTERM, killing it")
+            self.process.kill()
             await self.process.wait()
             
+    def _start_monitor(self, phase: str):
+        """Start sampling the resource usage of self.process"""
+        self._monitor = ProcessMonitor(self.process.pid)
+        self._monitor.start()
+        self._monitor_phase = phase
+
+    async def _stop_monitor(self):
+        """Stop sampling and add the process's usage to its phase"""
+        if self._monitor is None:
+            return
+        monitor, self._monitor = self._monitor, None
+        usage = await monitor.stop()
+        self.resources[self._monitor_phase] = merge_usage(self.resources.get(self._monitor_phase), usage)
+
     async def _stream_output(self):
         """Stream process output to log file"""
         if not self.process or not self.process.stdout:
@@ -123,9 +227,6 @@ class JobExecutor:
             # Parse JSON output
             try:
                 entry = json.loads(line.decode('utf-8'))
-                # Write to log
-                async with aiofiles.open(self.log_file, 'a') as f:
-                    await f.write(json.dumps(entry) + '\n')
             except json.JSONDecodeError:
                 # Write raw line as system message
                 entry = {
@@ -133,46 +234,119 @@ class JobExecutor:
                     "type": "system",
                     "content": line.decode('utf-8').strip()
                 }
-                async with aiofiles.open(self.log_file, 'a') as f:
-                    await f.write(json.dumps(entry) + '\n')
+            if self.raw_writer is not None:
+                await self.raw_writer.write(entry)
+            if not isinstance(entry, dict):
+                entry = {"type": "system", "content": json.dumps(entry)}
+            for record in self.coalescer.feed(entry):
+                await self._append_log(record)
+        
+        for record in self.coalescer.flush():
+            await self._append_log(record)
+        
+        # The agent has exited; don't leave its last words in the buffer
+        await self.log_writer.flush()
+        if self.raw_writer is not None:
+            await self.raw_writer.close()
+
+    async def _append_log(self, entry: Dict[str, Any]):
+        """Append an entry to the log and publish it to live subscribers"""
+        offset = await self.log_writer.write(entry)
+        if self.log_hub is not None:
+            self.log_hub.publish_log(self.job_name, entry, offset)
+
+    def _on_log_flushed(self, offset: int):
+        if self.log_hub is not None:
+            self.log_hub.flushed(self.job_name, offset)
                     
+    async def _compile_pdf_cached(self) -> tuple[bool, Optional[str]]:
+        """
+        Compile solution.tex, reusing a cached PDF of identical sources.
+
+        Returns whether the PDF exists and "hit", "miss" or None if the
+        cache is not in use.
+        """
+        if self.pdf_cache is None or not self.pdf_cache.enabled:
+            return await self._compile_pdf(), None
+
+        solution_pdf = self.workspace_dir / "solution.pdf"
+        try:
+            key = await asyncio.to_thread(self.pdf_cache.key_for, self.workspace_dir)
+            hit = await asyncio.to_thread(self.pdf_cache.fetch, key, solution_pdf)
+        except OSError:
+            logger.exception("PDF cache lookup failed")
+            return await self._compile_pdf(), None
+
+        if hit:
+            await self._append_log({
+                "timestamp": datetime.now(timezone.utc).isoformat() + "Z",
+                "type": "system",
+                "content": f"Reused cached PDF {key[:12]} for identical solution.tex"
+            })
+            await self.log_writer.flush()
+            return True, "hit"
+
+        pdf_created = await self._compile_pdf()
+        if pdf_created:
+            try:
+                await asyncio.to_thread(self.pdf_cache.store, key, solution_pdf)
+            except OSError:
+                logger.exception("Failed to store PDF in cache")
+        return pdf_created, "miss"
+
     async def _compile_pdf(self) -> bool:
-        """Compile solution.tex to PDF"""
+        """
+        Compile solution.tex to PDF, rerunning pdflatex only while needed.
+
+        Per-pass timings are kept in self.latex_passes.
+        """
+        cmd = [PDFLATEX_COMMAND] + PDFLATEX_ARGS + ["solution.tex"]
+        self.latex_passes = []
         try:
-            # Run pdflatex
-            cmd = [PDFLATEX_COMMAND] + PDFLATEX_ARGS + ["solution.tex"]
-            result = await asyncio.create_subprocess_exec(
-                *cmd,
-                cwd=str(self.workspace_dir),
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            
-            stdout, stderr = await result.communicate()
-            
-            if result.returncode == 0 and PDFLATEX_RUNS > 1:
-                # Run again for references
-                for _ in range(PDFLATEX_RUNS - 1):
-                    result2 = await asyncio.create_subprocess_exec(
-                        *cmd,
+            for _ in range(PDFLATEX_MAX_RUNS):
+                before = await asyncio.to_thread(aux_state, self.workspace_dir)
+                started = time.monotonic()
+                self.process = await asyncio.create_subprocess_exec(
+                    *cmd,
                     cwd=str(self.workspace_dir),
                     stdout=asyncio.subprocess.PIPE,
                     stderr=asyncio.subprocess.PIPE
-                    )
-                    await result2.wait()
+                )
+                self._start_monitor("compile")
+                stdout, stderr = await self.process.communicate()
+                await self._stop_monitor()
+                returncode = self.process.returncode
+                self.process = None
+                seconds = time.monotonic() - started
+                PDFLATEX_DURATION.observe(seconds)
+                self.latex_passes.append({
+                    "seconds": round(seconds, 3),
+                    "returncode": returncode
+                })
                 
-                return (self.workspace_dir / "solution.pdf").exists()
+                if returncode != 0:
+                    # Log compilation error
+                    error_msg = stderr.decode('utf-8') if stderr else stdout.decode('utf-8')
+                    await self._append_log({
+                        "timestamp": datetime.now(timezone.utc).isoformat() + "Z",
+                        "type": "error",
+                        "content": f"LaTeX compilation failed in pass {len(self.latex_passes)}: {error_msg[:500]}"
+                    })
+                    return False
+                
+                after = await asyncio.to_thread(aux_state, self.workspace_dir)
+                if not needs_rerun(before, after, stdout.decode('utf-8', errors='replace')):
+                    break
             else:
-                # Log compilation error
-                error_msg = stderr.decode('utf-8') if stderr else stdout.decode('utf-8')
-                entry = {
-                    "timestamp": datetime.now(timezone.utc).isoformat() + "Z",
-                    "type": "error",
-                    "content": f"LaTeX compilation failed: {error_msg[:500]}"
-                }
-                async with aiofiles.open(self.log_file, 'a') as f:
-                    await f.write(json.dumps(entry) + '\n')
-                return False
+                logger.warning(f"LaTeX output of {self.job_name} did not settle after {PDFLATEX_MAX_RUNS} passes")
+            
+            seconds = sum(p["seconds"] for p in self.latex_passes)
+            await self._append_log({
+                "timestamp": datetime.now(timezone.utc).isoformat() + "Z",
+                "type": "system",
+                "content": f"LaTeX compiled in {len(self.latex_passes)} pass(es), {seconds:.2f}s"
+            })
+            return (self.workspace_dir / "solution.pdf").exists()
                 
         except Exception:
             logger.exception("PDF compilation failed")
@@ -180,10 +354,7 @@ class JobExecutor:
             
     def _build_command(self, model: str, disallowed_tools: str = "") -> list[str]:
         """Build the command to execute the AI agent"""
-        cli_tool = MODEL_CLI_MAPPING.get(model)
-        if not cli_tool:
-            logger.warning(f"Unknown model {model}, defaulting to {DEFAULT_CLI_TOOL} CLI")
-            cli_tool = DEFAULT_CLI_TOOL
+        cli_tool = cli_tool_for_model(model)
         
         cmd = [
             cli_tool,
@@ -211,11 +382,41 @@ class JobExecutor:
             
     async def _update_status(self, status: Optional[JobStatusEnum] = None, **kwargs):
         """Update job status"""
+        # A process still being sampled here was interrupted by an error or cancellation
+        await self._stop_monitor()
+        if status is not None and status.value in FINISHED_STATUSES:
+            # Everything the job logged must be on disk before it is reported finished
+            await self.log_writer.close()
+            kwargs["logIngest"] = {**self.log_writer.stats(), "events": self.coalescer.events}
+            if self.raw_writer is not None:
+                await self.raw_writer.close()
+            logger.info(f"Job {self.job_name} log ingest: {kwargs['logIngest']}")
+        
         current = await self._load_status()
         
         if status:
             current["status"] = status.value
+        
+        if self.resources and "resources" not in kwargs:
+            # Phases run by an earlier executor, e.g. the agent before a restart, are kept
+            kwargs["resources"] = {**current.get("resources", {}), **self.resources}
             
         current.update(kwargs)
         
-        atomic_write_json(self.status_file, current)
\ No newline at end of file
+        if self.job_index is not None:
+            self.job_index.write(self.job_name, current)
+        else:
+            atomic_write_json(self.status_file, current)
+        
+        if self.log_hub is not None:
+            self.log_hub.publish_status(self.job_name, current)
+            if current["status"] in FINISHED_STATUSES:
+                self.log_hub.close(self.job_name)
+        
+        if current["status"] in FINISHED_STATUSES:
+            # Nothing is appended after this; keep only the compressed logs
+            try:
+                await asyncio.to_thread(archive_log, self.log_file)
+                await asyncio.to_thread(archive_log, self.raw_log_file)
+            except OSError:
+                logger.exception(f"Failed to archive log of {self.job_name}")
\ No newline at end of file
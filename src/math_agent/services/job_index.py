@@ -0,0 +1,236 @@
+"""
+In-memory index of job statuses for the math agent system.
+
+The index holds the parsed content of every job's status.json so that
+listing jobs is a memory read instead of a directory scan. Writers inside
+the process (job creation, executor, cancellation) update it directly;
+edits made by other processes are picked up by comparing status.json
+modification times, at most once per refresh interval.
+
+Inside the event loop the directory scan for those edits runs in a worker
+thread and only the changes it finds are applied on the loop, so a request
+is a memory read however many jobs there are. Only the very first load,
+and callers outside an event loop, scan inline.
+
+Every change is written through to a SQLite catalog in the jobs
+directory, which serves filtered and paginated queries and lets a
+restarted process skip re-reading unchanged status files.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..core.metrics import STATUS_WRITE_DURATION
+from ..core.utils import atomic_write_json
+from .job_catalog import CATALOG_FILENAME, JobCatalog
+from ..config import JOB_CATALOG_PATH, JOB_INDEX_REFRESH_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+
+class JobIndex:
+    """Keeps job statuses in memory, in sync with status.json files"""
+
+    def __init__(self, jobs_dir: Path, refresh_interval: float = JOB_INDEX_REFRESH_INTERVAL,
+                 catalog: Optional[JobCatalog] = None):
+        self.jobs_dir = jobs_dir
+        self.refresh_interval = refresh_interval
+        if catalog is None:
+            jobs_dir.mkdir(parents=True, exist_ok=True)
+            catalog = JobCatalog(Path(JOB_CATALOG_PATH) if JOB_CATALOG_PATH else jobs_dir / CATALOG_FILENAME)
+        self.catalog = catalog
+        self._statuses: Dict[str, Dict[str, Any]] = {}
+        self._signatures: Dict[str, Tuple[int, int]] = {}
+        self._last_refresh: Optional[float] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        
+        # Start from the catalog; the first refresh re-reads only changed files
+        for job_name, (status, signature) in self.catalog.load().items():
+            self._statuses[job_name] = status
+            if signature:
+                self._signatures[job_name] = signature
+
+    def all(self) -> Dict[str, Dict[str, Any]]:
+        """Get the status of every job, refreshing from disk if stale"""
+        self.refresh_if_stale()
+        return dict(self._statuses)
+
+    def get(self, job_name: str) -> Optional[Dict[str, Any]]:
+        """Get the status of one job, re-reading it if status.json changed"""
+        if self._refresh_job(job_name):
+            self._sync([job_name])
+        return self._statuses.get(job_name)
+
+    def query(self, **filters) -> Tuple[int, List[Tuple[str, Dict[str, Any]]]]:
+        """Filter, sort and paginate jobs; see JobCatalog.query for the arguments"""
+        self.refresh_if_stale()
+        return self.catalog.query(**filters)
+
+    def seq(self) -> int:
+        """Get the current change sequence number, refreshing from disk if stale"""
+        self.refresh_if_stale()
+        return self.catalog.seq
+
+    def changes(self, since: int) -> Tuple[int, List[Tuple[str, Optional[Dict[str, Any]]]]]:
+        """
+        Get the jobs that changed after a change sequence number.
+
+        Returns the current sequence number and the changed jobs in change
+        order, with None as the status of jobs that were removed.
+        """
+        self.refresh_if_stale()
+        return self.catalog.seq, self.catalog.changes(since)
+
+    def update(self, job_name: str, status: Dict[str, Any]) -> None:
+        """Record a status that was just written to status.json"""
+        self.update_many({job_name: status})
+
+    def update_many(self, statuses: Dict[str, Dict[str, Any]]) -> None:
+        """Record several statuses that were just written, in one catalog transaction"""
+        for job_name, status in statuses.items():
+            self._statuses[job_name] = status
+            signature = self._stat_signature(job_name)
+            if signature:
+                self._signatures[job_name] = signature
+        self._sync(statuses)
+
+    def write(self, job_name: str, status: Dict[str, Any]) -> None:
+        """Write status.json atomically and update the index"""
+        started = time.perf_counter()
+        atomic_write_json(self._status_file(job_name), status)
+        STATUS_WRITE_DURATION.observe(time.perf_counter() - started)
+        self.update(job_name, status)
+
+    def refresh_if_stale(self) -> None:
+        """
+        Refresh from disk if the last refresh is older than the interval.
+
+        In an event loop this starts a background refresh and returns at
+        once; the current state is served until the refresh has finished.
+        """
+        now = time.monotonic()
+        if self._last_refresh is not None and now - self._last_refresh < self.refresh_interval:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is None or self._last_refresh is None:
+            self.refresh()
+        elif self._refresh_task is None or self._refresh_task.done():
+            self._last_refresh = now
+            self._refresh_task = loop.create_task(self._refresh_in_background())
+
+    def refresh(self) -> None:
+        """Pick up jobs created, changed or removed outside this process"""
+        snapshot = dict(self._signatures)
+        self._apply_scan(snapshot, *self._scan(snapshot))
+        self._last_refresh = time.monotonic()
+
+    async def _refresh_in_background(self) -> None:
+        snapshot = dict(self._signatures)
+        try:
+            seen, reloaded = await asyncio.to_thread(self._scan, snapshot)
+        except Exception:
+            logger.exception("Failed to refresh the job index")
+            return
+        self._apply_scan(snapshot, seen, reloaded)
+        self._last_refresh = time.monotonic()
+
+    def _scan(self, snapshot: Dict[str, Tuple[int, int]]) -> Tuple[set, Dict[str, Tuple[Dict[str, Any], Tuple[int, int]]]]:
+        """
+        List the jobs directory and read the status files that differ from snapshot.
+
+        Touches no shared state, so it can run in a worker thread.
+
+        Returns:
+            The job names on disk, and (status, signature) of the jobs whose
+            status.json changed
+        """
+        seen = set()
+        reloaded = {}
+        if not self.jobs_dir.exists():
+            return seen, reloaded
+        for job_dir in self.jobs_dir.iterdir():
+            # Dot directories hold the jobs directory's own data, e.g. .blobs
+            if not job_dir.is_dir() or job_dir.name.startswith("."):
+                continue
+            signature = self._stat_signature(job_dir.name)
+            if signature is None:
+                continue
+            seen.add(job_dir.name)
+            if snapshot.get(job_dir.name) == signature:
+                continue
+            try:
+                with open(self._status_file(job_dir.name), 'r') as f:
+                    reloaded[job_dir.name] = (json.load(f), signature)
+            except (FileNotFoundError, json.JSONDecodeError) as e:
+                logger.error(f"Failed to read status for {job_dir.name}: {e}")
+                # Keep the last known status; retry on the next refresh
+        return seen, reloaded
+
+    def _apply_scan(self, snapshot: Dict[str, Tuple[int, int]], seen: set,
+                    reloaded: Dict[str, Tuple[Dict[str, Any], Tuple[int, int]]]) -> None:
+        """Merge a scan into the index, keeping what this process wrote since the snapshot"""
+        changed = []
+        for job_name, (status, signature) in reloaded.items():
+            if self._signatures.get(job_name) != snapshot.get(job_name):
+                continue
+            self._statuses[job_name] = status
+            self._signatures[job_name] = signature
+            changed.append(job_name)
+
+        for job_name in list(self._statuses):
+            # Jobs created or written after the snapshot are newer than the scan
+            if job_name not in seen and self._signatures.get(job_name) == snapshot.get(job_name):
+                self._forget(job_name)
+                changed.append(job_name)
+
+        self._sync(changed)
+
+    def _refresh_job(self, job_name: str) -> bool:
+        """Reload one job's status if its status.json mtime or size changed; returns True if it did"""
+        signature = self._stat_signature(job_name)
+        if signature is None:
+            known = job_name in self._statuses
+            self._forget(job_name)
+            return known
+        if self._signatures.get(job_name) == signature:
+            return False
+
+        try:
+            with open(self._status_file(job_name), 'r') as f:
+                self._statuses[job_name] = json.load(f)
+            self._signatures[job_name] = signature
+            return True
+        except (FileNotFoundError, json.JSONDecodeError) as e:
+            logger.error(f"Failed to read status for {job_name}: {e}")
+            # Keep the last known status; retry on the next refresh
+            return False
+
+    def _sync(self, job_names) -> None:
+        """Write the current state of these jobs through to the catalog"""
+        self.catalog.upsert_many(
+            (name, self._statuses[name], self._signatures.get(name))
+            for name in job_names if name in self._statuses
+        )
+        self.catalog.delete_many(name for name in job_names if name not in self._statuses)
+
+    def _forget(self, job_name: str) -> None:
+        self._statuses.pop(job_name, None)
+        self._signatures.pop(job_name, None)
+
+    def _status_file(self, job_name: str) -> Path:
+        return self.jobs_dir / job_name / "status.json"
+
+    def _stat_signature(self, job_name: str) -> Optional[Tuple[int, int]]:
+        """Get status.json (mtime in nanoseconds, size), or None if missing"""
+        try:
+            st = self._status_file(job_name).stat()
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        return st.st_mtime_ns, st.st_size
@@ -0,0 +1,131 @@
+"""
+Lease files for sharing one jobs directory between several nodes.
+
+A node (worker process, possibly on another host over NFS) may only run
+a job while it holds the job's lease: a lease.json file in the job
+directory naming the node. Leases are created with a hard link from a
+private temporary file, which is atomic and fails if the lease exists,
+also on NFS where O_EXCL is not reliable. The holder renews the lease by
+touching it; a lease whose mtime is older than the TTL is expired and
+may be broken by another node.
+
+Breaking renames the lease to a name private to the breaking node, so
+only one node wins, and checks that what it moved away is really the
+expired lease before claiming the job. A holder that lost its lease
+finds out on its next renewal. Hosts' clocks must agree to well within
+the TTL.
+"""
+
+import json
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+from ..config import JOB_LEASE_TTL, NODE_ID
+
+logger = logging.getLogger(__name__)
+
+LEASE_FILENAME = "lease.json"
+
+
+class JobLeases:
+    """Acquires, renews and releases this node's job leases"""
+
+    def __init__(self, jobs_dir: Path, node_id: str = NODE_ID, ttl: float = JOB_LEASE_TTL):
+        self.jobs_dir = jobs_dir
+        self.node_id = node_id
+        self.ttl = ttl
+
+    def holder(self, job_name: str) -> Optional[str]:
+        """Get the node holding a job's lease, expired or not; None if there is no lease"""
+        try:
+            with open(self._path(job_name), 'r') as f:
+                return json.load(f).get("node")
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        except (json.JSONDecodeError, OSError):
+            # Written by link from a complete file, so this is a foreign file
+            return ""
+
+    def expired(self, job_name: str) -> bool:
+        """Check whether a job has no lease or one that was not renewed within the TTL"""
+        try:
+            return self._is_stale(self._path(job_name).stat().st_mtime)
+        except (FileNotFoundError, NotADirectoryError):
+            return True
+
+    def acquire(self, job_name: str) -> bool:
+        """Take a job's lease if it is free or expired; True if this node holds it now"""
+        if self.holder(job_name) == self.node_id:
+            return self.renew(job_name)
+
+        lease = self._path(job_name)
+        if lease.exists():
+            if not self.expired(job_name):
+                return False
+            if not self._break(job_name):
+                return False
+
+        tmp = lease.with_name(f".{LEASE_FILENAME}.{self.node_id}.tmp")
+        try:
+            with open(tmp, 'w') as f:
+                json.dump({
+                    "node": self.node_id,
+                    "acquiredAt": datetime.now(timezone.utc).isoformat() + "Z",
+                }, f)
+            os.link(tmp, lease)
+        except FileExistsError:
+            return False
+        except (FileNotFoundError, NotADirectoryError):
+            # The job directory was removed
+            return False
+        finally:
+            tmp.unlink(missing_ok=True)
+        logger.debug(f"Node {self.node_id} acquired lease of {job_name}")
+        return True
+
+    def renew(self, job_name: str) -> bool:
+        """Extend this node's lease; False if the lease was lost to another node"""
+        if self.holder(job_name) != self.node_id:
+            return False
+        try:
+            os.utime(self._path(job_name))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def release(self, job_name: str) -> None:
+        """Give up this node's lease, if it still holds it"""
+        if self.holder(job_name) == self.node_id:
+            self._path(job_name).unlink(missing_ok=True)
+
+    def _break(self, job_name: str) -> bool:
+        """Remove an expired lease; False if another node got there first"""
+        lease = self._path(job_name)
+        moved = lease.with_name(f".{LEASE_FILENAME}.{self.node_id}.broken")
+        try:
+            os.rename(lease, moved)
+        except FileNotFoundError:
+            return False
+
+        try:
+            if self._is_stale(moved.stat().st_mtime):
+                logger.info(f"Node {self.node_id} broke expired lease of {job_name}")
+                return True
+            # Another node broke the lease and claimed the job in the meantime; put its lease back
+            try:
+                os.link(moved, lease)
+            except FileExistsError:
+                pass
+            return False
+        finally:
+            moved.unlink(missing_ok=True)
+
+    def _is_stale(self, mtime: float) -> bool:
+        return time.time() - mtime > self.ttl
+
+    def _path(self, job_name: str) -> Path:
+        return self.jobs_dir / job_name / LEASE_FILENAME
@@ -0,0 +1,273 @@
+"""
+Job log access for the math agent system.
+
+Logs are JSON Lines files. Readers address them by byte offset so that
+pollers only fetch entries appended since their last read. The executor
+writes them through a buffered writer that batches appends.
+
+Once a job has finished its log is archived as log.jsonl.gz. Readers
+accept either form; offsets always refer to the uncompressed log. They
+open the plain log first and fall back to the archive, so a log archived
+between the two still reads as one or the other.
+"""
+
+import asyncio
+import gzip
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, Tuple
+
+from ..core.metrics import LOG_BYTES, LOG_LINES
+from ..config import LOG_FLUSH_BYTES, LOG_FLUSH_INTERVAL, LOG_ARCHIVE_LEVEL
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_SUFFIX = ".gz"
+
+
+def parse_log_line(line: str) -> Dict[str, Any]:
+    """Parse one log line, wrapping malformed content as a system entry"""
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError:
+        return {
+            "type": "system",
+            "content": f"Malformed log entry: {line[:100]}..."
+        }
+
+
+def read_log_entries(log_file: Path, since: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Read log entries appended after a byte offset.
+
+    Only complete lines are returned; a trailing line that is still being
+    written is left for the next read.
+
+    Args:
+        log_file: Path to the log.jsonl file
+        since: Byte offset to start reading from (a previous cursor)
+
+    Returns:
+        The parsed entries and the cursor to pass on the next read
+    """
+    opened = _open_raw(log_file)
+    if opened is None:
+        return [], 0
+
+    path, raw = opened
+    with raw:
+        f = gzip.GzipFile(fileobj=raw, mode='rb') if path.name.endswith(ARCHIVE_SUFFIX) else raw
+        f.seek(since)
+        data = f.read()
+
+    end = data.rfind(b"\n") + 1
+    entries = []
+    for line in data[:end].decode('utf-8', errors='replace').splitlines():
+        if line.strip():
+            entries.append(parse_log_line(line))
+
+    return entries, since + end
+
+
+def archived_log(log_file: Path) -> Path:
+    """Path of the compressed archive of a log"""
+    return log_file.with_name(log_file.name + ARCHIVE_SUFFIX)
+
+
+def resolve_log(log_file: Path) -> Optional[Path]:
+    """Get the log file or its archive, whichever exists"""
+    for path in (log_file, archived_log(log_file)):
+        if path.exists():
+            return path
+    return None
+
+
+def log_size(log_file: Path) -> int:
+    """Get the uncompressed size of a log, the upper bound for cursors"""
+    opened = _open_raw(log_file)
+    if opened is None:
+        return 0
+    path, raw = opened
+    with raw:
+        if path.name.endswith(ARCHIVE_SUFFIX):
+            # gzip stores the uncompressed size (modulo 4 GiB) in its last 4 bytes
+            raw.seek(-4, os.SEEK_END)
+            return int.from_bytes(raw.read(4), "little")
+        return os.fstat(raw.fileno()).st_size
+
+
+def archive_log(log_file: Path, level: int = LOG_ARCHIVE_LEVEL) -> bool:
+    """
+    Replace a finished job's log with a gzip archive.
+
+    The archive is written next to the log and renamed into place before
+    the plain log is removed, so readers always find one of the two.
+
+    Returns:
+        True if the log was archived
+    """
+    if level <= 0 or not log_file.exists():
+        return False
+
+    archive = archived_log(log_file)
+    temp_fd, temp_path = tempfile.mkstemp(dir=log_file.parent, prefix=".log.", suffix=".tmp")
+    try:
+        with os.fdopen(temp_fd, 'wb') as raw, open(log_file, 'rb') as src:
+            with gzip.GzipFile(filename="", mode='wb', compresslevel=level, fileobj=raw, mtime=0) as dst:
+                shutil.copyfileobj(src, dst, 1 << 20)
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(temp_path, archive)
+    except Exception:
+        try:
+            os.unlink(temp_path)
+        except Exception:
+            pass
+        raise
+
+    log_file.unlink()
+    logger.info(f"Archived {log_file} ({archive.stat().st_size} bytes compressed)")
+    return True
+
+
+def _open_raw(log_file: Path) -> Optional[Tuple[Path, BinaryIO]]:
+    """
+    Open the log or, failing that, its archive.
+
+    archive_log renames the archive into place before unlinking the log,
+    so trying them in this order cannot miss a log that is being archived.
+    """
+    for path in (log_file, archived_log(log_file)):
+        try:
+            return path, open(path, 'rb')
+        except FileNotFoundError:
+            continue
+    return None
+
+
+class JobLogWriter:
+    """
+    Appends entries to a job log in batches.
+
+    The file is kept open and entries are buffered in memory, then written
+    with a single call once LOG_FLUSH_BYTES are buffered or the oldest
+    buffered entry is LOG_FLUSH_INTERVAL seconds old. Callers must flush
+    or close the writer when the job finishes.
+    """
+
+    def __init__(
+        self,
+        log_file: Path,
+        flush_bytes: int = LOG_FLUSH_BYTES,
+        flush_interval: float = LOG_FLUSH_INTERVAL,
+        on_flush: Optional[Callable[[int], None]] = None,
+    ):
+        self.log_file = log_file
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.on_flush = on_flush
+        self._file: Optional[BinaryIO] = None
+        self._buffer: List[bytes] = []
+        self._buffered_bytes = 0
+        self._offset: Optional[int] = None
+        self._lock = asyncio.Lock()
+        self._flush_timer: Optional[asyncio.TimerHandle] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._pending_write: Optional[asyncio.Future] = None
+        # Ingest accounting
+        self._lines = 0
+        self._bytes = 0
+        self._flushes = 0
+        self._started: Optional[float] = None
+
+    @property
+    def offset(self) -> int:
+        """Byte offset just after the last written entry, including buffered ones"""
+        if self._offset is None:
+            self._offset = self.log_file.stat().st_size if self.log_file.exists() else 0
+        return self._offset
+
+    async def write(self, entry: Dict[str, Any]) -> int:
+        """Buffer an entry and return the log offset just after it"""
+        data = (json.dumps(entry) + '\n').encode('utf-8')
+        offset = self.offset + len(data)
+        self._offset = offset
+        self._buffer.append(data)
+        self._buffered_bytes += len(data)
+        self._lines += 1
+        self._bytes += len(data)
+        LOG_LINES.inc()
+        LOG_BYTES.inc(len(data))
+        if self._started is None:
+            self._started = time.monotonic()
+
+        if self._buffered_bytes >= self.flush_bytes:
+            await self.flush()
+        elif self._flush_timer is None:
+            loop = asyncio.get_running_loop()
+            self._flush_timer = loop.call_later(self.flush_interval, self._start_timed_flush)
+        return offset
+
+    async def flush(self) -> None:
+        """Write all buffered entries to disk"""
+        self._cancel_timer()
+        async with self._lock:
+            if self._pending_write is not None:
+                # A write interrupted by cancellation must land before the next one
+                await self._pending_write
+                self._pending_write = None
+            if not self._buffer:
+                return
+            data = b"".join(self._buffer)
+            self._buffer = []
+            self._buffered_bytes = 0
+            flushed_offset = self._offset
+            self._pending_write = asyncio.ensure_future(asyncio.to_thread(self._write, data))
+            await asyncio.shield(self._pending_write)
+            self._pending_write = None
+            self._flushes += 1
+        if self.on_flush is not None and flushed_offset is not None:
+            self.on_flush(flushed_offset)
+
+    async def close(self) -> None:
+        """Flush and close the file; a later write reopens it"""
+        if self._flush_task is not None:
+            task, self._flush_task = self._flush_task, None
+            await task
+        await self.flush()
+        if self._file is not None:
+            file, self._file = self._file, None
+            await asyncio.to_thread(file.close)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get ingest counters and rates since the first entry"""
+        elapsed = time.monotonic() - self._started if self._started is not None else 0.0
+        return {
+            "lines": self._lines,
+            "bytes": self._bytes,
+            "flushes": self._flushes,
+            "seconds": round(elapsed, 3),
+            "linesPerSecond": round(self._lines / elapsed, 1) if elapsed > 0 else 0.0,
+            "bytesPerSecond": round(self._bytes / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+
+    def _write(self, data: bytes) -> None:
+        # Runs in a worker thread: one open per writer, one write per flush
+        if self._file is None:
+            self._file = open(self.log_file, 'ab')
+        self._file.write(data)
+        self._file.flush()
+
+    def _start_timed_flush(self) -> None:
+        self._flush_timer = None
+        self._flush_task = asyncio.ensure_future(self.flush())
+
+    def _cancel_timer(self) -> None:
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
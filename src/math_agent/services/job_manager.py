@@ -3,18 +3,67 @@ Job queue management for the math agent system.
 
 This module manages the job queue, handles concurrent execution,
 and coordinates job lifecycle.
+
+Jobs are queued when they are submitted through the API. Jobs in setup
+state that are already on disk at startup are queued once, and, unless
+JOB_SCAN_INTERVAL is 0, job directories dropped into the jobs directory
+by other processes are picked up by watching the directory's mtime. A
+job is in the queue at most once.
+
+Each model has its own queue and workers, and models share a concurrency
+limit and an optional start-rate limit per CLI tool, so providers with
+independent upstream limits never wait for each other. Optionally
+(ADAPTIVE_CONCURRENCY) a controller additionally limits agent jobs across
+all lanes, growing and shrinking the limit with host load and memory.
+
+LaTeX compilation is a separate stage with its own LATEX_WORKERS pool:
+an agent slot is released as soon as the agent exits, and the job waits
+in compiling state for a compile worker.
+
+With JOB_LEASE_TTL set, several managers (worker processes or hosts)
+share one jobs directory. Every node queues the setup jobs it sees, and
+a worker runs a job only after taking its lease (see job_lease). The
+lease is held until the compile stage ends and renewed meanwhile; jobs
+whose node stopped renewing are taken over: running jobs are reset to
+setup and run again, compiling jobs are compiled. A node with
+RUN_WORKERS=false runs no workers and leaves execution to the others.
+
+A single node journals its queue (see queue_journal). On start it
+restores the queue in its original order and handles jobs a previous
+process left in running state according to ORPHAN_POLICY: they are
+queued again ahead of the restored queue, or marked as errors. stop()
+leaves running jobs in running state so they are recovered the same way.
 """
 
 import asyncio
 import json
 import logging
+import time
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict
-from contextlib import suppress
+from typing import Any, Dict, List, Optional, Set
+from contextlib import nullcontext, suppress
 
-from .job_executor import JobExecutor
-from ..core.models import JobStatusEnum
-from ..config import JOB_SCAN_INTERVAL, MAX_CONCURRENT_JOBS
+from .job_executor import JobExecutor, cli_tool_for_model
+from .job_index import JobIndex
+from .job_lease import JobLeases
+from .job_log import archive_log
+from .log_hub import LogHub
+from .pdf_cache import PdfCache
+from .queue_journal import FINISHED, JOURNAL_FILENAME, QUEUED, STARTED, QueueJournal
+from .scheduling import AdaptiveLimit, ConcurrencyController, RateLimiter, read_host_sample
+from ..core.models import JobStatusEnum, ACTIVE_STATUSES, FINISHED_STATUSES
+from ..core.utils import atomic_write_json
+from ..core.metrics import (
+    CONCURRENCY_ADJUSTMENTS, CONCURRENCY_LIMIT, JOB_DURATION, QUEUE_DEPTH, QUEUE_WAIT, RUNNING_JOBS, WORKERS,
+)
+from ..config import (
+    JOB_SCAN_INTERVAL, MAX_CONCURRENT_JOBS, MODEL_CLI_MAPPING, LATEX_WORKERS,
+    CLI_CONCURRENCY_LIMITS, MODEL_CONCURRENCY_LIMITS, CLI_RATE_LIMITS,
+    JOB_LEASE_TTL, RUN_WORKERS, ORPHAN_POLICY, ORPHAN_POLICIES,
+    ADAPTIVE_CONCURRENCY, ADAPTIVE_MIN_JOBS, ADAPTIVE_MAX_JOBS, ADAPTIVE_INTERVAL,
+    ADAPTIVE_MAX_LOAD, ADAPTIVE_MIN_FREE_MEMORY,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -22,51 +71,161 @@ logger = logging.getLogger(__name__)
 class JobManager:
     """Manages job execution queue and lifecycle"""
     
-    def __init__(self, jobs_dir: Path, max_concurrent_jobs: int = MAX_CONCURRENT_JOBS):
+    def __init__(self, jobs_dir: Path, max_concurrent_jobs: int = MAX_CONCURRENT_JOBS,
+                 job_index: Optional[JobIndex] = None, log_hub: Optional[LogHub] = None,
+                 cli_limits: Optional[Dict[str, int]] = None,
+                 model_limits: Optional[Dict[str, int]] = None,
+                 cli_rate_limits: Optional[Dict[str, int]] = None,
+                 latex_workers: int = LATEX_WORKERS,
+                 pdf_cache: Optional[PdfCache] = None,
+                 leases: Optional[JobLeases] = None,
+                 run_workers: bool = RUN_WORKERS,
+                 journal: Optional[QueueJournal] = None,
+                 orphan_policy: str = ORPHAN_POLICY,
+                 controller: Optional[ConcurrencyController] = None,
+                 adapt_interval: float = ADAPTIVE_INTERVAL):
         self.jobs_dir = jobs_dir
+        self.job_index = job_index
+        self.log_hub = log_hub
+        self.pdf_cache = pdf_cache
+        # Lease files when the jobs directory is shared with other nodes
+        if leases is None and JOB_LEASE_TTL > 0:
+            leases = JobLeases(jobs_dir)
+        self.leases = leases
+        self.run_workers = run_workers
+        # With leases, jobs of a stopped node are taken over instead of replayed
+        if journal is None and leases is None:
+            journal = QueueJournal(jobs_dir / JOURNAL_FILENAME)
+        self.journal = journal
+        if orphan_policy not in ORPHAN_POLICIES:
+            raise ValueError(f"ORPHAN_POLICY must be one of {', '.join(ORPHAN_POLICIES)}, got {orphan_policy!r}")
+        self.orphan_policy = orphan_policy
+        if controller is None and ADAPTIVE_CONCURRENCY:
+            controller = ConcurrencyController(
+                AdaptiveLimit(ADAPTIVE_MIN_JOBS), ADAPTIVE_MIN_JOBS, ADAPTIVE_MAX_JOBS,
+                max_load=ADAPTIVE_MAX_LOAD, min_free_memory=ADAPTIVE_MIN_FREE_MEMORY
+            )
+        self.controller = controller
+        self.adapt_interval = adapt_interval
+        # Default concurrency limit for CLI tools without their own limit
         self.max_concurrent_jobs = max_concurrent_jobs
+        self.cli_limits = CLI_CONCURRENCY_LIMITS if cli_limits is None else cli_limits
+        self.model_limits = MODEL_CONCURRENCY_LIMITS if model_limits is None else model_limits
+        self.cli_rate_limits = CLI_RATE_LIMITS if cli_rate_limits is None else cli_rate_limits
         self.running_jobs: Dict[str, asyncio.Task] = {}
-        self.job_queue: asyncio.Queue = asyncio.Queue()
+        self.model_queues: Dict[str, asyncio.Queue] = {}
+        self.latex_workers = latex_workers
+        self.compile_queue: asyncio.Queue = asyncio.Queue()
         self.executors: Dict[str, JobExecutor] = {}
+        self._queued: Set[str] = set()
+        self._enqueued_at: Dict[str, float] = {}
+        self._known_jobs: Set[str] = set()
+        self._jobs_dir_mtime: Optional[int] = None
+        self._cli_slots: Dict[str, asyncio.Semaphore] = {}
+        self._cli_rate_limiters: Dict[str, RateLimiter] = {}
+        self._running_per_cli: Dict[str, int] = {}
         self._running = False
         self._workers = []
+        self._watcher: Optional[asyncio.Task] = None
+        self._archivers: Set[asyncio.Task] = set()
+        self._held: Set[str] = set()
+        self._lease_keeper: Optional[asyncio.Task] = None
+        self._adapter: Optional[asyncio.Task] = None
         
     async def start(self):
         """Start the job manager"""
+        if not self.run_workers:
+            self._running = True
+            logger.info("Job manager started without workers; jobs run on worker nodes")
+            return
+        
+        # Restore the previous process's queue before any worker takes from it
+        if self.journal is not None:
+            await self._recover_queue()
         self._running = True
         
-        # Start worker tasks
-        for i in range(self.max_concurrent_jobs):
-            worker = asyncio.create_task(self._worker(i))
-            self._workers.append(worker)
+        # Start worker tasks for lanes used before start and for every known
+        # model; other models get theirs on first use
+        for model in self.model_queues:
+            self._start_workers(model)
+        for model in MODEL_CLI_MAPPING:
+            self._ensure_lane(model)
+        for i in range(self.latex_workers):
+            self._workers.append(asyncio.create_task(self._compile_worker(i)))
             
-        # Start job scanner
-        asyncio.create_task(self._scan_for_jobs())
+        # Queue jobs left in setup state, then watch for jobs created externally
+        await self._scan_for_new_jobs()
+        if JOB_SCAN_INTERVAL > 0:
+            self._watcher = asyncio.create_task(self._watch_for_jobs())
+        if self.leases is not None:
+            self._lease_keeper = asyncio.create_task(self._keep_leases())
+        if self.controller is not None:
+            CONCURRENCY_LIMIT.set(self.controller.limit.limit)
+            self._adapter = asyncio.create_task(self._adapt_concurrency())
         
-        logger.info(f"Job manager started with {self.max_concurrent_jobs} workers")
+        logger.info(f"Job manager started with {len(self._workers)} workers")
         
     async def stop(self):
         """Stop the job manager"""
         self._running = False
         
-        # Cancel all running jobs
-        for job_name, task in self.running_jobs.items():
-            task.cancel()
-            with suppress(asyncio.CancelledError):
-                await task
-                
-        # Stop workers
+        for task in (self._watcher, self._lease_keeper, self._adapter):
+            if task:
+                task.cancel()
+                with suppress(asyncio.CancelledError):
+                    await task
+        
+        # Stop workers and their jobs' processes; the jobs stay in running
+        # state and are recovered on the next start
+        for executor in self.executors.values():
+            executor.abandoned = True
         for worker in self._workers:
             worker.cancel()
             with suppress(asyncio.CancelledError):
                 await worker
+        for job_name, task in list(self.running_jobs.items()):
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+        
+        for job_name in list(self._held):
+            self._release(job_name)
+        if self.journal is not None:
+            self.journal.close()
                 
         logger.info("Job manager stopped")
         
-    async def submit_job(self, job_name: str):
-        """Submit a job for execution"""
-        await self.job_queue.put(job_name)
-        logger.info(f"Job {job_name} submitted to queue")
+    async def submit_job(self, job_name: str) -> bool:
+        """Submit a job for execution; returns False if it is already queued or running"""
+        self._known_jobs.add(job_name)
+        if not self.run_workers:
+            # Worker nodes pick the job up from the shared jobs directory
+            return False
+        if job_name in self._queued or job_name in self.running_jobs:
+            logger.debug(f"Job {job_name} is already queued or running")
+            return False
+        
+        await self._enqueue(job_name)
+        self._record(QUEUED, job_name)
+        return True
+        
+    async def _enqueue(self, job_name: str):
+        """Put a job on its model's queue"""
+        status = self._read_status(job_name) or {}
+        model = status.get("model", "claude-opus-4")
+        self._queued.add(job_name)
+        self._enqueued_at[job_name] = time.monotonic()
+        await self._ensure_lane(model).put(job_name)
+        QUEUE_DEPTH.set(self.model_queues[model].qsize(), queue=model)
+        logger.info(f"Job {job_name} submitted to {model} queue")
+        
+    async def submit_jobs(self, job_names: List[str]) -> int:
+        """Submit several jobs at once; returns how many were queued"""
+        queued = 0
+        for job_name in job_names:
+            if await self.submit_job(job_name):
+                queued += 1
+        return queued
         
     async def cancel_job(self, job_name: str) -> bool:
         """Cancel a running job"""
@@ -86,42 +245,66 @@ class JobManager:
             return True
         return False
         
-    async def _worker(self, worker_id: int):
-        """Worker task that processes jobs from the queue"""
-        logger.info(f"Worker {worker_id} started")
+    def _ensure_lane(self, model: str) -> asyncio.Queue:
+        """Get the model's queue, creating its scheduling lane on first use"""
+        if model in self.model_queues:
+            return self.model_queues[model]
+        
+        cli_tool = cli_tool_for_model(model)
+        if cli_tool not in self._cli_slots:
+            self._cli_slots[cli_tool] = asyncio.Semaphore(self._cli_limit(cli_tool))
+            self._running_per_cli[cli_tool] = 0
+            rate_limit = self.cli_rate_limits.get(cli_tool)
+            if rate_limit:
+                self._cli_rate_limiters[cli_tool] = RateLimiter(rate_limit)
+        
+        self.model_queues[model] = asyncio.Queue()
+        if self._running:
+            self._start_workers(model)
+        return self.model_queues[model]
+        
+    def _start_workers(self, model: str):
+        """Start as many workers for a model as it may run jobs at once"""
+        cli_limit = self._cli_limit(cli_tool_for_model(model))
+        count = min(self.model_limits.get(model, cli_limit), cli_limit)
+        for i in range(count):
+            worker = asyncio.create_task(self._worker(model, i))
+            self._workers.append(worker)
+            
+    def _cli_limit(self, cli_tool: str) -> int:
+        return self.cli_limits.get(cli_tool, self.max_concurrent_jobs)
+        
+    async def _worker(self, model: str, worker_id: int):
+        """Worker task that processes jobs from a model's queue"""
+        worker_name = f"{model}/{worker_id}"
+        queue = self.model_queues[model]
+        cli_tool = cli_tool_for_model(model)
+        logger.info(f"Worker {worker_name} started")
+        WORKERS.inc(pool="agent", state="idle")
         
         while self._running:
             try:
                 # Get job from queue with timeout
-                job_name = await asyncio.wait_for(
-                    self.job_queue.get(),
-                    timeout=1.0
-                )
+                job_name = await asyncio.wait_for(queue.get(), timeout=1.0)
+                QUEUE_DEPTH.set(queue.qsize(), queue=model)
                 
-                logger.info(f"Worker {worker_id} processing job {job_name}")
-                
-                # Create executor
-                job_dir = self.jobs_dir / job_name
-                executor = JobExecutor(job_dir)
-                self.executors[job_name] = executor
-                
-                # Create task
-                task = asyncio.create_task(executor.execute())
-                self.running_jobs[job_name] = task
-                
-                try:
-                    # Wait for completion
-                    await task
-                    logger.info(f"Job {job_name} completed")
-                except asyncio.CancelledError:
-                    logger.info(f"Job {job_name} was cancelled")
-                    raise
-                except Exception as e:
-                    logger.error(f"Job {job_name} failed: {e}")
-                finally:
-                    # Cleanup
-                    self.running_jobs.pop(job_name, None)
-                    self.executors.pop(job_name, None)
+                # Wait for a slot of the CLI tool, then for a slot of the adaptive
+                # limit, and take a start within the CLI tool's rate limit last:
+                # a job waiting for a saturated CLI tool must not hold a slot other
+                # lanes could use, and a token taken before a long wait would let
+                # a burst of starts exceed the rate limit once slots free up
+                adaptive_slot = self.controller.limit if self.controller is not None else nullcontext()
+                async with self._cli_slots[cli_tool]:
+                    async with adaptive_slot:
+                        rate_limiter = self._cli_rate_limiters.get(cli_tool)
+                        if rate_limiter:
+                            await rate_limiter.acquire()
+                        
+                        self._running_per_cli[cli_tool] += 1
+                        try:
+                            await self._run_job(worker_name, job_name)
+                        finally:
+                            self._running_per_cli[cli_tool] -= 1
                     
             except asyncio.TimeoutError:
                 # No jobs in queue, continue
@@ -130,50 +313,373 @@ class JobManager:
                 # Worker is being stopped
                 break
             except Exception as e:
-                logger.exception(f"Worker {worker_id} error: {e}")
+                logger.exception(f"Worker {worker_name} error: {e}")
                 await asyncio.sleep(1)  # Prevent tight loop on errors
                 
-        logger.info(f"Worker {worker_id} stopped")
+        WORKERS.dec(pool="agent", state="idle")
+        logger.info(f"Worker {worker_name} stopped")
+        
+    async def _run_job(self, worker_name: str, job_name: str):
+        """Execute one job unless it left setup state while waiting"""
+        enqueued_at = self._enqueued_at.pop(job_name, None)
+        if job_name in self.running_jobs:
+            # A duplicate entry; the journal must keep the job as started
+            self._queued.discard(job_name)
+            logger.info(f"Worker {worker_name} skipping job {job_name}: already running here")
+            return
+        if not self._claim(job_name):
+            self._queued.discard(job_name)
+            self._record(FINISHED, job_name)
+            logger.info(f"Worker {worker_name} skipping job {job_name}: running on another node")
+            return
+        
+        # Skip jobs cancelled or started elsewhere while they were queued
+        status = self._read_status(job_name)
+        if not status or status.get("status") != JobStatusEnum.SETUP.value:
+            self._queued.discard(job_name)
+            self._done(job_name)
+            logger.info(f"Worker {worker_name} skipping job {job_name}: no longer in setup")
+            return
+        
+        model = status.get("model", "claude-opus-4")
+        if enqueued_at is not None:
+            QUEUE_WAIT.observe(time.monotonic() - enqueued_at, model=model)
+        
+        logger.info(f"Worker {worker_name} processing job {job_name}")
+        
+        # Create executor
+        job_dir = self.jobs_dir / job_name
+        executor = JobExecutor(job_dir, self.job_index, self.log_hub, self.pdf_cache)
+        
+        # Run the agent; compilation happens after this worker's slot is released
+        self._record(STARTED, job_name)
+        needs_compile = await self._track(job_name, executor, "agent", executor.run_agent(), model)
+        agent_rss = getattr(executor, "resources", {}).get("agent", {}).get("maxRssBytes")
+        if self.controller is not None and agent_rss:
+            self.controller.observe_job_rss(agent_rss)
+        if needs_compile:
+            await self.compile_queue.put((job_name, executor))
+            QUEUE_DEPTH.set(self.compile_queue.qsize(), queue="compile")
+        else:
+            self._done(job_name)
+            
+    async def _compile_worker(self, worker_id: int):
+        """Worker task that compiles solutions of jobs whose agent has finished"""
+        logger.info(f"Compile worker {worker_id} started")
+        WORKERS.inc(pool="latex", state="idle")
         
-    async def _scan_for_jobs(self):
-        """Periodically scan for jobs in setup state"""
         while self._running:
             try:
-                # Check all job directories
-                if self.jobs_dir.exists():
-                    for job_dir in self.jobs_dir.iterdir():
-                        if not job_dir.is_dir():
-                            continue
-                            
-                        job_name = job_dir.name
-                        
-                        # Skip if already running
-                        if job_name in self.running_jobs:
-                            continue
-                            
-                        # Check status
-                        status_file = job_dir / "status.json"
-                        if status_file.exists():
-                            try:
-                                with open(status_file, 'r') as f:
-                                    status = json.load(f)
-                                    
-                                if status.get("status") == JobStatusEnum.SETUP.value:
-                                    # Submit for execution
-                                    await self.submit_job(job_name)
-                            except (FileNotFoundError, json.JSONDecodeError) as e:
-                                logger.error(f"Failed to read status for {job_name}: {e}")
-                                # Skip this job and continue with others
-                                
+                job_name, executor = await asyncio.wait_for(self.compile_queue.get(), timeout=1.0)
+                QUEUE_DEPTH.set(self.compile_queue.qsize(), queue="compile")
+                
+                if not self._claim(job_name):
+                    logger.info(f"Compile worker {worker_id} skipping job {job_name}: compiling on another node")
+                    continue
+                
+                # Skip jobs cancelled while waiting for compilation
+                status = self._read_status(job_name)
+                if not status or status.get("status") != JobStatusEnum.COMPILING.value:
+                    self._done(job_name)
+                    logger.info(f"Compile worker {worker_id} skipping job {job_name}: no longer compiling")
+                    continue
+                
+                logger.info(f"Compile worker {worker_id} compiling job {job_name}")
+                await self._track(job_name, executor, "compile", executor.compile(),
+                                  status.get("model", "claude-opus-4"))
+                self._done(job_name)
+                
+            except asyncio.TimeoutError:
+                continue
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.exception(f"Compile worker {worker_id} error: {e}")
+                await asyncio.sleep(1)  # Prevent tight loop on errors
+                
+        WORKERS.dec(pool="latex", state="idle")
+        logger.info(f"Compile worker {worker_id} stopped")
+        
+    async def _track(self, job_name: str, executor: JobExecutor, stage: str, coro,
+                     model: str = "unknown") -> Any:
+        """Run a job stage as a cancellable task registered in running_jobs"""
+        self.executors[job_name] = executor
+        
+        # Create task
+        task = asyncio.create_task(coro)
+        self.running_jobs[job_name] = task
+        self._queued.discard(job_name)
+        
+        pool = "agent" if stage == "agent" else "latex"
+        WORKERS.dec(pool=pool, state="idle")
+        WORKERS.inc(pool=pool, state="busy")
+        RUNNING_JOBS.inc(model=model, stage=stage)
+        started = time.monotonic()
+        try:
+            # Wait for completion
+            result = await task
+            logger.info(f"Job {job_name} {stage} stage finished")
+            return result
+        except asyncio.CancelledError:
+            if asyncio.current_task().cancelling():
+                # The worker itself is being stopped
+                raise
+            # Only this job was cancelled; the worker keeps going
+            logger.info(f"Job {job_name} was cancelled")
+        except Exception as e:
+            logger.error(f"Job {job_name} failed: {e}")
+        finally:
+            # Cleanup
+            self.running_jobs.pop(job_name, None)
+            self.executors.pop(job_name, None)
+            JOB_DURATION.observe(time.monotonic() - started, model=model, stage=stage)
+            RUNNING_JOBS.dec(model=model, stage=stage)
+            WORKERS.dec(pool=pool, state="busy")
+            WORKERS.inc(pool=pool, state="idle")
+        return None
+            
+    def _claim(self, job_name: str) -> bool:
+        """Take the job's lease, if jobs are leased; True if this node may run it"""
+        if self.leases is None:
+            return True
+        if not self.leases.acquire(job_name):
+            return False
+        self._held.add(job_name)
+        return True
+        
+    def _done(self, job_name: str):
+        """The job has left this node's queues and stages"""
+        self._record(FINISHED, job_name)
+        self._release(job_name)
+        
+    def _record(self, event: str, job_name: str):
+        if self.journal is not None:
+            self.journal.append(event, job_name)
+            
+    async def _recover_queue(self):
+        """Requeue jobs from the journal and handle jobs left running by a previous process"""
+        if not self.jobs_dir.exists():
+            return
+        queued, started = self.journal.replay()
+        # Jobs started before there was a journal are orphans too
+        orphans = started + [name for name, status in self._active_jobs().items()
+                             if status.get("status") == JobStatusEnum.RUNNING.value and name not in started]
+        
+        requeued = []
+        for job_name in orphans:
+            status = self._read_status(job_name)
+            if not status or status.get("status") != JobStatusEnum.RUNNING.value:
+                # Finished, or compiling, which the startup scan picks up
+                continue
+            status = dict(status)
+            if self.orphan_policy == "requeue":
+                logger.warning(f"Requeueing job {job_name}, left running by a previous process")
+                status["status"] = JobStatusEnum.SETUP.value
+                status["requeues"] = status.get("requeues", 0) + 1
+                requeued.append(job_name)
+            else:
+                logger.warning(f"Marking job {job_name} as failed, left running by a previous process")
+                status["status"] = JobStatusEnum.ERROR.value
+                status["completedAt"] = datetime.now(timezone.utc).isoformat() + "Z"
+                status["error"] = "Interrupted by a server restart"
+            self._write_status(job_name, status)
+        
+        order = []
+        for job_name in requeued + queued:
+            status = self._read_status(job_name)
+            if status and status.get("status") == JobStatusEnum.SETUP.value:
+                order.append(job_name)
+        self.journal.rewrite(order)
+        for job_name in order:
+            self._known_jobs.add(job_name)
+            await self._enqueue(job_name)
+        if order or orphans:
+            logger.info(f"Restored {len(order)} queued jobs from the journal")
+            
+    def _release(self, job_name: str):
+        """Give up the job's lease once this node is done with it"""
+        if self.leases is not None:
+            self._held.discard(job_name)
+            self.leases.release(job_name)
+            
+    async def _keep_leases(self):
+        """Renew this node's leases and take over jobs of nodes that stopped renewing theirs"""
+        while self._running:
+            await asyncio.sleep(self.leases.ttl / 3)
+            try:
+                await self._renew_leases()
+                await self._take_over_expired()
             except Exception as e:
-                logger.exception(f"Job scanner error: {e}")
+                logger.exception(f"Lease keeper error: {e}")
                 
-            # Wait before next scan
+    async def _renew_leases(self):
+        """Renew held leases; stop jobs whose lease was lost or that were cancelled on another node"""
+        for job_name in list(self._held):
+            if not self.leases.renew(job_name):
+                self._held.discard(job_name)
+                logger.warning(f"Lost lease of job {job_name} to another node")
+                executor = self.executors.get(job_name)
+                task = self.running_jobs.get(job_name)
+                if executor is not None and task is not None:
+                    executor.abandoned = True
+                    task.cancel()
+                continue
+            
+            # Cancelling through an API node only writes the status
+            status = self._read_status(job_name)
+            if status and status.get("status") == JobStatusEnum.CANCELLED.value and job_name in self.running_jobs:
+                logger.info(f"Job {job_name} was cancelled on another node")
+                await self.cancel_job(job_name)
+                
+    async def _take_over_expired(self):
+        """Run unfinished jobs whose lease expired, e.g. because their node died"""
+        for job_name, status in self._active_jobs().items():
+            if job_name in self._held or job_name in self._queued or job_name in self.running_jobs:
+                continue
+            if not self.leases.expired(job_name):
+                continue
+            
+            if status.get("status") == JobStatusEnum.SETUP.value:
+                # Claimed by a worker of this node once a slot is free
+                await self.submit_job(job_name)
+                continue
+            
+            if not self._claim(job_name):
+                continue
+            status = self._read_status(job_name)
+            if not status or status.get("status") not in ACTIVE_STATUSES:
+                # Finished just before its node released the lease
+                self._release(job_name)
+                continue
+            
+            logger.warning(f"Taking over job {job_name} from a node that stopped renewing its lease")
+            if status.get("status") == JobStatusEnum.COMPILING.value:
+                executor = JobExecutor(self.jobs_dir / job_name, self.job_index, self.log_hub, self.pdf_cache)
+                await self.compile_queue.put((job_name, executor))
+                QUEUE_DEPTH.set(self.compile_queue.qsize(), queue="compile")
+                continue
+            
+            # The agent run died with its node; start it again
+            status = dict(status)
+            status["status"] = JobStatusEnum.SETUP.value
+            status["leaseTakeovers"] = status.get("leaseTakeovers", 0) + 1
+            self._write_status(job_name, status)
+            self._release(job_name)
+            await self.submit_job(job_name)
+            
+    def _active_jobs(self) -> Dict[str, Dict[str, Any]]:
+        """Statuses of the jobs that are not finished"""
+        if self.job_index is not None:
+            statuses = self.job_index.all()
+        else:
+            statuses = {}
+            for job_dir in self.jobs_dir.iterdir():
+                if job_dir.is_dir() and not job_dir.name.startswith("."):
+                    statuses[job_dir.name] = self._read_status(job_dir.name)
+        return {name: status for name, status in statuses.items()
+                if status and status.get("status") in ACTIVE_STATUSES}
+                
+    async def _adapt_concurrency(self):
+        """Periodically resize the adaptive concurrency limit"""
+        while self._running:
+            await asyncio.sleep(self.adapt_interval)
+            try:
+                change = await self.controller.adjust(read_host_sample())
+            except Exception as e:
+                logger.exception(f"Concurrency controller error: {e}")
+                continue
+            if change:
+                old, new, reason = change
+                logger.info(f"Concurrency limit {old} -> {new}: {reason}")
+                CONCURRENCY_LIMIT.set(new)
+                CONCURRENCY_ADJUSTMENTS.inc(direction="up" if new > old else "down")
+                
+    async def _watch_for_jobs(self):
+        """Periodically check the jobs directory for jobs created externally"""
+        while self._running:
             await asyncio.sleep(JOB_SCAN_INTERVAL)
+            try:
+                await self._scan_for_new_jobs()
+            except Exception as e:
+                logger.exception(f"Job watcher error: {e}")
+                
+    async def _scan_for_new_jobs(self):
+        """Queue setup jobs in directories not seen before, if the jobs directory changed"""
+        try:
+            mtime = self.jobs_dir.stat().st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._jobs_dir_mtime:
+            return
+        self._jobs_dir_mtime = mtime
+        
+        unarchived = []
+        for job_dir in self.jobs_dir.iterdir():
+            job_name = job_dir.name
+            if job_name in self._known_jobs or job_name.startswith(".") or not job_dir.is_dir():
+                continue
+                
+            status = self._read_status(job_name)
+            if status is None:
+                # status.json not written yet; look again on the next change
+                self._jobs_dir_mtime = None
+                continue
+                
+            self._known_jobs.add(job_name)
+            if status.get("status") == JobStatusEnum.SETUP.value:
+                await self.submit_job(job_name)
+            elif status.get("status") == JobStatusEnum.COMPILING.value and job_name not in self.running_jobs:
+                # Agent finished before a restart; only the compile stage is left
+                executor = JobExecutor(job_dir, self.job_index, self.log_hub, self.pdf_cache)
+                await self.compile_queue.put((job_name, executor))
+                QUEUE_DEPTH.set(self.compile_queue.qsize(), queue="compile")
+            elif status.get("status") in FINISHED_STATUSES and (job_dir / "log.jsonl").exists():
+                # Finished before logs were archived, or archiving failed
+                unarchived.append(job_dir / "log.jsonl")
+        
+        if unarchived:
+            task = asyncio.create_task(asyncio.to_thread(self._archive_logs, unarchived))
+            self._archivers.add(task)
+            task.add_done_callback(self._archivers.discard)
+            
+    @staticmethod
+    def _archive_logs(log_files: List[Path]):
+        """Compress finished jobs' logs; runs in a worker thread"""
+        for log_file in log_files:
+            try:
+                archive_log(log_file)
+            except OSError as e:
+                logger.error(f"Failed to archive {log_file}: {e}")
+                
+    def _read_status(self, job_name: str) -> Optional[Dict[str, Any]]:
+        """Read a job's status through the index, or from disk without one"""
+        if self.job_index is not None:
+            return self.job_index.get(job_name)
+        
+        status_file = self.jobs_dir / job_name / "status.json"
+        try:
+            with open(status_file, 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        except json.JSONDecodeError as e:
+            logger.error(f"Failed to read status for {job_name}: {e}")
+            return None
+            
+    def _write_status(self, job_name: str, status: Dict[str, Any]):
+        """Write a job's status through the index, or to disk without one"""
+        if self.job_index is not None:
+            self.job_index.write(job_name, status)
+        else:
+            atomic_write_json(self.jobs_dir / job_name / "status.json", status)
             
     def get_queue_size(self) -> int:
         """Get number of jobs in queue"""
-        return self.job_queue.qsize()
+        return sum(queue.qsize() for queue in self.model_queues.values())
+        
+    def get_running_per_cli(self) -> Dict[str, int]:
+        """Get number of running jobs per CLI tool"""
+        return dict(self._running_per_cli)
         
     def get_running_jobs(self) -> list:
         """Get list of currently running jobs"""
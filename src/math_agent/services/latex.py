@@ -0,0 +1,54 @@
+"""
+Rerun detection for pdflatex, in the spirit of latexmk.
+
+A single pdflatex pass is enough unless the pass changed one of the
+auxiliary files that the next pass would read (.aux, .toc, .out, .bbl) or
+the log asks for another run. Comparing those files before and after each
+pass lets documents without cross-references compile in one pass.
+
+Warnings about undefined references or citations alone do not cause a
+rerun: as in latexmk, they only resolve if the auxiliary files changed,
+and a genuinely broken reference or citation would otherwise use up every pass.
+"""
+
+import hashlib
+import re
+from pathlib import Path
+from typing import Dict, Optional
+
+# Auxiliary files read back by the next pass
+AUX_SUFFIXES = (".aux", ".toc", ".out", ".bbl")
+
+# Log messages from LaTeX and common packages asking for another pass
+RERUN_PATTERN = re.compile(r"Rerun to get|Rerun LaTeX|Please rerun|Label\(s\) may have changed")
+
+# .aux lines written for every document; they carry no cross-references
+_TRIVIAL_AUX_LINE = re.compile(r"^\\relax\s*$|^\\gdef\s*\\@abspage@last\{\d+\}\s*$")
+
+
+def aux_state(workspace_dir: Path, stem: str = "solution") -> Dict[str, Optional[str]]:
+    """Hash each auxiliary file; None for files that don't exist"""
+    state = {}
+    for suffix in AUX_SUFFIXES:
+        path = workspace_dir / f"{stem}{suffix}"
+        try:
+            content = path.read_bytes()
+        except FileNotFoundError:
+            state[suffix] = None
+            continue
+        if suffix == ".aux":
+            content = _significant_aux(content)
+        state[suffix] = hashlib.sha256(content).hexdigest() if content else None
+    return state
+
+
+def needs_rerun(before: Dict[str, Optional[str]], after: Dict[str, Optional[str]],
+                log_text: str) -> bool:
+    """Decide whether another pdflatex pass would change the output"""
+    return before != after or bool(RERUN_PATTERN.search(log_text))
+
+
+def _significant_aux(content: bytes) -> bytes:
+    # A missing .aux and one holding only boilerplate are equivalent
+    lines = content.decode('utf-8', errors='replace').splitlines()
+    return "\n".join(line for line in lines if not _TRIVIAL_AUX_LINE.match(line)).encode()
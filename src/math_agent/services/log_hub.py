@@ -0,0 +1,122 @@
+"""
+Publish/subscribe hub for live job output.
+
+The job executor publishes every log entry and status change as it
+happens; streaming API endpoints subscribe per job. Each subscriber has a
+bounded buffer: a subscriber that falls behind is dropped instead of
+blocking the publisher, and is expected to reconnect from its last cursor.
+
+Log entries are published before the buffered log writer has flushed them
+to disk. Until the writer reports them flushed, the hub keeps them and
+replays them to new subscribers, so that disk plus live events never
+leave a gap.
+"""
+
+import asyncio
+import logging
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Optional, Set
+
+from ..config import LOG_STREAM_BUFFER_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class LogEvent:
+    """A single event delivered to subscribers"""
+    event: str  # "log", "status" or "end"
+    data: Any = None
+    offset: Optional[int] = None  # Log byte offset just after a "log" entry
+
+
+class LogSubscription:
+    """A subscriber's bounded event buffer"""
+
+    def __init__(self, job_name: str, buffer_size: int):
+        self.job_name = job_name
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=buffer_size)
+        self.overflowed = False
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[LogEvent]:
+        """
+        Wait for the next event.
+
+        Returns None on timeout, and an "end" event once the subscription
+        has overflowed and its buffer is drained.
+        """
+        if self.overflowed and self.queue.empty():
+            return LogEvent("end", {"reason": "overflow"})
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class LogHub:
+    """Fans out job log entries and status changes to live subscribers"""
+
+    def __init__(self, buffer_size: int = LOG_STREAM_BUFFER_SIZE):
+        self.buffer_size = buffer_size
+        self._subscribers: Dict[str, Set[LogSubscription]] = {}
+        self._unflushed: Dict[str, Deque[LogEvent]] = {}
+
+    def subscribe(self, job_name: str) -> LogSubscription:
+        """Start receiving events for a job, beginning with unflushed entries"""
+        subscription = LogSubscription(job_name, self.buffer_size)
+        for event in self._unflushed.get(job_name, ()):
+            if subscription.queue.full():
+                subscription.overflowed = True
+                return subscription
+            subscription.queue.put_nowait(event)
+        self._subscribers.setdefault(job_name, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: LogSubscription) -> None:
+        """Stop receiving events"""
+        subscribers = self._subscribers.get(subscription.job_name)
+        if subscribers is None:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            del self._subscribers[subscription.job_name]
+
+    def subscriber_count(self, job_name: str) -> int:
+        """Get number of live subscribers for a job"""
+        return len(self._subscribers.get(job_name, ()))
+
+    def publish_log(self, job_name: str, entry: Dict[str, Any], offset: int) -> None:
+        """Publish a log entry that ends at the given byte offset"""
+        event = LogEvent("log", [entry], offset)
+        self._unflushed.setdefault(job_name, deque()).append(event)
+        self._publish(job_name, event)
+
+    def flushed(self, job_name: str, offset: int) -> None:
+        """Forget entries the log writer has written to disk up to offset"""
+        unflushed = self._unflushed.get(job_name)
+        if unflushed is None:
+            return
+        while unflushed and unflushed[0].offset <= offset:
+            unflushed.popleft()
+        if not unflushed:
+            del self._unflushed[job_name]
+
+    def publish_status(self, job_name: str, status: Dict[str, Any]) -> None:
+        """Publish the job's current status"""
+        self._publish(job_name, LogEvent("status", status))
+
+    def close(self, job_name: str) -> None:
+        """Tell subscribers the job has finished producing output"""
+        self._unflushed.pop(job_name, None)
+        self._publish(job_name, LogEvent("end", {"reason": "finished"}))
+
+    def _publish(self, job_name: str, event: LogEvent) -> None:
+        # Never await here: a slow subscriber must not stall the publisher
+        for subscription in list(self._subscribers.get(job_name, ())):
+            try:
+                subscription.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                logger.warning(f"Dropping slow log subscriber for {job_name}")
+                subscription.overflowed = True
+                self.unsubscribe(subscription)
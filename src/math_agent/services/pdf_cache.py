@@ -0,0 +1,125 @@
+"""
+Content-addressed cache of compiled solution PDFs.
+
+Replicates and re-runs often produce byte-identical solution.tex files.
+The cache key is a hash of the LaTeX command and of every LaTeX-relevant
+file in the workspace, so an identical workspace reuses the PDF instead
+of running pdflatex again. Entries are evicted least recently used first
+once the cache exceeds its size limit.
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from ..config import PDF_CACHE_DIR, PDF_CACHE_MAX_BYTES, PDFLATEX_COMMAND, PDFLATEX_ARGS
+
+logger = logging.getLogger(__name__)
+
+# Workspace files that can influence the compiled PDF
+DEPENDENCY_SUFFIXES = {
+    ".tex", ".sty", ".cls", ".bib", ".bst", ".def", ".cfg",
+    ".png", ".jpg", ".jpeg", ".pdf", ".eps",
+}
+
+# Files pdflatex writes itself; they never count as inputs
+GENERATED_SUFFIXES = {".aux", ".log", ".out", ".toc", ".synctex.gz"}
+
+
+class PdfCache:
+    """Caches compiled PDFs keyed by the hash of their LaTeX inputs"""
+
+    def __init__(self, cache_dir: Path = PDF_CACHE_DIR, max_bytes: int = PDF_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def key_for(self, workspace_dir: Path, tex_name: str = "solution.tex") -> str:
+        """Hash the LaTeX command, the tex file and its workspace dependencies"""
+        output_pdf = Path(tex_name).with_suffix(".pdf").name
+        digest = hashlib.sha256()
+        digest.update("\0".join([PDFLATEX_COMMAND, *PDFLATEX_ARGS, tex_name]).encode())
+
+        for path in sorted(workspace_dir.rglob("*")):
+            relative = path.relative_to(workspace_dir).as_posix()
+            if not path.is_file() or relative == output_pdf:
+                continue
+            if path.suffix not in DEPENDENCY_SUFFIXES or path.name.endswith(tuple(GENERATED_SUFFIXES)):
+                continue
+            digest.update(b"\0" + relative.encode() + b"\0")
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+
+        return digest.hexdigest()
+
+    def fetch(self, key: str, dest: Path) -> bool:
+        """Place the cached PDF for key at dest; returns False on a miss"""
+        entry = self._entry(key)
+        try:
+            # Touch the entry so eviction sees it as recently used
+            os.utime(entry)
+        except FileNotFoundError:
+            return False
+
+        try:
+            dest.unlink(missing_ok=True)
+            os.link(entry, dest)
+        except OSError:
+            # Different filesystem or no hardlink support
+            try:
+                shutil.copyfile(entry, dest)
+            except FileNotFoundError:
+                # Evicted in the meantime
+                return False
+        return True
+
+    def store(self, key: str, pdf_path: Path) -> None:
+        """Add a freshly compiled PDF to the cache"""
+        entry = self._entry(key)
+        entry.parent.mkdir(parents=True, exist_ok=True)
+
+        temp_fd, temp_path = tempfile.mkstemp(dir=entry.parent, prefix=".", suffix=".tmp")
+        try:
+            with os.fdopen(temp_fd, 'wb') as dst, open(pdf_path, 'rb') as src:
+                shutil.copyfileobj(src, dst)
+            # Read-only: workspaces may hold hardlinks to this file
+            os.chmod(temp_path, 0o444)
+            os.replace(temp_path, entry)
+        except Exception:
+            try:
+                os.unlink(temp_path)
+            except Exception:
+                pass
+            raise
+
+        self._evict()
+
+    def _entry(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.pdf"
+
+    def _evict(self) -> None:
+        """Remove least recently used entries until the cache fits its limit"""
+        entries = []
+        total = 0
+        for path in self.cache_dir.glob("*/*.pdf"):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            logger.info(f"Evicted cached PDF {path.name}")
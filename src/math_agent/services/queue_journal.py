@@ -0,0 +1,91 @@
+"""
+Append-only journal of the job queue.
+
+The queues themselves live in memory. The journal records every job that
+is queued, started and finished, one JSON line per transition, so that a
+restarted manager can restore the queue in its original order and knows
+which jobs were running when the process went away. Replaying reads the
+journal once; the manager then rewrites it with only the live entries,
+which keeps it from growing across restarts.
+
+Lines are written unbuffered with O_APPEND, so they survive a crash of
+the process (but not necessarily of the host). A torn last line is
+ignored on replay.
+"""
+
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_FILENAME = ".queue.journal"
+
+QUEUED = "queued"
+STARTED = "started"
+FINISHED = "finished"
+
+
+class QueueJournal:
+    """Records queue transitions of jobs and replays them after a restart"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._fd = None
+
+    def append(self, event: str, job_name: str) -> None:
+        """Record that a job was queued, started or finished"""
+        if self._fd is None:
+            self._fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        os.write(self._fd, (json.dumps({"event": event, "job": job_name}) + "\n").encode())
+
+    def replay(self) -> Tuple[List[str], List[str]]:
+        """
+        Read the journal.
+
+        Returns:
+            Jobs queued but not started and jobs started but not
+            finished, both in queue order
+        """
+        states: Dict[str, str] = {}
+        try:
+            with open(self.path, 'r') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                        event, job_name = record["event"], record["job"]
+                    except (json.JSONDecodeError, KeyError, TypeError):
+                        logger.warning(f"Skipping malformed queue journal line: {line!r}")
+                        continue
+                    if event == FINISHED:
+                        states.pop(job_name, None)
+                    elif event == QUEUED:
+                        # Requeued jobs move to the back of the queue
+                        states.pop(job_name, None)
+                        states[job_name] = QUEUED
+                    elif event == STARTED:
+                        states[job_name] = STARTED
+        except FileNotFoundError:
+            pass
+
+        queued = [name for name, state in states.items() if state == QUEUED]
+        started = [name for name, state in states.items() if state == STARTED]
+        return queued, started
+
+    def rewrite(self, queued: Iterable[str]) -> None:
+        """Atomically replace the journal with queued records for these jobs"""
+        self.close()
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, 'w') as f:
+            for job_name in queued:
+                f.write(json.dumps({"event": QUEUED, "job": job_name}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def close(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
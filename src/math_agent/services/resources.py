@@ -0,0 +1,170 @@
+"""
+Resource accounting for job subprocesses.
+
+asyncio reaps child processes itself, so their rusage is not available
+on exit. Instead each agent and pdflatex process is sampled from /proc
+while it runs: CPU times (including children it has waited for), peak
+RSS and storage I/O. Sampling starts fast and backs off, so short
+pdflatex passes are still observed; usage in the last interval before
+exit is not. On systems without /proc only wall time is recorded.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, Optional
+
+from ..config import RESOURCE_SAMPLE_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+# First sampling interval in seconds; doubled up to RESOURCE_SAMPLE_INTERVAL
+_FIRST_INTERVAL = 0.05
+
+
+def read_proc_usage(pid: int) -> Optional[Dict[str, int]]:
+    """Read a process's current usage from /proc, or None if it is gone"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # The command name may contain spaces; fields follow the last ")"
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open(f"/proc/{pid}/status") as f:
+            status = f.read()
+    except (FileNotFoundError, ProcessLookupError, IndexError, OSError):
+        return None
+
+    usage = {
+        # utime + cutime, stime + cstime in clock ticks
+        "user_ticks": int(fields[11]) + int(fields[13]),
+        "system_ticks": int(fields[12]) + int(fields[14]),
+        "max_rss": 0,
+        "read_bytes": 0,
+        "write_bytes": 0,
+    }
+    for line in status.splitlines():
+        if line.startswith("VmHWM:"):
+            usage["max_rss"] = int(line.split()[1]) * 1024
+            break
+
+    try:
+        with open(f"/proc/{pid}/io") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("read_bytes", "write_bytes"):
+                    usage[key] = int(value)
+    except OSError:
+        pass  # Not readable for every process on every kernel
+
+    return usage
+
+
+class ProcessMonitor:
+    """Samples one subprocess's resource usage until it exits"""
+
+    def __init__(self, pid: int, interval: float = RESOURCE_SAMPLE_INTERVAL):
+        self.pid = pid
+        self.interval = interval
+        self._started = time.monotonic()
+        self._last: Optional[Dict[str, int]] = None
+        self._max_rss = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Begin sampling in the background"""
+        self._sample()
+        if self.interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> Dict[str, Any]:
+        """Stop sampling and get the usage observed"""
+        wall = time.monotonic() - self._started
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._sample()
+
+        usage: Dict[str, Any] = {"wallSeconds": round(wall, 3)}
+        if self._last is not None:
+            usage.update({
+                "cpuUserSeconds": round(self._last["user_ticks"] / _CLOCK_TICKS, 2),
+                "cpuSystemSeconds": round(self._last["system_ticks"] / _CLOCK_TICKS, 2),
+                "maxRssBytes": self._max_rss,
+                "readBytes": self._last["read_bytes"],
+                "writeBytes": self._last["write_bytes"],
+            })
+        return usage
+
+    async def _run(self) -> None:
+        interval = min(_FIRST_INTERVAL, self.interval)
+        while True:
+            await asyncio.sleep(interval)
+            if not self._sample():
+                return
+            interval = min(interval * 2, self.interval)
+
+    def _sample(self) -> bool:
+        usage = read_proc_usage(self.pid)
+        if usage is None:
+            return False
+        self._last = usage
+        self._max_rss = max(self._max_rss, usage["max_rss"])
+        return True
+
+
+def merge_usage(total: Optional[Dict[str, Any]], usage: Dict[str, Any]) -> Dict[str, Any]:
+    """Combine the usage of consecutive processes of one phase, e.g. pdflatex passes"""
+    if not total:
+        return dict(usage)
+    merged = dict(total)
+    for key, value in usage.items():
+        if key == "maxRssBytes":
+            merged[key] = max(merged.get(key, 0), value)
+        else:
+            merged[key] = round(merged.get(key, 0) + value, 3)
+    return merged
+
+
+def summarize_usage(statuses: Dict[str, Dict[str, Any]], group_by: str = "model") -> Dict[str, Any]:
+    """
+    Aggregate recorded resource usage per group of jobs.
+
+    Args:
+        statuses: Job statuses by job name
+        group_by: Status field to group by, e.g. "model" or "exercise"
+
+    Returns:
+        Per group and phase: number of jobs with usage, total and mean CPU
+        seconds, mean wall seconds, peak RSS and total bytes read/written
+    """
+    groups: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    for status in statuses.values():
+        resources = status.get("resources")
+        if not resources:
+            continue
+        group = groups.setdefault(str(status.get(group_by) or "unknown"), {})
+        for phase, usage in resources.items():
+            summary = group.setdefault(phase, {
+                "jobs": 0, "cpuSeconds": 0.0, "wallSeconds": 0.0,
+                "maxRssBytes": 0, "readBytes": 0, "writeBytes": 0,
+            })
+            summary["jobs"] += 1
+            summary["cpuSeconds"] += usage.get("cpuUserSeconds", 0) + usage.get("cpuSystemSeconds", 0)
+            summary["wallSeconds"] += usage.get("wallSeconds", 0)
+            summary["maxRssBytes"] = max(summary["maxRssBytes"], usage.get("maxRssBytes", 0))
+            summary["readBytes"] += usage.get("readBytes", 0)
+            summary["writeBytes"] += usage.get("writeBytes", 0)
+
+    for group in groups.values():
+        for summary in group.values():
+            summary["meanCpuSeconds"] = round(summary["cpuSeconds"] / summary["jobs"], 2)
+            summary["meanWallSeconds"] = round(summary["wallSeconds"] / summary["jobs"], 2)
+            summary["cpuSeconds"] = round(summary["cpuSeconds"], 2)
+            summary["wallSeconds"] = round(summary["wallSeconds"], 2)
+    return groups
@@ -0,0 +1,140 @@
+"""
+Scheduling primitives for the job manager.
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Deque, NamedTuple, Optional, Tuple
+
+
+class RateLimiter:
+    """Limits how many jobs start within a sliding time window"""
+
+    def __init__(self, max_starts: int, period: float = 60.0):
+        self.max_starts = max_starts
+        self.period = period
+        self._starts: Deque[float] = deque()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """Wait until another start fits in the window, then record it"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                while self._starts and now - self._starts[0] >= self.period:
+                    self._starts.popleft()
+                if len(self._starts) < self.max_starts:
+                    self._starts.append(now)
+                    return
+                await asyncio.sleep(self._starts[0] + self.period - now)
+
+
+class AdaptiveLimit:
+    """A concurrency limit whose size can change while slots are held"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self.waiting = 0
+        self._condition = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._condition:
+            self.waiting += 1
+            try:
+                await self._condition.wait_for(lambda: self.active < self.limit)
+            finally:
+                self.waiting -= 1
+            self.active += 1
+
+    async def __aexit__(self, *exc_info):
+        async with self._condition:
+            self.active -= 1
+            self._condition.notify_all()
+
+    async def set_limit(self, limit: int) -> None:
+        """Resize; holders above a lower limit keep their slots until they finish"""
+        async with self._condition:
+            self.limit = limit
+            self._condition.notify_all()
+
+
+class HostSample(NamedTuple):
+    """Host pressure as seen by the concurrency controller"""
+    load_per_cpu: float
+    available_memory: int
+    total_memory: int
+
+
+def read_host_sample() -> Optional[HostSample]:
+    """Read the 1-minute load average and available memory, or None where unsupported"""
+    try:
+        load = os.getloadavg()[0] / (os.cpu_count() or 1)
+        meminfo = {}
+        with open("/proc/meminfo") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                meminfo[key] = int(value.split()[0]) * 1024
+        return HostSample(load, meminfo["MemAvailable"], meminfo["MemTotal"])
+    except (OSError, KeyError, ValueError, IndexError):
+        return None
+
+
+class ConcurrencyController:
+    """
+    Additive-increase/multiplicative-decrease control of an AdaptiveLimit.
+
+    Under pressure (load per CPU above max_load, or available memory below
+    min_free_memory of the total) the limit is multiplied by
+    decrease_factor. Otherwise, while jobs are waiting for a slot, it grows
+    by one if the load leaves headroom and the free memory above the
+    reserve fits another job of the typical peak RSS observed so far.
+    """
+
+    def __init__(self, limit: AdaptiveLimit, minimum: int, maximum: int,
+                 max_load: float = 1.0, min_free_memory: float = 0.1,
+                 decrease_factor: float = 0.5):
+        self.limit = limit
+        self.minimum = minimum
+        self.maximum = maximum
+        self.max_load = max_load
+        self.min_free_memory = min_free_memory
+        self.decrease_factor = decrease_factor
+        # Moving average of agent processes' peak RSS in bytes
+        self.job_rss: Optional[float] = None
+
+    def observe_job_rss(self, rss: int) -> None:
+        """Account for the peak RSS of a finished agent process"""
+        self.job_rss = rss if self.job_rss is None else 0.8 * self.job_rss + 0.2 * rss
+
+    def decide(self, sample: HostSample) -> Tuple[int, str]:
+        """Get the next limit and the reason for it"""
+        current = self.limit.limit
+        reserve = self.min_free_memory * sample.total_memory
+        if sample.load_per_cpu > self.max_load:
+            return max(self.minimum, int(current * self.decrease_factor)), f"load {sample.load_per_cpu:.2f} per CPU"
+        if sample.available_memory < reserve:
+            return (max(self.minimum, int(current * self.decrease_factor)),
+                    f"{sample.available_memory // 2 ** 20} MiB memory available")
+
+        if self.limit.waiting == 0 or current >= self.maximum:
+            return current, "no demand" if self.limit.waiting == 0 else "at maximum"
+        if sample.load_per_cpu > 0.75 * self.max_load:
+            return current, f"load {sample.load_per_cpu:.2f} per CPU"
+        if sample.available_memory - reserve < (self.job_rss or 0):
+            return current, f"{sample.available_memory // 2 ** 20} MiB memory available"
+        return current + 1, "jobs waiting, host has headroom"
+
+    async def adjust(self, sample: Optional[HostSample]) -> Optional[Tuple[int, int, str]]:
+        """Apply one control step; returns (old, new, reason) if the limit changed"""
+        if sample is None:
+            return None
+        old = self.limit.limit
+        new, reason = self.decide(sample)
+        new = min(self.maximum, max(self.minimum, new))
+        if new == old:
+            return None
+        await self.limit.set_limit(new)
+        return old, new, reason
@@ -0,0 +1,185 @@
+"""
+Coalescing of agent CLI stream-json output into log records.
+
+The CLIs emit many small events per turn: text deltas, partial message
+events and content blocks wrapped in message envelopes. The coalescer
+merges them into one record per message, tool call and tool result, in
+the log format the job page renders:
+
+    {"type": "message", "role": "assistant", "content": "..."}
+    {"type": "tool_use", "tool": "Write", "id": "...", "input": {...}}
+    {"type": "tool_result", "tool_use_id": "...", "content": "...", "is_error": false}
+
+Events it does not recognise are passed through unchanged, and so are
+envelopes whose content is neither text nor a list of blocks. Content
+blocks that are not objects are logged like unknown assistant blocks and
+skipped in user messages.
+"""
+
+import json
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat() + "Z"
+
+
+class StreamCoalescer:
+    """Turns a stream of CLI events into complete log records"""
+
+    def __init__(self):
+        self.events = 0
+        self.records = 0
+        # Text being assembled from deltas: (role, timestamp, chunks)
+        self._pending: Optional[tuple] = None
+        # Partial assistant text per message id, dropped once the full message arrives
+        self._partial: Dict[str, List[str]] = {}
+        self._partial_message_id: Optional[str] = None
+
+    def feed(self, event: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Consume one event; returns the records it completes"""
+        self.events += 1
+        event_type = event.get("type")
+
+        if event_type == "message" and event.get("delta"):
+            return self._add_delta(event)
+        if event_type == "stream_event":
+            if isinstance(event.get("event"), dict):
+                self._add_partial(event["event"])
+            return []
+
+        records = self._flush_pending()
+        if event_type == "assistant" and isinstance(event.get("message"), dict):
+            records.extend(self._assistant_records(event))
+        elif event_type == "user" and isinstance(event.get("message"), dict):
+            records.extend(self._user_records(event))
+        elif event_type == "tool_use" and "tool_name" in event:
+            records.append(self._record({
+                "type": "tool_use",
+                "tool": event["tool_name"],
+                "id": event.get("tool_id"),
+                "input": event.get("parameters", {}),
+            }, event))
+        elif event_type == "tool_result" and "tool_id" in event:
+            records.append(self._record({
+                "type": "tool_result",
+                "tool_use_id": event["tool_id"],
+                "content": event.get("output", event.get("error", "")),
+                "is_error": event.get("status") == "error",
+            }, event))
+        else:
+            records.append(event)
+
+        self.records += len(records)
+        return records
+
+    def flush(self) -> List[Dict[str, Any]]:
+        """Emit whatever is still being assembled, e.g. at the end of the stream"""
+        records = self._flush_pending()
+        for chunks in self._partial.values():
+            if chunks:
+                records.append({"timestamp": _now(), "type": "message", "role": "assistant",
+                                "content": "".join(chunks), "partial": True})
+        self._partial.clear()
+        self.records += len(records)
+        return records
+
+    def _add_delta(self, event: Dict[str, Any]) -> List[Dict[str, Any]]:
+        role = event.get("role", "assistant")
+        records = []
+        if self._pending is not None and self._pending[0] != role:
+            records = self._flush_pending()
+            self.records += len(records)
+        if self._pending is None:
+            self._pending = (role, event.get("timestamp") or _now(), [])
+        self._pending[2].append(str(event.get("content", "")))
+        return records
+
+    def _flush_pending(self) -> List[Dict[str, Any]]:
+        if self._pending is None:
+            return []
+        role, timestamp, chunks = self._pending
+        self._pending = None
+        return [{"timestamp": timestamp, "type": "message", "role": role, "content": "".join(chunks)}]
+
+    def _add_partial(self, stream_event: Dict[str, Any]) -> None:
+        # Anthropic streaming events; only text is kept as a fallback
+        if stream_event.get("type") == "message_start":
+            message = stream_event.get("message")
+            message_id = message.get("id") if isinstance(message, dict) else None
+            self._partial_message_id = message_id if isinstance(message_id, str) else None
+            self._partial.setdefault(self._partial_message_id, [])
+        elif stream_event.get("type") == "content_block_delta":
+            delta = stream_event.get("delta")
+            if isinstance(delta, dict) and delta.get("type") == "text_delta":
+                self._partial.setdefault(self._partial_message_id, []).append(str(delta.get("text", "")))
+
+    def _assistant_records(self, event: Dict[str, Any]) -> List[Dict[str, Any]]:
+        message = event["message"]
+        if isinstance(message.get("id"), str):
+            self._partial.pop(message["id"], None)
+        content = message.get("content")
+        if isinstance(content, str):
+            return [self._record({"type": "message", "role": "assistant", "content": content}, event)]
+        if not isinstance(content, (list, type(None))):
+            return [event]
+
+        records = []
+        text: List[str] = []
+        for block in content or []:
+            block_type = block.get("type") if isinstance(block, dict) else None
+            if block_type == "text":
+                text.append(str(block.get("text", "")))
+                continue
+            if text:
+                records.append(self._record({"type": "message", "role": "assistant", "content": "".join(text)}, event))
+                text = []
+            if block_type == "tool_use":
+                records.append(self._record({
+                    "type": "tool_use",
+                    "tool": block.get("name"),
+                    "id": block.get("id"),
+                    "input": block.get("input", {}),
+                }, event))
+            elif block_type == "thinking":
+                records.append(self._record({
+                    "type": "message",
+                    "role": "assistant",
+                    "content": block.get("thinking", ""),
+                    "thinking": True,
+                }, event))
+            else:
+                records.append(self._record({"type": "message", "role": "assistant", "content": json.dumps(block)}, event))
+        if text:
+            records.append(self._record({"type": "message", "role": "assistant", "content": "".join(text)}, event))
+        return records
+
+    def _user_records(self, event: Dict[str, Any]) -> List[Dict[str, Any]]:
+        content = event["message"].get("content")
+        if isinstance(content, str):
+            return [self._record({"type": "message", "role": "user", "content": content}, event)]
+        if not isinstance(content, (list, type(None))):
+            return [event]
+
+        records = []
+        for block in content or []:
+            if not isinstance(block, dict):
+                continue
+            if block.get("type") == "tool_result":
+                result = block.get("content", "")
+                if isinstance(result, list):
+                    result = "".join(str(part.get("text", "")) for part in result if isinstance(part, dict))
+                records.append(self._record({
+                    "type": "tool_result",
+                    "tool_use_id": block.get("tool_use_id"),
+                    "content": result,
+                    "is_error": bool(block.get("is_error")),
+                }, event))
+            elif block.get("type") == "text":
+                records.append(self._record({"type": "message", "role": "user", "content": block.get("text", "")}, event))
+        return records
+
+    @staticmethod
+    def _record(record: Dict[str, Any], event: Dict[str, Any]) -> Dict[str, Any]:
+        return {"timestamp": event.get("timestamp") or _now(), **record}
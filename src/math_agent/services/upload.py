@@ -0,0 +1,169 @@
+"""
+Streaming parser for multipart/form-data job uploads.
+
+Form fields are small and kept in memory. File parts are written to the
+blob store chunk by chunk as the request body arrives, hashed and
+size-checked on the way, so memory use does not depend on the size of
+the attachments. File inputs left empty, which browsers send with an
+empty filename, are skipped.
+"""
+
+import logging
+from typing import Callable, Dict, Optional
+
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+from .blob_store import BlobStore, BlobWriter
+from ..config import MAX_UPLOAD_BYTES, MAX_UPLOAD_FILE_BYTES
+
+logger = logging.getLogger(__name__)
+
+# Form fields (name, model, prompt, ...) are held in memory
+MAX_FIELD_BYTES = 1024 ** 2
+
+
+class UploadError(ValueError):
+    """The upload is malformed"""
+
+
+class UploadTooLarge(UploadError):
+    """A part or the whole upload exceeds its size limit"""
+
+
+def is_valid_filename(filename: str) -> bool:
+    """Attachments are placed in the workspace root and must not be hidden files"""
+    return bool(filename) and "/" not in filename and "\\" not in filename and not filename.startswith(".")
+
+
+class MultipartUpload:
+    """Consumes a multipart/form-data body into form fields and stored files"""
+
+    def __init__(self, content_type: str, blob_store: BlobStore,
+                 max_file_bytes: int = MAX_UPLOAD_FILE_BYTES, max_bytes: int = MAX_UPLOAD_BYTES,
+                 on_field: Optional[Callable[[str, str], None]] = None):
+        """
+        Args:
+            content_type: The request's Content-Type header
+            blob_store: Where file parts are stored
+            max_file_bytes: Limit per file part
+            max_bytes: Limit on the whole request body
+            on_field: Called with each form field as soon as it is complete,
+                e.g. to reject a taken job name before any file is received
+        """
+        mime_type, options = parse_options_header(content_type)
+        if mime_type != b"multipart/form-data" or b"boundary" not in options:
+            raise UploadError("Expected multipart/form-data with a boundary")
+        self.blob_store = blob_store
+        self.max_file_bytes = max_file_bytes
+        self.max_bytes = max_bytes
+        self.on_field = on_field
+        self.fields: Dict[str, str] = {}
+        # Attachment filename -> blob digest
+        self.files: Dict[str, str] = {}
+        self.received = 0
+
+        self._headers: Dict[bytes, bytes] = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._name: Optional[str] = None
+        self._filename: Optional[str] = None
+        self._skipping = False
+        self._field = bytearray()
+        self._writer: Optional[BlobWriter] = None
+        self._parser = MultipartParser(options[b"boundary"], callbacks={
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+
+    def feed(self, chunk: bytes) -> None:
+        """Parse the next chunk of the request body"""
+        self.received += len(chunk)
+        if self.received > self.max_bytes:
+            raise UploadTooLarge(f"Upload exceeds {self.max_bytes} bytes")
+        self._parser.write(chunk)
+
+    def finish(self) -> None:
+        """Check the body ended after its last part"""
+        self._parser.finalize()
+        if self._name is not None:
+            raise UploadError("Upload ended in the middle of a part")
+
+    def abort(self) -> None:
+        """
+        Discard a file part still being written.
+
+        Parts already stored stay in the blob store, where another job may
+        share them; BlobStore.collect removes them if no job does.
+        """
+        if self._writer is not None:
+            self._writer.abort()
+            self._writer = None
+
+    def _on_part_begin(self) -> None:
+        self._headers = {}
+        self._field = bytearray()
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self) -> None:
+        disposition, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        if disposition != b"form-data" or b"name" not in options:
+            raise UploadError("Part without a form-data name")
+        self._name = options[b"name"].decode()
+        self._filename = None
+        self._skipping = False
+        if b"filename" in options:
+            filename = options[b"filename"].decode()
+            if not filename:
+                # A file input the user left empty
+                self._skipping = True
+                return
+            if not is_valid_filename(filename):
+                raise UploadError(f"Invalid attachment filename: {filename!r}")
+            if filename in self.files:
+                raise UploadError(f"Duplicate attachment: {filename}")
+            self._filename = filename
+            self._writer = self.blob_store.writer()
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._skipping:
+            return
+        if self._writer is not None:
+            if self._writer.size + end - start > self.max_file_bytes:
+                raise UploadTooLarge(f"Attachment {self._filename} exceeds {self.max_file_bytes} bytes")
+            self._writer.write(data[start:end])
+        else:
+            if len(self._field) + end - start > MAX_FIELD_BYTES:
+                raise UploadTooLarge(f"Field {self._name} exceeds {MAX_FIELD_BYTES} bytes")
+            self._field += data[start:end]
+
+    def _on_part_end(self) -> None:
+        if self._skipping:
+            self._skipping = False
+        elif self._writer is not None:
+            writer, self._writer = self._writer, None
+            self.files[self._filename] = writer.commit()
+            logger.debug(f"Stored attachment {self._filename} ({writer.size} bytes)")
+        else:
+            try:
+                value = self._field.decode("utf-8")
+            except UnicodeDecodeError:
+                raise UploadError(f"Field {self._name} is not UTF-8")
+            self.fields[self._name] = value
+            if self.on_field is not None:
+                self.on_field(self._name, value)
+        self._name = None
@@ -0,0 +1 @@
+# Hot-path microbenchmarks, opt-in with BENCHMARK=1
@@ -0,0 +1,139 @@
+"""
+Fixtures for the hot-path microbenchmarks.
+
+The benchmarks are opt-in: they run only with BENCHMARK=1, e.g.
+
+    BENCHMARK=1 uv run pytest tests/benchmarks -q
+
+Every timing is the fastest of several repeats, in seconds per call, and
+is compared with baseline.json next to this file: a benchmark fails when
+it is more than BENCHMARK_THRESHOLD (default 0.5, i.e. 50%) slower than
+its baseline. Each run also times a fixed CPU-bound reference workload,
+the median of several rounds, and baselines are scaled by how fast it
+ran compared with the baseline run, so a slower or busier machine does
+not read as a regression. A timing over the limit is taken again, along
+with the reference, in case load started mid-run. The scale is clamped
+to MAX_SCALE in either direction, so an outlying reference can neither
+excuse a large slowdown nor tighten a baseline beyond reach.
+
+BENCHMARK_UPDATE=1 records the timings of the run as the new baseline
+instead, and BENCHMARK_OUTPUT=path writes them to a JSON file for
+comparing branches.
+
+BENCHMARK_SCALE=full adds the largest sizes (100k jobs, 100 MB logs),
+which are checked against their own baselines like the others.
+"""
+import hashlib
+import json
+import os
+import platform
+import statistics
+import time
+from pathlib import Path
+from typing import Callable, Dict
+
+import pytest
+
+BASELINE_FILE = Path(__file__).parent / "baseline.json"
+THRESHOLD = float(os.getenv("BENCHMARK_THRESHOLD", "0.5"))
+UPDATE = os.getenv("BENCHMARK_UPDATE", "").lower() in ("1", "true")
+# Bound on how far machine speed may move the baselines, in either direction
+MAX_SCALE = 2.0
+
+
+def reference_seconds(rounds: int = 5) -> float:
+    """Median time of a fixed mix of JSON and hashing work, the unit of machine speed"""
+    document = {"status": "completed", "log": [{"type": "message", "content": "x" * 200}] * 200}
+    data = b"x" * (1024 ** 2)
+    timings = []
+    for _ in range(rounds):
+        # Each round is the fastest of a few repeats, so one preemption doesn't count
+        best = float("inf")
+        for _ in range(5):
+            started = time.perf_counter()
+            for _ in range(20):
+                json.loads(json.dumps(document))
+            hashlib.sha256(data).digest()
+            best = min(best, time.perf_counter() - started)
+        timings.append(best)
+    return statistics.median(timings)
+
+
+class Benchmarks:
+    """Records timings and checks them against the baseline"""
+
+    def __init__(self):
+        self.baseline: Dict[str, float] = {}
+        self.baseline_reference = None
+        if BASELINE_FILE.exists():
+            baseline = json.loads(BASELINE_FILE.read_text())
+            self.baseline = baseline.get("results", {})
+            self.baseline_reference = baseline.get("reference")
+        self.reference = reference_seconds()
+        self.results: Dict[str, float] = {}
+
+    def time(self, name: str, fn: Callable[[], object], repeat: int = 7, number: int = 1) -> float:
+        """Time fn, fastest of repeat runs of number calls, and check it"""
+        best = self._fastest(fn, repeat, number)
+        if not UPDATE and best > self._limit(name):
+            # Load that started after the reference was timed; measure both again
+            self._remeasure_reference()
+            best = min(best, self._fastest(fn, repeat, number))
+        self.record(name, best)
+        return best
+
+    def record(self, name: str, seconds: float) -> None:
+        """Record a timing and fail if it regressed beyond the threshold"""
+        self.results[name] = seconds
+        if UPDATE or name not in self.baseline:
+            return
+        if seconds > self._limit(name):
+            self._remeasure_reference()
+        limit = self._limit(name)
+        assert seconds <= limit, (
+            f"{name} took {seconds * 1000:.3f}ms, more than {THRESHOLD:.0%} over "
+            f"its baseline of {limit / (1 + THRESHOLD) * 1000:.3f}ms"
+        )
+
+    def _limit(self, name: str) -> float:
+        baseline = self.baseline.get(name, float("inf"))
+        if self.baseline_reference:
+            # The baseline as it would have been measured on this machine right now
+            scale = self.reference / self.baseline_reference
+            baseline *= min(max(scale, 1 / MAX_SCALE), MAX_SCALE)
+        return baseline * (1 + THRESHOLD)
+
+    def _remeasure_reference(self) -> None:
+        # Keep the slower reading: a busier machine is what needs allowing for
+        self.reference = max(self.reference, reference_seconds())
+
+    @staticmethod
+    def _fastest(fn: Callable[[], object], repeat: int, number: int) -> float:
+        best = float("inf")
+        for _ in range(repeat):
+            started = time.perf_counter()
+            for _ in range(number):
+                fn()
+            best = min(best, (time.perf_counter() - started) / number)
+        return best
+
+    def save(self) -> None:
+        if not self.results:
+            return
+        if os.getenv("BENCHMARK_OUTPUT"):
+            Path(os.environ["BENCHMARK_OUTPUT"]).write_text(json.dumps(self.results, indent=2, sort_keys=True) + "\n")
+        if UPDATE:
+            # Merge, so a partial run keeps the baselines of benchmarks it did not run
+            results = {**self.baseline, **{name: round(seconds, 7) for name, seconds in self.results.items()}}
+            BASELINE_FILE.write_text(json.dumps({
+                "machine": f"{platform.system()} {platform.machine()}, Python {platform.python_version()}",
+                "reference": round(self.reference, 7),
+                "results": dict(sorted(results.items())),
+            }, indent=2) + "\n")
+
+
+@pytest.fixture(scope="session")
+def benchmarks():
+    recorder = Benchmarks()
+    yield recorder
+    recorder.save()
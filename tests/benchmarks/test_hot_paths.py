@@ -0,0 +1,198 @@
+"""Microbenchmarks of the per-request and per-event hot paths"""
+import asyncio
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from unittest.mock import Mock
+
+import pytest
+
+from math_agent.core.models import JobStatusEnum
+from math_agent.core.utils import atomic_write_json
+from math_agent.services.job_executor import JobExecutor
+from math_agent.services.job_index import JobIndex
+
+pytestmark = pytest.mark.skipif(os.getenv("BENCHMARK", "").lower() not in ("1", "true"),
+                                reason="benchmarks run with BENCHMARK=1")
+
+FULL_SCALE = os.getenv("BENCHMARK_SCALE", "") == "full"
+JOB_COUNTS = [100, 1_000, 10_000] + ([100_000] if FULL_SCALE else [])
+LOG_SIZES = [1024, 1024 ** 2, 10 * 1024 ** 2] + ([100 * 1024 ** 2] if FULL_SCALE else [])
+
+
+def size_label(size: int) -> str:
+    for unit, factor in (("MB", 1024 ** 2), ("KB", 1024)):
+        if size >= factor:
+            return f"{size // factor}{unit}"
+    return f"{size}B"
+
+
+def make_status(index: int) -> dict:
+    """A status.json of typical size, as a finished sweep job leaves it"""
+    return {
+        "status": ("completed", "error", "running", "setup")[index % 4],
+        "model": ("claude-opus-4", "gemini-2.5-pro")[index % 2],
+        "exercise": f"analysis_1/sheet_{index % 12 + 1:02d}_ex_{index % 5 + 1:02d}",
+        "sweep": f"sweep-{index // 500}",
+        "createdAt": f"2025-01-01T{index // 3600 % 24:02d}:{index // 60 % 60:02d}:{index % 60:02d}.000000+00:00Z",
+        "startedAt": f"2025-01-01T{index // 3600 % 24:02d}:{index // 60 % 60:02d}:{index % 60:02d}.500000+00:00Z",
+        "disallowedTools": "WebSearch,WebFetch",
+        "inputs": {"exercise.tex": "sha256:" + "0" * 64, "prompt.md": "sha256:" + "1" * 64},
+        "logIngest": {"lines": 120, "bytes": 48_000, "flushes": 9, "seconds": 95.2,
+                      "linesPerSecond": 1.3, "bytesPerSecond": 504.2, "events": 800},
+        "resources": {"agent": {"wallSeconds": 95.2, "cpuUserSeconds": 3.1, "cpuSystemSeconds": 0.4,
+                                "maxRssBytes": 180_000_000, "readBytes": 0, "writeBytes": 65_536}},
+        "solutionTexCreated": True,
+        "solutionPdfCreated": index % 3 != 0,
+    }
+
+
+def make_job_tree(jobs_dir: Path, count: int) -> None:
+    """Create count job directories with a status.json each"""
+    for index in range(count):
+        job_dir = jobs_dir / f"job-{index:06d}"
+        job_dir.mkdir(parents=True)
+        (job_dir / "status.json").write_text(json.dumps(make_status(index)))
+
+
+def make_log(log_file: Path, size: int) -> int:
+    """Write a log.jsonl of about size bytes; returns the number of entries"""
+    entries = []
+    written = 0
+    index = 0
+    while written < size:
+        entry = json.dumps({
+            "timestamp": "2025-01-01T00:00:00.000000+00:00Z",
+            "type": "message",
+            "role": "assistant",
+            "content": f"Step {index}: " + "Consider the sequence and its limit. " * 4,
+        }) + "\n"
+        entries.append(entry)
+        written += len(entry)
+        index += 1
+    log_file.write_text("".join(entries))
+    return index
+
+
+def make_stream(size: int) -> bytes:
+    """Agent stream-json output of about size bytes: text deltas, then the full message"""
+    lines = []
+    written = 0
+    index = 0
+    while written < size:
+        text = f"Step {index}: " + "Consider the sequence and its limit. " * 4
+        events = [{"type": "stream_event", "event": {"type": "message_start", "message": {"id": f"msg_{index}"}}}]
+        events += [{"type": "stream_event", "event": {"type": "content_block_delta", "index": 0,
+                                                       "delta": {"type": "text_delta", "text": text[i:i + 32]}}}
+                   for i in range(0, len(text), 32)]
+        events.append({"type": "assistant", "message": {"id": f"msg_{index}", "role": "assistant",
+                                                        "content": [{"type": "text", "text": text}]}})
+        for event in events:
+            line = json.dumps(event).encode() + b"\n"
+            lines.append(line)
+            written += len(line)
+        index += 1
+    return b"".join(lines)
+
+
+async def time_async(fn, repeat: int = 7, number: int = 1) -> float:
+    """Fastest per-call time of an async function, timed inside the running loop"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            await fn()
+        best = min(best, (time.perf_counter() - started) / number)
+    return best
+
+
+@pytest.mark.parametrize("count", JOB_COUNTS)
+def test_list_jobs(benchmarks, client, test_dirs, monkeypatch, count):
+    """GET /jobs: the first (cold) listing, a dashboard page and the full listing"""
+    jobs_dir = test_dirs["jobs"]
+    make_job_tree(jobs_dir, count)
+    jobs_routes = sys.modules["math_agent.api.routes.jobs"]
+    
+    def cold_listing():
+        # The first request after a start without a catalog reads every status.json
+        catalog = jobs_routes.job_index.catalog
+        catalog.close()
+        for suffix in ("", "-wal", "-shm"):
+            Path(f"{catalog.db_path}{suffix}").unlink(missing_ok=True)
+        monkeypatch.setattr(jobs_routes, "job_index", JobIndex(jobs_dir))
+        assert client.get("/jobs", params={"limit": 1}).status_code == 200
+    
+    benchmarks.time(f"list_jobs_cold[jobs={count}]", cold_listing, repeat=3)
+    benchmarks.time(f"list_jobs_page[jobs={count}]",
+                    lambda: client.get("/jobs", params={"limit": 50, "status": "completed"}), number=5)
+    benchmarks.time(f"list_jobs_all[jobs={count}]", lambda: client.get("/jobs"), repeat=3)
+
+
+@pytest.mark.parametrize("count", JOB_COUNTS)
+def test_job_index_refresh(benchmarks, tmp_path, count):
+    """JobIndex.refresh over an unchanged jobs directory: one stat per job"""
+    make_job_tree(tmp_path, count)
+    index = JobIndex(tmp_path, refresh_interval=0)
+    index.refresh()
+    benchmarks.time(f"job_index_refresh[jobs={count}]", index.refresh, repeat=3)
+
+
+@pytest.mark.parametrize("size", LOG_SIZES)
+def test_get_job_details(benchmarks, client, test_dirs, size):
+    """GET /jobs/{name}: reading the whole log and polling for new entries"""
+    job_dir = test_dirs["jobs"] / "job"
+    job_dir.mkdir()
+    (job_dir / "status.json").write_text(json.dumps(make_status(0)))
+    entries = make_log(job_dir / "log.jsonl", size)
+    
+    response = client.get("/jobs/job")
+    assert len(response.json()["log"]) == entries
+    cursor = response.json()["cursor"]
+    
+    label = size_label(size)
+    benchmarks.time(f"get_job_details_full[log={label}]", lambda: client.get("/jobs/job"), repeat=3)
+    benchmarks.time(f"get_job_details_poll[log={label}]",
+                    lambda: client.get("/jobs/job", params={"since": cursor}), number=20)
+
+
+def test_atomic_write_json(benchmarks, tmp_path):
+    """atomic_write_json of a status.json, with and without fsync"""
+    status = make_status(0)
+    path = tmp_path / "status.json"
+    benchmarks.time("atomic_write_json", lambda: atomic_write_json(path, status), number=50)
+    benchmarks.time("atomic_write_json_nofsync", lambda: atomic_write_json(path, status, fsync=False), number=200)
+
+
+@pytest.mark.asyncio
+async def test_update_status(benchmarks, tmp_path):
+    """JobExecutor._update_status: status.json write plus index and catalog update"""
+    make_job_tree(tmp_path, 100)
+    index = JobIndex(tmp_path)
+    executor = JobExecutor(tmp_path / "job-000000", job_index=index)
+    
+    seconds = await time_async(lambda: executor._update_status(JobStatusEnum.RUNNING, progress=1), number=50)
+    benchmarks.record("update_status", seconds)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("size", LOG_SIZES)
+async def test_stream_output(benchmarks, tmp_path, size):
+    """JobExecutor._stream_output: parsing, coalescing and logging agent output"""
+    stream = make_stream(size)
+    runs = iter(range(1000))
+    
+    async def ingest():
+        job_dir = tmp_path / f"job-{next(runs)}"
+        job_dir.mkdir()
+        executor = JobExecutor(job_dir)
+        reader = asyncio.StreamReader(limit=2 ** 24)
+        reader.feed_data(stream)
+        reader.feed_eof()
+        executor.process = Mock(stdout=reader)
+        await executor._stream_output()
+        await executor.log_writer.close()
+    
+    seconds = await time_async(ingest, repeat=3)
+    benchmarks.record(f"stream_output[{size_label(size)}]", seconds)
@@ -0,0 +1,83 @@
+"""Tests for the content-addressed blob store"""
+import os
+from unittest.mock import patch
+
+import pytest
+
+from math_agent.services.blob_store import BlobStore, digest_bytes
+
+
+class TestBlobStore:
+    """Test the BlobStore class"""
+
+    def test_put_stores_content_once(self, tmp_path):
+        """Test identical content maps to one read-only blob"""
+        store = BlobStore(tmp_path / ".blobs")
+        digest = store.put(b"\\documentclass{article}")
+        assert store.put(b"\\documentclass{article}") == digest == digest_bytes(b"\\documentclass{article}")
+        assert store.put(b"other") != digest
+        assert len([p for p in store.root.rglob("*") if p.is_file()]) == 2
+        assert store.path(digest).stat().st_mode & 0o222 == 0
+
+    def test_put_with_known_digest_skips_hashing(self, tmp_path):
+        """Test content stored under a known digest is not hashed again"""
+        store = BlobStore(tmp_path / ".blobs")
+        digest = store.put(b"exercise")
+        with patch("math_agent.services.blob_store.digest_bytes") as digest_bytes_mock:
+            assert store.put(b"exercise", digest) == digest
+        digest_bytes_mock.assert_not_called()
+
+    def test_materialize_gives_writable_copies(self, tmp_path):
+        """Test workspace inputs can be edited without touching the blob"""
+        store = BlobStore(tmp_path / ".blobs")
+        digest = store.put(b"content")
+        workspaces = [tmp_path / "a", tmp_path / "b"]
+        for workspace in workspaces:
+            workspace.mkdir()
+            assert store.materialize(digest, workspace / "prompt.md") in ("reflink", "copy")
+            assert (workspace / "prompt.md").read_bytes() == b"content"
+
+        (workspaces[0] / "prompt.md").write_bytes(b"edited")
+        assert (workspaces[1] / "prompt.md").read_bytes() == b"content"
+        assert store.path(digest).read_bytes() == b"content"
+
+    def test_materialize_read_only_shares_the_blob(self, tmp_path):
+        """Test read-only data gets a reflink or hard link, not a fresh copy"""
+        store = BlobStore(tmp_path / ".blobs")
+        digest = store.put(b"content")
+        method = store.materialize(digest, tmp_path / "data", read_only=True)
+        assert method in ("reflink", "hardlink")
+        assert (tmp_path / "data").stat().st_mode & 0o222 == 0
+        if method == "hardlink":
+            assert (tmp_path / "data").stat().st_ino == store.path(digest).stat().st_ino
+
+    def test_materialize_falls_back_to_copy(self, tmp_path):
+        """Test read-only data is copied where neither reflinks nor hard links work"""
+        store = BlobStore(tmp_path / ".blobs")
+        digest = store.put(b"content")
+        with patch.object(BlobStore, "_reflink", return_value=False), \
+                patch("os.link", side_effect=OSError(18, "Invalid cross-device link")):
+            assert store.materialize(digest, tmp_path / "prompt.md", read_only=True) == "copy"
+        assert (tmp_path / "prompt.md").read_bytes() == b"content"
+        assert (tmp_path / "prompt.md").stat().st_mode & 0o222 == 0
+
+    def test_collect_removes_old_unreferenced_blobs(self, tmp_path):
+        """Test only blobs that no job refers to and nobody used recently are removed"""
+        store = BlobStore(tmp_path / ".blobs")
+        kept, orphan, recent, reused = (store.put(data) for data in (b"kept", b"orphan", b"recent", b"reused"))
+        for digest in (kept, orphan, reused):
+            os.utime(store.path(digest), (0, 0))
+        # Storing the same content again counts as a use
+        store.put(b"reused")
+
+        assert store.collect([kept], min_age=3600) == 1
+        assert not store.path(orphan).exists()
+        assert all(store.path(digest).exists() for digest in (kept, recent, reused))
+
+    def test_rejects_unknown_and_invalid_digests(self, tmp_path):
+        """Test digests are validated before they become paths"""
+        store = BlobStore(tmp_path / ".blobs")
+        with pytest.raises(ValueError):
+            store.path("sha256:../../etc/passwd")
+        with pytest.raises(FileNotFoundError):
+            store.materialize(digest_bytes(b"missing"), tmp_path / "x")
@@ -0,0 +1,84 @@
+"""Tests for the in-memory exercise catalog"""
+import os
+
+from math_agent.services.blob_store import digest_bytes
+from math_agent.services.exercise_catalog import ExerciseCatalog, parse_exercise_name
+
+
+def touch_later(path, seconds=10):
+    """Move a file's or directory's mtime forward so changes are seen regardless of clock resolution"""
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + seconds * 10 ** 9))
+
+
+def test_parse_exercise_name():
+    """Test sheet and exercise numbers are parsed from exercise names"""
+    assert parse_exercise_name("sheet_01_ex_02") == (1, 2)
+    assert parse_exercise_name("sheet_10_ex_3") == (10, 3)
+    assert parse_exercise_name("intro") == (None, None)
+
+
+class TestExerciseCatalog:
+    """Test the ExerciseCatalog class"""
+
+    def test_builds_catalog(self, tmp_path):
+        """Test exercises are listed with metadata and filtered by course and sheet"""
+        (tmp_path / "analysis").mkdir()
+        (tmp_path / "analysis" / "sheet_01_ex_01.tex").write_text("A1")
+        (tmp_path / "analysis" / "sheet_02_ex_01.tex").write_text("A2")
+        (tmp_path / "analysis" / "notes.md").write_text("not an exercise")
+        (tmp_path / "algebra").mkdir()
+        (tmp_path / "algebra" / "sheet_01_ex_03.tex").write_text("B")
+        catalog = ExerciseCatalog(tmp_path, refresh_interval=0)
+
+        assert [e.id for e in catalog.list()] == [
+            "algebra/sheet_01_ex_03", "analysis/sheet_01_ex_01", "analysis/sheet_02_ex_01",
+        ]
+        assert [e.id for e in catalog.list(course="analysis", sheet=1)] == ["analysis/sheet_01_ex_01"]
+        assert [e.id for e in catalog.list(sheet=1)] == ["algebra/sheet_01_ex_03", "analysis/sheet_01_ex_01"]
+
+        exercise = catalog.get("algebra/sheet_01_ex_03")
+        assert (exercise.course, exercise.sheet, exercise.number) == ("algebra", 1, 3)
+        assert (exercise.content, exercise.size, exercise.digest) == (b"B", 1, digest_bytes(b"B"))
+        assert catalog.get("algebra/missing") is None
+        assert catalog.get("../algebra/sheet_01_ex_03") is None
+
+    def test_incremental_refresh(self, tmp_path):
+        """Test only changed exercises are re-read and removed ones disappear"""
+        course = tmp_path / "analysis"
+        course.mkdir()
+        first = course / "sheet_01_ex_01.tex"
+        second = course / "sheet_01_ex_02.tex"
+        first.write_text("first")
+        second.write_text("second")
+        catalog = ExerciseCatalog(tmp_path, refresh_interval=0)
+        unchanged = catalog.get("analysis/sheet_01_ex_02")
+
+        first.write_text("first, edited")
+        touch_later(first)
+        (course / "sheet_02_ex_01.tex").write_text("new")
+        touch_later(course)
+        assert catalog.get("analysis/sheet_01_ex_01").content == b"first, edited"
+        assert catalog.get("analysis/sheet_01_ex_02") is unchanged
+        assert len(catalog.list()) == 3
+
+        second.unlink()
+        assert [e.name for e in catalog.list()] == ["sheet_01_ex_01", "sheet_02_ex_01"]
+
+        for path in course.iterdir():
+            path.unlink()
+        course.rmdir()
+        assert catalog.list() == []
+
+    def test_refresh_interval(self, tmp_path):
+        """Test listing is served from memory until the refresh interval passes"""
+        (tmp_path / "analysis").mkdir()
+        catalog = ExerciseCatalog(tmp_path, refresh_interval=3600)
+        assert catalog.list() == []
+
+        (tmp_path / "analysis" / "sheet_01_ex_01.tex").write_text("A1")
+        assert catalog.list() == []
+        # A direct lookup checks the exercise's own file
+        assert catalog.get("analysis/sheet_01_ex_01").content == b"A1"
+        catalog.refresh()
+        assert len(catalog.list()) == 1
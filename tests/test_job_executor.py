@@ -1,9 +1,15 @@
 """Tests for the job executor"""
 import json
+from pathlib import Path
 from unittest.mock import Mock, AsyncMock, patch
 import pytest
 
+from math_agent.config import MODEL_CLI_MAPPING
 from math_agent.services.job_executor import JobExecutor
+from math_agent.services.job_index import JobIndex
+from math_agent.services.job_log import read_log_entries
+from math_agent.services.log_hub import LogHub
+from math_agent.services.pdf_cache import PdfCache
 from math_agent.core.models import JobStatusEnum
 
 
@@ -117,6 +123,21 @@ class TestJobExecutor:
         assert updated["startedAt"] == "2024-01-01T00:00:00Z"
         assert updated["model"] == "claude-opus-4"  # Original field preserved
     
+    @pytest.mark.asyncio
+    async def test_update_status_updates_index(self, tmp_path):
+        """Test status updates are written through to the job index"""
+        job_dir = tmp_path / "test_job"
+        job_dir.mkdir()
+        (job_dir / "status.json").write_text(json.dumps({"status": JobStatusEnum.SETUP.value}))
+        
+        index = JobIndex(tmp_path, refresh_interval=3600)
+        index.all()
+        executor = JobExecutor(job_dir, index)
+        
+        await executor._update_status(JobStatusEnum.RUNNING)
+        
+        assert index.all()["test_job"]["status"] == JobStatusEnum.RUNNING.value
+    
     @pytest.mark.asyncio
     async def test_stream_output(self, tmp_path):
         """Test log streaming from process output"""
@@ -158,6 +179,64 @@ class TestJobExecutor:
         assert log2["type"] == "message"
         assert log2["content"] == "Working on problem..."
     
+    @pytest.mark.asyncio
+    async def test_stream_output_coalesces_deltas(self, tmp_path):
+        """Test delta events are logged as one record and optionally kept raw"""
+        job_dir = tmp_path / "test_job"
+        job_dir.mkdir()
+        
+        with patch("math_agent.services.job_executor.KEEP_RAW_STREAM", True):
+            executor = JobExecutor(job_dir)
+        
+        mock_process = Mock()
+        mock_process.stdout = AsyncMock()
+        mock_process.stdout.readline.side_effect = [
+            *(json.dumps({"type": "message", "role": "assistant", "content": word, "delta": True}).encode() + b"\n"
+              for word in ["Proof ", "by ", "induction."]),
+            b''
+        ]
+        executor.process = mock_process
+        
+        await executor._stream_output()
+        
+        entries, _ = read_log_entries(job_dir / "log.jsonl")
+        assert len(entries) == 1
+        assert entries[0]["content"] == "Proof by induction."
+        raw, _ = read_log_entries(job_dir / "stream.jsonl")
+        assert len(raw) == 3
+    
+    @pytest.mark.asyncio
+    async def test_stream_output_publishes_entries(self, tmp_path):
+        """Test streamed entries are published with their log offsets"""
+        job_dir = tmp_path / "test_job"
+        job_dir.mkdir()
+        
+        hub = LogHub()
+        subscription = hub.subscribe("test_job")
+        executor = JobExecutor(job_dir, log_hub=hub)
+        
+        mock_process = Mock()
+        mock_stdout = AsyncMock()
+        mock_stdout.readline.side_effect = [
+            b'{"type": "message", "content": "one"}\n',
+            b'{"type": "message", "content": "two"}\n',
+            b''
+        ]
+        mock_process.stdout = mock_stdout
+        executor.process = mock_process
+        
+        await executor._stream_output()
+        
+        first = await subscription.get(timeout=1)
+        second = await subscription.get(timeout=1)
+        assert first.data == [{"type": "message", "content": "one"}]
+        assert second.data == [{"type": "message", "content": "two"}]
+        
+        # Offsets match the byte positions just after each line on disk
+        log_bytes = (job_dir / "log.jsonl").read_bytes()
+        assert second.offset == len(log_bytes)
+        assert log_bytes[:first.offset].endswith(b'"one"}\n')
+    
     @pytest.mark.asyncio
     async def test_stream_output_handles_invalid_json(self, tmp_path):
         """Test log streaming handles non-JSON output"""
@@ -238,6 +317,147 @@ class TestJobExecutor:
             final_status = json.loads(status_file.read_text())
             assert final_status["status"] == "completed"
             assert "completedAt" in final_status
+            assert final_status["logIngest"]["lines"] == 0
+    
+    @pytest.mark.asyncio
+    async def test_execute_with_fake_agent_cli(self, tmp_path, monkeypatch):
+        """Test a real subprocess speaking stream-json, via the load-test fake CLI"""
+        job_dir = tmp_path / "test_job"
+        (job_dir / "workspace").mkdir(parents=True)
+        (job_dir / "workspace" / "prompt.md").write_text("Solve it")
+        (job_dir / "status.json").write_text(json.dumps({"status": "setup", "model": "claude-opus-4"}))
+        fake_cli = Path(__file__).parents[1] / "scripts" / "fake_agent_cli.py"
+        monkeypatch.setitem(MODEL_CLI_MAPPING, "claude-opus-4", str(fake_cli))
+        monkeypatch.setenv("FAKE_AGENT_EVENTS", "10")
+        monkeypatch.setenv("FAKE_AGENT_RATE", "0")
+        monkeypatch.setenv("FAKE_AGENT_TOOL_EVERY", "5")
+        monkeypatch.setenv("FAKE_AGENT_PARTIAL", "true")
+        
+        executor = JobExecutor(job_dir)
+        await executor.execute()
+        
+        status = json.loads((job_dir / "status.json").read_text())
+        assert status["status"] == "completed"
+        entries, _ = read_log_entries(job_dir / "log.jsonl")
+        assert [e["type"] for e in entries].count("tool_use") == 2
+        assert [e["type"] for e in entries].count("tool_result") == 2
+        messages = [e["content"] for e in entries if e["type"] == "message"]
+        assert len(messages) == 8 and messages[0].startswith("Step 0: ")
+    
+    @pytest.mark.asyncio
+    async def test_run_agent_leaves_compile_stage(self, tmp_path):
+        """Test a job with solution.tex is left in compiling state for the compile stage"""
+        job_dir = tmp_path / "test_job"
+        workspace_dir = job_dir / "workspace"
+        workspace_dir.mkdir(parents=True)
+        (job_dir / "status.json").write_text(json.dumps({"status": "setup", "model": "claude-opus-4"}))
+        
+        executor = JobExecutor(job_dir)
+        
+        with patch('asyncio.create_subprocess_exec') as mock_create_subprocess:
+            mock_process = AsyncMock()
+            mock_process.wait.return_value = 0
+            mock_process.stdout = AsyncMock()
+            mock_process.stdout.readline.return_value = b''
+            mock_create_subprocess.return_value = mock_process
+            
+            # The agent writes a solution
+            (workspace_dir / "solution.tex").write_text("\\documentclass{article}")
+            needs_compile = await executor.run_agent()
+        
+        assert needs_compile is True
+        status = json.loads((job_dir / "status.json").read_text())
+        assert status["status"] == JobStatusEnum.COMPILING.value
+        assert status["solutionTexCreated"] is True
+        assert "completedAt" not in status
+        
+        # The compile stage finishes the job
+        with patch.object(executor, "_compile_pdf", AsyncMock(return_value=True)):
+            await executor.compile()
+        
+        status = json.loads((job_dir / "status.json").read_text())
+        assert status["status"] == JobStatusEnum.COMPLETED.value
+        assert status["solutionPdfCreated"] is True
+        assert "completedAt" in status
+    
+    @pytest.mark.asyncio
+    async def test_compile_pdf_reruns_until_settled(self, tmp_path):
+        """Test pdflatex is rerun only while auxiliary files change"""
+        job_dir = tmp_path / "test_job"
+        workspace_dir = job_dir / "workspace"
+        workspace_dir.mkdir(parents=True)
+        
+        def fake_pdflatex(aux_contents):
+            passes = iter(aux_contents)
+            async def create(*args, **kwargs):
+                process = AsyncMock()
+                process.returncode = 0
+                async def communicate():
+                    (workspace_dir / "solution.aux").write_text(next(passes))
+                    (workspace_dir / "solution.pdf").write_bytes(b"%PDF")
+                    return b"Output written on solution.pdf", b""
+                process.communicate = communicate
+                return process
+            return create
+        
+        # No cross-references: one pass
+        executor = JobExecutor(job_dir)
+        with patch('asyncio.create_subprocess_exec', fake_pdflatex(["\\relax\n"])):
+            assert await executor._compile_pdf() is True
+        assert len(executor.latex_passes) == 1
+        
+        # Labels appear in the first pass and are stable in the second
+        (workspace_dir / "solution.aux").unlink()
+        labels = "\\relax\n\\newlabel{a}{{1}{1}}\n"
+        with patch('asyncio.create_subprocess_exec', fake_pdflatex([labels, labels])):
+            assert await executor._compile_pdf() is True
+        assert len(executor.latex_passes) == 2
+        assert all(p["returncode"] == 0 for p in executor.latex_passes)
+        assert "wallSeconds" in executor.resources["compile"]
+    
+    @pytest.mark.asyncio
+    async def test_update_status_keeps_earlier_phases(self, tmp_path):
+        """Test a compile executor created after a restart keeps the agent's persisted resources"""
+        job_dir = tmp_path / "test_job"
+        (job_dir / "workspace").mkdir(parents=True)
+        agent = {"wallSeconds": 60.0, "cpuSeconds": 12.0}
+        (job_dir / "status.json").write_text(json.dumps({"status": "compiling", "resources": {"agent": agent}}))
+        
+        executor = JobExecutor(job_dir)
+        executor.resources["compile"] = {"wallSeconds": 2.0, "cpuSeconds": 1.5}
+        await executor._update_status(JobStatusEnum.COMPILING, solutionTexCreated=True)
+        
+        resources = json.loads((job_dir / "status.json").read_text())["resources"]
+        assert resources == {"agent": agent, "compile": executor.resources["compile"]}
+    
+    @pytest.mark.asyncio
+    async def test_compile_reuses_cached_pdf(self, tmp_path):
+        """Test identical solution.tex files are compiled only once"""
+        cache = PdfCache(tmp_path / "cache", max_bytes=1024 ** 2)
+        executors = []
+        for name in ["job_a", "job_b"]:
+            job_dir = tmp_path / name
+            (job_dir / "workspace").mkdir(parents=True)
+            (job_dir / "workspace" / "solution.tex").write_text("\\documentclass{article}")
+            (job_dir / "status.json").write_text(json.dumps({"status": "compiling"}))
+            executors.append(JobExecutor(job_dir, pdf_cache=cache))
+        
+        compile_calls = []
+        for executor in executors:
+            async def fake_compile(executor=executor):
+                (executor.workspace_dir / "solution.pdf").write_bytes(b"%PDF-1.5")
+                return True
+            with patch.object(executor, "_compile_pdf", AsyncMock(side_effect=fake_compile)) as mock_compile:
+                await executor.compile()
+            compile_calls.append(mock_compile.await_count)
+        
+        assert compile_calls == [1, 0]
+        statuses = [json.loads((e.status_file).read_text()) for e in executors]
+        assert [s["pdfCache"] for s in statuses] == ["miss", "hit"]
+        assert all(s["solutionPdfCreated"] for s in statuses)
+        assert (tmp_path / "job_b" / "workspace" / "solution.pdf").read_bytes() == b"%PDF-1.5"
+        entries, _ = read_log_entries(tmp_path / "job_b" / "log.jsonl")
+        assert "Reused cached PDF" in entries[-1]["content"]
     
     @pytest.mark.asyncio  
     async def test_execute_error_flow(self, tmp_path):
@@ -275,6 +495,30 @@ class TestJobExecutor:
             assert "Process exited with code 1" in final_status["error"]
             assert "completedAt" in final_status
     
+    @pytest.mark.asyncio
+    async def test_execute_failure_stops_agent(self, tmp_path):
+        """Test the agent process is stopped when handling its output fails"""
+        job_dir = tmp_path / "test_job"
+        (job_dir / "workspace").mkdir(parents=True)
+        (job_dir / "status.json").write_text(json.dumps({"status": "setup", "model": "claude-opus-4"}))
+        executor = JobExecutor(job_dir)
+        
+        with patch('asyncio.create_subprocess_exec') as mock_create_subprocess:
+            mock_process = AsyncMock()
+            mock_process.returncode = None
+            mock_process.terminate = Mock()
+            mock_process.stdout = AsyncMock()
+            mock_process.stdout.readline.side_effect = OSError("pipe broke")
+            mock_create_subprocess.return_value = mock_process
+            
+            await executor.execute()
+        
+        mock_process.terminate.assert_called_once()
+        assert executor.process is None
+        final_status = json.loads((job_dir / "status.json").read_text())
+        assert final_status["status"] == "error"
+        assert final_status["error"] == "pipe broke"
+    
     @pytest.mark.asyncio
     async def test_cancel_running_job(self, tmp_path):
         """Test job cancellation"""
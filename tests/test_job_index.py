@@ -0,0 +1,190 @@
+"""Tests for the in-memory job status index"""
+import asyncio
+import json
+import os
+import shutil
+from unittest.mock import patch
+
+import pytest
+
+from math_agent.services.job_index import JobIndex
+
+
+def write_status(jobs_dir, job_name, status_data):
+    """Create a job directory with the given status.json"""
+    job_dir = jobs_dir / job_name
+    job_dir.mkdir(exist_ok=True)
+    (job_dir / "status.json").write_text(json.dumps(status_data))
+    return job_dir
+
+
+class TestJobIndex:
+    """Test the JobIndex class"""
+    
+    def test_all_reads_existing_jobs(self, tmp_path):
+        """Test the first listing picks up jobs already on disk"""
+        write_status(tmp_path, "job-a", {"status": "completed"})
+        write_status(tmp_path, "job-b", {"status": "setup"})
+        (tmp_path / "not-a-job").mkdir()
+        
+        index = JobIndex(tmp_path)
+        jobs = index.all()
+        
+        assert jobs == {
+            "job-a": {"status": "completed"},
+            "job-b": {"status": "setup"}
+        }
+    
+    def test_all_is_memory_read_between_refreshes(self, tmp_path):
+        """Test listing does not touch disk again within the refresh interval"""
+        write_status(tmp_path, "job-a", {"status": "setup"})
+        
+        index = JobIndex(tmp_path, refresh_interval=3600)
+        index.all()
+        
+        # Out-of-band edit is not visible until the next refresh
+        write_status(tmp_path, "job-a", {"status": "running", "extra": True})
+        assert index.all()["job-a"]["status"] == "setup"
+        
+        index.refresh()
+        assert index.all()["job-a"]["status"] == "running"
+    
+    def test_refresh_picks_up_out_of_band_changes(self, tmp_path):
+        """Test refresh detects created, modified and removed jobs"""
+        job_a = write_status(tmp_path, "job-a", {"status": "setup"})
+        index = JobIndex(tmp_path, refresh_interval=0)
+        assert set(index.all()) == {"job-a"}
+        
+        write_status(tmp_path, "job-b", {"status": "setup"})
+        (job_a / "status.json").write_text(json.dumps({"status": "completed"}))
+        # Make sure the mtime differs even on coarse-grained filesystems
+        os.utime(job_a / "status.json", ns=(0, 1))
+        
+        jobs = index.all()
+        assert jobs["job-a"]["status"] == "completed"
+        assert jobs["job-b"]["status"] == "setup"
+        
+        (job_a / "status.json").unlink()
+        job_a.rmdir()
+        assert set(index.all()) == {"job-b"}
+    
+    def test_write_updates_file_and_index(self, tmp_path):
+        """Test writing a status updates status.json and the index"""
+        write_status(tmp_path, "job-a", {"status": "setup"})
+        index = JobIndex(tmp_path, refresh_interval=3600)
+        index.all()
+        
+        index.write("job-a", {"status": "running"})
+        
+        assert index.all()["job-a"]["status"] == "running"
+        assert json.loads((tmp_path / "job-a" / "status.json").read_text()) == {"status": "running"}
+    
+    def test_get_rereads_changed_job(self, tmp_path):
+        """Test getting a single job sees out-of-band edits immediately"""
+        job_dir = write_status(tmp_path, "job-a", {"status": "setup"})
+        index = JobIndex(tmp_path, refresh_interval=3600)
+        assert index.get("job-a") == {"status": "setup"}
+        
+        (job_dir / "status.json").write_text(json.dumps({"status": "cancelled"}))
+        os.utime(job_dir / "status.json", ns=(0, 1))
+        
+        assert index.get("job-a") == {"status": "cancelled"}
+        assert index.get("missing") is None
+    
+    def test_corrupt_status_keeps_last_known(self, tmp_path):
+        """Test a corrupt status.json does not drop the job from the index"""
+        job_dir = write_status(tmp_path, "job-a", {"status": "running"})
+        index = JobIndex(tmp_path, refresh_interval=0)
+        index.all()
+        
+        (job_dir / "status.json").write_text("{not json")
+        
+        assert index.all()["job-a"]["status"] == "running"
+
+    def test_restart_reuses_catalog(self, tmp_path):
+        """Test a new index starts from the catalog and re-reads only changed files"""
+        write_status(tmp_path, "job-a", {"status": "completed"})
+        write_status(tmp_path, "job-b", {"status": "running"})
+        JobIndex(tmp_path).all()
+        
+        # Changed while the server was down
+        write_status(tmp_path, "job-b", {"status": "completed", "completedAt": "later"})
+        
+        index = JobIndex(tmp_path)
+        with patch("builtins.open", wraps=open) as mock_open:
+            jobs = index.all()
+        opened = [call.args[0].parent.name for call in mock_open.call_args_list]
+        assert opened == ["job-b"]
+        assert jobs["job-b"]["status"] == "completed"
+        
+    def test_query_writes_through(self, tmp_path):
+        """Test updates and removals are visible to catalog queries"""
+        index = JobIndex(tmp_path, refresh_interval=3600)
+        index.all()
+        write_status(tmp_path, "job-a", {"status": "setup", "createdAt": "1"})
+        index.update("job-a", {"status": "setup", "createdAt": "1"})
+        index.update_many({
+            "job-b": {"status": "completed", "createdAt": "2"},
+            "job-c": {"status": "completed", "createdAt": "3"},
+        })
+        
+        total, jobs = index.query(statuses=["completed"])
+        assert total == 2
+        assert [name for name, _ in jobs] == ["job-c", "job-b"]
+        
+        index.refresh()
+        # job-b and job-c have no directory, so they are forgotten
+        assert index.query() == (1, [("job-a", {"status": "setup", "createdAt": "1"})])
+
+    def test_changes_report_updates_and_removals(self, tmp_path):
+        """Test the change feed includes removed jobs and survives a restart"""
+        write_status(tmp_path, "job-a", {"status": "setup"})
+        write_status(tmp_path, "job-b", {"status": "setup"})
+        index = JobIndex(tmp_path, refresh_interval=0)
+        seq, changes = index.changes(0)
+        assert sorted(name for name, _ in changes) == ["job-a", "job-b"]
+        
+        index.write("job-a", {"status": "running"})
+        shutil.rmtree(tmp_path / "job-b")
+        new_seq, changes = index.changes(seq)
+        assert dict(changes) == {"job-a": {"status": "running"}, "job-b": None}
+        
+        # The sequence continues after a restart
+        assert JobIndex(tmp_path).changes(new_seq) == (new_seq, [])
+
+    def test_changes_sequence_shared_between_processes(self, tmp_path):
+        """Test two indexes on one catalog never hand out the same sequence number"""
+        write_status(tmp_path, "job-a", {"status": "setup"})
+        write_status(tmp_path, "job-b", {"status": "setup"})
+        first = JobIndex(tmp_path, refresh_interval=3600)
+        second = JobIndex(tmp_path, refresh_interval=3600)
+        second.all()
+        seq, _ = first.changes(0)
+        
+        first.update("job-a", {"status": "running"})
+        second.update("job-b", {"status": "running"})
+        
+        # Each sees the other's change, at distinct sequence numbers
+        new_seq, changes = first.changes(seq)
+        assert new_seq == seq + 2
+        assert changes == [("job-a", {"status": "running"}), ("job-b", {"status": "running"})]
+        assert second.changes(seq + 1) == (new_seq, [("job-b", {"status": "running"})])
+
+    @pytest.mark.asyncio
+    async def test_refresh_in_event_loop_runs_in_background(self, tmp_path):
+        """Test a stale index is served from memory while a background scan runs"""
+        job_a = write_status(tmp_path, "job-a", {"status": "setup"})
+        index = JobIndex(tmp_path, refresh_interval=0)
+        assert set(index.all()) == {"job-a"}
+        
+        (job_a / "status.json").write_text(json.dumps({"status": "completed"}))
+        os.utime(job_a / "status.json", ns=(0, 1))
+        write_status(tmp_path, "job-b", {"status": "setup"})
+        with patch("builtins.open", side_effect=AssertionError("read on the event loop")):
+            assert index.all() == {"job-a": {"status": "setup"}}
+        # Let the scan start, then write while it is in flight; the scan must not undo it
+        await asyncio.sleep(0)
+        index.write("job-b", {"status": "running"})
+        
+        await index._refresh_task
+        assert index.all() == {"job-a": {"status": "completed"}, "job-b": {"status": "running"}}
@@ -0,0 +1,130 @@
+"""Tests for job leases on a shared jobs directory"""
+import json
+import os
+import subprocess
+import sys
+import textwrap
+import time
+from pathlib import Path
+
+import math_agent
+from math_agent.services.job_lease import LEASE_FILENAME, JobLeases
+
+
+def make_job(jobs_dir, job_name, status="setup"):
+    job_dir = jobs_dir / job_name
+    (job_dir / "workspace").mkdir(parents=True)
+    (job_dir / "status.json").write_text(json.dumps({"status": status, "model": "claude-opus-4"}))
+    return job_dir
+
+
+def expire(jobs_dir, job_name, ttl):
+    """Backdate a lease as if its holder stopped renewing it"""
+    past = time.time() - ttl - 1
+    os.utime(jobs_dir / job_name / LEASE_FILENAME, (past, past))
+
+
+class TestJobLeases:
+    """Test the JobLeases class"""
+
+    def test_one_holder_at_a_time(self, tmp_path):
+        """Test a lease is held by one node until it is released"""
+        make_job(tmp_path, "job")
+        a = JobLeases(tmp_path, "node-a", ttl=30)
+        b = JobLeases(tmp_path, "node-b", ttl=30)
+
+        assert a.acquire("job")
+        assert a.acquire("job")
+        assert not b.acquire("job")
+        assert b.holder("job") == "node-a"
+        assert not b.expired("job")
+
+        a.release("job")
+        assert a.holder("job") is None
+        assert b.acquire("job")
+        # Releasing someone else's lease does nothing
+        a.release("job")
+        assert b.holder("job") == "node-b"
+
+    def test_expired_lease_is_taken_over(self, tmp_path):
+        """Test an expired lease goes to another node and its old holder notices"""
+        make_job(tmp_path, "job")
+        a = JobLeases(tmp_path, "node-a", ttl=30)
+        b = JobLeases(tmp_path, "node-b", ttl=30)
+        assert a.acquire("job")
+
+        expire(tmp_path, "job", ttl=30)
+        assert b.expired("job")
+        assert b.acquire("job")
+        assert not a.renew("job")
+        assert b.renew("job")
+        assert sorted(p.name for p in (tmp_path / "job").iterdir()) == [LEASE_FILENAME, "status.json", "workspace"]
+
+    def test_acquire_missing_job(self, tmp_path):
+        """Test there is no lease for a job directory that does not exist"""
+        assert not JobLeases(tmp_path, "node-a", ttl=30).acquire("missing")
+
+
+def test_processes_run_each_job_once(tmp_path):
+    """Test several worker processes on one jobs directory run every job exactly once"""
+    jobs_dir = tmp_path / "jobs"
+    job_names = [f"job-{i}" for i in range(12)]
+    for job_name in job_names:
+        make_job(jobs_dir, job_name)
+
+    worker = textwrap.dedent("""
+        import asyncio, json, sys
+        from pathlib import Path
+        from unittest.mock import patch
+
+        from math_agent.core.utils import atomic_write_json
+        from math_agent.services.job_lease import JobLeases
+        from math_agent.services.job_manager import JobManager
+
+        jobs_dir, node = Path(sys.argv[1]), sys.argv[2]
+
+        class Executor:
+            def __init__(self, job_dir, *args, **kwargs):
+                self.job_dir = job_dir
+                self.abandoned = False
+
+            async def run_agent(self):
+                with open(self.job_dir / "runs.txt", "a") as f:
+                    f.write(node + "\\n")
+                await asyncio.sleep(0.05)
+                status = json.loads((self.job_dir / "status.json").read_text())
+                status["status"] = "completed"
+                atomic_write_json(self.job_dir / "status.json", status)
+                return False
+
+            async def cancel(self):
+                pass
+
+        def finished():
+            return all(json.loads((d / "status.json").read_text())["status"] == "completed"
+                       for d in jobs_dir.iterdir())
+
+        async def main():
+            manager = JobManager(jobs_dir, leases=JobLeases(jobs_dir, node, ttl=5),
+                                 cli_limits={"claude": 2}, latex_workers=0, run_workers=True)
+            await manager.start()
+            for _ in range(300):
+                if finished():
+                    break
+                await asyncio.sleep(0.05)
+            await manager.stop()
+
+        with patch("math_agent.services.job_manager.JobExecutor", Executor):
+            asyncio.run(main())
+    """)
+    env = {**os.environ, "PYTHONPATH": str(Path(math_agent.__file__).parents[1]), "JOB_SCAN_INTERVAL": "0"}
+    processes = [
+        subprocess.Popen([sys.executable, "-c", worker, str(jobs_dir), f"node-{i}"], env=env)
+        for i in range(3)
+    ]
+    assert [p.wait(timeout=60) for p in processes] == [0, 0, 0]
+
+    for job_name in job_names:
+        runs = (jobs_dir / job_name / "runs.txt").read_text().split()
+        assert len(runs) == 1, f"{job_name} ran on {runs}"
+        assert not (jobs_dir / job_name / LEASE_FILENAME).exists()
@@ -0,0 +1,146 @@
+"""Tests for job log reading and the buffered log writer"""
+import asyncio
+import builtins
+import json
+from unittest.mock import patch
+
+import pytest
+
+from math_agent.services.job_log import JobLogWriter, archive_log, log_size, read_log_entries
+
+
+class TestReadLogEntries:
+    """Test reading log entries by byte offset"""
+    
+    def test_missing_log(self, tmp_path):
+        """Test a missing log reads as empty"""
+        assert read_log_entries(tmp_path / "log.jsonl") == ([], 0)
+    
+    def test_malformed_line(self, tmp_path):
+        """Test malformed lines are wrapped as system entries"""
+        log_file = tmp_path / "log.jsonl"
+        log_file.write_text('not json\n{"type": "message"}\n')
+        
+        entries, cursor = read_log_entries(log_file)
+        
+        assert entries[0]["type"] == "system"
+        assert "Malformed log entry" in entries[0]["content"]
+        assert entries[1] == {"type": "message"}
+        assert cursor == log_file.stat().st_size
+
+    
+    def test_archived_log_reads_like_plain_log(self, tmp_path):
+        """Test cursors keep working after a log is archived"""
+        log_file = tmp_path / "log.jsonl"
+        log_file.write_text("".join(json.dumps({"n": i}) + "\n" for i in range(100)))
+        plain_size = log_file.stat().st_size
+        _, cursor = read_log_entries(log_file)
+        middle = len(json.dumps({"n": 0}) + "\n") * 10
+        expected = read_log_entries(log_file, middle)
+        
+        assert archive_log(log_file) is True
+        assert not log_file.exists()
+        assert (tmp_path / "log.jsonl.gz").stat().st_size < plain_size
+        
+        assert log_size(log_file) == plain_size
+        assert read_log_entries(log_file, middle) == expected
+        assert read_log_entries(log_file, cursor) == ([], cursor)
+        # Nothing left to archive
+        assert archive_log(log_file) is False
+
+    def test_log_archived_while_opening(self, tmp_path):
+        """Test a read racing archive_log falls back to the archive"""
+        log_file = tmp_path / "log.jsonl"
+        log_file.write_text("".join(json.dumps({"n": i}) + "\n" for i in range(10)))
+        expected = read_log_entries(log_file)
+        real_open = builtins.open
+        archived = []
+        
+        def archive_first(path, *args, **kwargs):
+            # The log is archived just before the reader opens it
+            if path == log_file and not archived:
+                archived.append(path)
+                archive_log(log_file)
+            return real_open(path, *args, **kwargs)
+        
+        with patch("builtins.open", side_effect=archive_first):
+            assert read_log_entries(log_file) == expected
+        assert not log_file.exists()
+
+
+class TestJobLogWriter:
+    """Test the JobLogWriter class"""
+    
+    @pytest.mark.asyncio
+    async def test_buffers_until_flush(self, tmp_path):
+        """Test entries stay in memory until flushed"""
+        log_file = tmp_path / "log.jsonl"
+        writer = JobLogWriter(log_file, flush_bytes=1 << 20, flush_interval=3600)
+        
+        await writer.write({"n": 1})
+        await writer.write({"n": 2})
+        assert not log_file.exists()
+        
+        await writer.flush()
+        entries, _ = read_log_entries(log_file)
+        assert entries == [{"n": 1}, {"n": 2}]
+        assert writer.stats()["flushes"] == 1
+        await writer.close()
+    
+    @pytest.mark.asyncio
+    async def test_flushes_on_size_threshold(self, tmp_path):
+        """Test a full buffer is written immediately in one batch"""
+        log_file = tmp_path / "log.jsonl"
+        writer = JobLogWriter(log_file, flush_bytes=64, flush_interval=3600)
+        
+        for n in range(10):
+            await writer.write({"n": n, "padding": "x" * 10})
+        
+        stats = writer.stats()
+        assert 1 <= stats["flushes"] < 10
+        assert log_file.stat().st_size >= 64
+        await writer.close()
+        assert len(read_log_entries(log_file)[0]) == 10
+    
+    @pytest.mark.asyncio
+    async def test_flushes_on_time_threshold(self, tmp_path):
+        """Test buffered entries are written after the flush interval"""
+        log_file = tmp_path / "log.jsonl"
+        flushed = []
+        writer = JobLogWriter(log_file, flush_bytes=1 << 20, flush_interval=0.01,
+                              on_flush=flushed.append)
+        
+        offset = await writer.write({"n": 1})
+        await asyncio.sleep(0.1)
+        
+        assert read_log_entries(log_file)[0] == [{"n": 1}]
+        assert flushed == [offset]
+        await writer.close()
+    
+    @pytest.mark.asyncio
+    async def test_offsets_continue_existing_log(self, tmp_path):
+        """Test offsets are byte positions in the whole file"""
+        log_file = tmp_path / "log.jsonl"
+        log_file.write_text(json.dumps({"type": "system"}) + "\n")
+        writer = JobLogWriter(log_file)
+        
+        offset = await writer.write({"n": 1})
+        await writer.close()
+        
+        assert offset == log_file.stat().st_size
+        stats = writer.stats()
+        assert stats["lines"] == 1
+        assert stats["bytes"] == len(json.dumps({"n": 1})) + 1
+    
+    @pytest.mark.asyncio
+    async def test_write_after_close_reopens(self, tmp_path):
+        """Test the writer can be used again after closing"""
+        log_file = tmp_path / "log.jsonl"
+        writer = JobLogWriter(log_file)
+        
+        await writer.write({"n": 1})
+        await writer.close()
+        await writer.write({"n": 2})
+        await writer.close()
+        
+        assert read_log_entries(log_file)[0] == [{"n": 1}, {"n": 2}]
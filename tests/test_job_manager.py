@@ -0,0 +1,517 @@
+"""Tests for the job manager"""
+import asyncio
+import json
+from unittest.mock import patch
+
+import pytest
+
+from math_agent.services.job_index import JobIndex
+from math_agent.services.job_lease import LEASE_FILENAME, JobLeases
+from math_agent.core.metrics import CONCURRENCY_ADJUSTMENTS, JOB_DURATION, QUEUE_WAIT, RUNNING_JOBS
+from math_agent.services.job_manager import JobManager
+from math_agent.services.scheduling import AdaptiveLimit, ConcurrencyController, HostSample, RateLimiter
+
+GiB = 1024 ** 3
+
+
+def create_job(jobs_dir, job_name, status="setup", model="claude-opus-4"):
+    """Create a job directory with a status.json"""
+    job_dir = jobs_dir / job_name
+    job_dir.mkdir()
+    (job_dir / "workspace").mkdir()
+    (job_dir / "status.json").write_text(json.dumps({"status": status, "model": model}))
+    return job_dir
+
+
+class FakeExecutor:
+    """Executor stand-in that records runs and finishes on demand"""
+    
+    runs = []
+    compiles = []
+    release: asyncio.Event = None
+    
+    def __init__(self, job_dir, *args, **kwargs):
+        self.job_dir = job_dir
+        
+    async def run_agent(self):
+        FakeExecutor.runs.append(self.job_dir.name)
+        await FakeExecutor.release.wait()
+        needs_compile = (self.job_dir / "workspace" / "solution.tex").exists()
+        self._set_status("compiling" if needs_compile else "completed")
+        return needs_compile
+        
+    async def compile(self):
+        FakeExecutor.compiles.append(self.job_dir.name)
+        await FakeExecutor.release_compile.wait()
+        self._set_status("completed")
+        
+    def _set_status(self, value):
+        status_file = self.job_dir / "status.json"
+        status = json.loads(status_file.read_text())
+        status["status"] = value
+        status_file.write_text(json.dumps(status))
+        
+    async def cancel(self):
+        pass
+
+
+@pytest.fixture
+def fake_executor():
+    """Patch JobExecutor with FakeExecutor"""
+    FakeExecutor.runs = []
+    FakeExecutor.compiles = []
+    FakeExecutor.release = asyncio.Event()
+    FakeExecutor.release_compile = asyncio.Event()
+    with patch("math_agent.services.job_manager.JobExecutor", FakeExecutor):
+        yield FakeExecutor
+
+
+async def wait_for(condition, timeout=2.0):
+    """Wait until condition() is true"""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("Condition not met in time")
+        await asyncio.sleep(0.01)
+
+
+class TestJobManager:
+    """Test the JobManager class"""
+    
+    @pytest.mark.asyncio
+    async def test_submit_job_deduplicates(self, tmp_path):
+        """Test a job is queued at most once"""
+        create_job(tmp_path, "job-a")
+        manager = JobManager(tmp_path, max_concurrent_jobs=1)
+        
+        assert await manager.submit_job("job-a") is True
+        assert await manager.submit_job("job-a") is False
+        assert manager.get_queue_size() == 1
+    
+    @pytest.mark.asyncio
+    async def test_job_runs_once(self, tmp_path, fake_executor):
+        """Test a job submitted repeatedly is executed by one worker only"""
+        create_job(tmp_path, "job-a")
+        manager = JobManager(tmp_path, max_concurrent_jobs=2, job_index=JobIndex(tmp_path))
+        await manager.start()
+        try:
+            await manager.submit_job("job-a")
+            await wait_for(lambda: "job-a" in manager.running_jobs)
+            
+            # Resubmitting a running job is a no-op
+            assert await manager.submit_job("job-a") is False
+            
+            fake_executor.release.set()
+            await wait_for(lambda: not manager.running_jobs)
+            await asyncio.sleep(0.05)
+            assert fake_executor.runs == ["job-a"]
+        finally:
+            await manager.stop()
+    
+    @pytest.mark.asyncio
+    async def test_job_metrics(self, tmp_path, fake_executor):
+        """Test running counts, queue wait and stage durations are recorded"""
+        create_job(tmp_path, "job-a", model="gemini-2.5-flash")
+        labels = {"model": "gemini-2.5-flash", "stage": "agent"}
+        durations = JOB_DURATION.count(**labels)
+        waits = QUEUE_WAIT.count(model="gemini-2.5-flash")
+        
+        manager = JobManager(tmp_path, max_concurrent_jobs=1, latex_workers=1)
+        await manager.start()
+        try:
+            await wait_for(lambda: "job-a" in manager.running_jobs)
+            assert RUNNING_JOBS.value(**labels) == 1
+            
+            fake_executor.release.set()
+            await wait_for(lambda: not manager.running_jobs)
+            assert RUNNING_JOBS.value(**labels) == 0
+            assert JOB_DURATION.count(**labels) == durations + 1
+            assert QUEUE_WAIT.count(model="gemini-2.5-flash") == waits + 1
+        finally:
+            await manager.stop()
+    
+    @pytest.mark.asyncio
+    async def test_worker_skips_jobs_no_longer_in_setup(self, tmp_path, fake_executor):
+        """Test a job cancelled while queued is not executed"""
+        job_dir = create_job(tmp_path, "job-a")
+        manager = JobManager(tmp_path, max_concurrent_jobs=1)
+        await manager.submit_job("job-a")
+        (job_dir / "status.json").write_text(json.dumps({"status": "cancelled"}))
+        
+        await manager.start()
+        try:
+            await wait_for(lambda: manager.get_queue_size() == 0)
+            await asyncio.sleep(0.05)
+            assert fake_executor.runs == []
+        finally:
+            await manager.stop()
+    
+    @pytest.mark.asyncio
+    async def test_start_queues_existing_setup_jobs(self, tmp_path):
+        """Test jobs left in setup state are queued once at startup"""
+        create_job(tmp_path, "job-setup")
+        create_job(tmp_path, "job-done", status="completed")
+        manager = JobManager(tmp_path, max_concurrent_jobs=0)
+        
+        await manager.start()
+        try:
+            assert manager.get_queue_size() == 1
+            assert manager.model_queues["claude-opus-4"].get_nowait() == "job-setup"
+        finally:
+            await manager.stop()
+    
+    @pytest.mark.asyncio
+    async def test_scan_only_looks_at_new_jobs(self, tmp_path):
+        """Test the directory watcher queues externally created jobs once"""
+        manager = JobManager(tmp_path, max_concurrent_jobs=0)
+        await manager._scan_for_new_jobs()
+        assert manager.get_queue_size() == 0
+        
+        create_job(tmp_path, "external-job")
+        await manager._scan_for_new_jobs()
+        await manager._scan_for_new_jobs()
+        
+        assert manager.get_queue_size() == 1
+    
+    @pytest.mark.asyncio
+    async def test_cli_tools_do_not_block_each_other(self, tmp_path, fake_executor):
+        """Test a saturated CLI tool does not hold up jobs for another one"""
+        create_job(tmp_path, "claude-1", model="claude-opus-4")
+        create_job(tmp_path, "claude-2", model="claude-sonnet-4")
+        create_job(tmp_path, "gemini-1", model="gemini-2.5-pro")
+        manager = JobManager(tmp_path, max_concurrent_jobs=5, cli_limits={"claude": 1, "gemini": 1})
+        
+        await manager.start()
+        try:
+            for job_name in ["claude-1", "claude-2", "gemini-1"]:
+                await manager.submit_job(job_name)
+            await wait_for(lambda: len(manager.running_jobs) == 2)
+            await asyncio.sleep(0.05)
+            
+            assert "gemini-1" in manager.running_jobs
+            assert manager.get_running_per_cli() == {"claude": 1, "gemini": 1}
+            
+            fake_executor.release.set()
+            await wait_for(lambda: sorted(fake_executor.runs) == ["claude-1", "claude-2", "gemini-1"])
+        finally:
+            await manager.stop()
+    
+    @pytest.mark.asyncio
+    async def test_rate_limit_token_is_taken_at_launch(self, tmp_path, fake_executor):
+        """Test a job waiting for an adaptive slot has not used up a start of its CLI tool"""
+        create_job(tmp_path, "claude-1", model="claude-opus-4")
+        create_job(tmp_path, "claude-2", model="claude-sonnet-4")
+        controller = ConcurrencyController(AdaptiveLimit(1), minimum=1, maximum=1)
+        manager = JobManager(tmp_path, max_concurrent_jobs=5, cli_rate_limits={"claude": 10},
+                             controller=controller, adapt_interval=3600)
+        
+        await manager.start()
+        try:
+            await wait_for(lambda: len(manager.running_jobs) == 1 and controller.limit.waiting == 1)
+            assert len(manager._cli_rate_limiters["claude"]._starts) == 1
+            
+            fake_executor.release.set()
+            await wait_for(lambda: len(fake_executor.runs) == 2)
+            assert len(manager._cli_rate_limiters["claude"]._starts) == 2
+        finally:
+            await manager.stop()
+    
+    @pytest.mark.asyncio
+    async def test_model_limit(self, tmp_path, fake_executor):
+        """Test a model limit is tighter than its CLI tool's limit"""
+        create_job(tmp_path, "opus-1", model="claude-opus-4")
+        create_job(tmp_path, "opus-2", model="claude-opus-4")
+        create_job(tmp_path, "sonnet-1", model="claude-sonnet-4")
+        manager = JobManager(tmp_path, max_concurrent_jobs=3, model_limits={"claude-opus-4": 1})
+        
+        await manager.start()
+        try:
+            for job_name in ["opus-1", "opus-2", "sonnet-1"]:
+                await manager.submit_job(job_name)
+            await wait_for(lambda: len(manager.running_jobs) == 2)
+            await asyncio.sleep(0.05)
+            
+            assert "sonnet-1" in manager.running_jobs
+            assert len([name for name in manager.running_jobs if name.startswith("opus")]) == 1
+            fake_executor.release.set()
+        finally:
+            await manager.stop()
+    
+    @pytest.mark.asyncio
+    async def test_cancelled_job_keeps_worker_alive(self, tmp_path, fake_executor):
+        """Test cancelling a job does not stop the worker that ran it"""
+        create_job(tmp_path, "job-a")
+        create_job(tmp_path, "job-b")
+        manager = JobManager(tmp_path, max_concurrent_jobs=1)
+        
+        await manager.start()
+        try:
+            await manager.submit_job("job-a")
+            await manager.submit_job("job-b")
+            await wait_for(lambda: "job-a" in manager.running_jobs)
+            
+            assert await manager.cancel_job("job-a") is True
+            await wait_for(lambda: "job-b" in manager.running_jobs)
+            fake_executor.release.set()
+        finally:
+            await manager.stop()
+    
+    @pytest.mark.asyncio
+    async def test_compile_does_not_hold_agent_slot(self, tmp_path, fake_executor):
+        """Test the next agent starts while the previous job is still compiling"""
+        job_dir = create_job(tmp_path, "job-a")
+        (job_dir / "workspace" / "solution.tex").write_text("tex")
+        create_job(tmp_path, "job-b")
+        manager = JobManager(tmp_path, max_concurrent_jobs=1, latex_workers=1)
+        
+        await manager.start()
+        try:
+            fake_executor.release.set()
+            await wait_for(lambda: fake_executor.compiles == ["job-a"])
+            await wait_for(lambda: sorted(fake_executor.runs) == ["job-a", "job-b"])
+            assert json.loads((job_dir / "status.json").read_text())["status"] == "compiling"
+            
+            fake_executor.release_compile.set()
+            await wait_for(lambda: json.loads((job_dir / "status.json").read_text())["status"] == "completed")
+        finally:
+            await manager.stop()
+    
+    @pytest.mark.asyncio
+    async def test_start_requeues_compiling_jobs(self, tmp_path, fake_executor):
+        """Test jobs left in compiling state are compiled after a restart"""
+        create_job(tmp_path, "job-a", status="compiling")
+        manager = JobManager(tmp_path, max_concurrent_jobs=1, latex_workers=1)
+        
+        await manager.start()
+        try:
+            fake_executor.release_compile.set()
+            await wait_for(lambda: fake_executor.compiles == ["job-a"])
+            assert fake_executor.runs == []
+        finally:
+            await manager.stop()
+
+    
+    @pytest.mark.asyncio
+    async def test_start_archives_finished_logs(self, tmp_path, fake_executor):
+        """Test logs of jobs that finished before archiving existed are compressed"""
+        for name, status in [("job-a", "completed"), ("job-b", "running")]:
+            job_dir = create_job(tmp_path, name, status=status)
+            (job_dir / "log.jsonl").write_text('{"type": "system"}\n')
+        manager = JobManager(tmp_path, max_concurrent_jobs=1, latex_workers=1)
+        
+        await manager.start()
+        try:
+            await wait_for(lambda: (tmp_path / "job-a" / "log.jsonl.gz").exists() and not manager._archivers)
+            assert not (tmp_path / "job-a" / "log.jsonl").exists()
+            assert (tmp_path / "job-b" / "log.jsonl").exists()
+        finally:
+            await manager.stop()
+
+    
+    @pytest.mark.asyncio
+    async def test_takes_over_jobs_with_expired_lease(self, tmp_path, fake_executor):
+        """Test a running job whose node stopped renewing its lease is run again"""
+        create_job(tmp_path, "job-a", status="running")
+        dead = JobLeases(tmp_path, "dead-node", ttl=0.3)
+        assert dead.acquire("job-a")
+        manager = JobManager(tmp_path, max_concurrent_jobs=1, latex_workers=1,
+                             leases=JobLeases(tmp_path, "node-b", ttl=0.3))
+        
+        await manager.start()
+        try:
+            await wait_for(lambda: fake_executor.runs == ["job-a"])
+            assert manager.leases.holder("job-a") == "node-b"
+            status = json.loads((tmp_path / "job-a" / "status.json").read_text())
+            assert status["leaseTakeovers"] == 1
+            
+            fake_executor.release.set()
+            await wait_for(lambda: not (tmp_path / "job-a" / LEASE_FILENAME).exists())
+        finally:
+            await manager.stop()
+    
+    @pytest.mark.asyncio
+    async def test_without_workers_leaves_jobs_to_worker_nodes(self, tmp_path, fake_executor):
+        """Test an API-only node queues nothing"""
+        create_job(tmp_path, "job-a")
+        manager = JobManager(tmp_path, run_workers=False)
+        
+        await manager.start()
+        try:
+            assert await manager.submit_job("job-a") is False
+            assert manager.get_queue_size() == 0
+            assert manager._workers == []
+        finally:
+            await manager.stop()
+
+    
+    @pytest.mark.asyncio
+    async def test_restart_restores_queue_and_requeues_orphans(self, tmp_path, fake_executor):
+        """Test a restarted manager runs orphaned jobs first, then the queue in its old order"""
+        manager = JobManager(tmp_path, max_concurrent_jobs=1, latex_workers=1)
+        await manager.start()
+        for name in ["job-a", "job-b", "job-c", "job-d"]:
+            create_job(tmp_path, name)
+        await manager.submit_jobs(["job-d", "job-c", "job-b", "job-a"])
+        await wait_for(lambda: fake_executor.runs == ["job-d"])
+        # The process goes away while job-d runs
+        await manager.stop()
+        assert json.loads((tmp_path / "job-d" / "status.json").read_text())["status"] == "setup"
+        
+        # FakeExecutor does not write running itself
+        status = json.loads((tmp_path / "job-d" / "status.json").read_text())
+        status["status"] = "running"
+        (tmp_path / "job-d" / "status.json").write_text(json.dumps(status))
+        
+        fake_executor.runs = []
+        fake_executor.release.set()
+        manager = JobManager(tmp_path, max_concurrent_jobs=1, latex_workers=1)
+        await manager.start()
+        try:
+            await wait_for(lambda: len(fake_executor.runs) == 4)
+            assert fake_executor.runs == ["job-d", "job-c", "job-b", "job-a"]
+            assert json.loads((tmp_path / "job-d" / "status.json").read_text())["requeues"] == 1
+        finally:
+            await manager.stop()
+    
+    @pytest.mark.asyncio
+    async def test_duplicate_of_running_job_keeps_it_journaled(self, tmp_path, fake_executor):
+        """Test skipping a queue entry for a job running here does not journal it as finished"""
+        create_job(tmp_path, "job-a")
+        manager = JobManager(tmp_path, max_concurrent_jobs=1, latex_workers=1)
+        await manager.start()
+        try:
+            await wait_for(lambda: fake_executor.runs == ["job-a"])
+            
+            await manager._run_job("test", "job-a")
+            
+            assert manager.journal.replay() == ([], ["job-a"])
+            assert fake_executor.runs == ["job-a"]
+            fake_executor.release.set()
+        finally:
+            await manager.stop()
+    
+    @pytest.mark.asyncio
+    async def test_orphan_policy_error(self, tmp_path, fake_executor):
+        """Test orphaned running jobs can be marked as errors instead"""
+        create_job(tmp_path, "job-a", status="running")
+        manager = JobManager(tmp_path, max_concurrent_jobs=1, latex_workers=1, orphan_policy="error")
+        
+        await manager.start()
+        try:
+            status = json.loads((tmp_path / "job-a" / "status.json").read_text())
+            assert status["status"] == "error"
+            assert "restart" in status["error"]
+            assert fake_executor.runs == []
+        finally:
+            await manager.stop()
+    
+    def test_unknown_orphan_policy_is_rejected(self, tmp_path):
+        """Test a mistyped ORPHAN_POLICY fails at startup instead of meaning error"""
+        with pytest.raises(ValueError, match="ORPHAN_POLICY"):
+            JobManager(tmp_path, latex_workers=1, orphan_policy="requeu")
+
+    
+    @pytest.mark.asyncio
+    async def test_adaptive_limit_grows_with_headroom(self, tmp_path, fake_executor):
+        """Test the adaptive limit holds jobs back across CLI tools and grows while the host is idle"""
+        for job_name, model in [("claude-1", "claude-opus-4"), ("gemini-1", "gemini-2.5-pro"),
+                                ("gemini-2", "gemini-2.5-flash")]:
+            create_job(tmp_path, job_name, model=model)
+        controller = ConcurrencyController(AdaptiveLimit(1), minimum=1, maximum=2)
+        manager = JobManager(tmp_path, max_concurrent_jobs=5, controller=controller, adapt_interval=3600)
+        ups = CONCURRENCY_ADJUSTMENTS.value(direction="up")
+        
+        await manager.start()
+        try:
+            await wait_for(lambda: len(manager.running_jobs) == 1 and controller.limit.waiting == 2)
+            
+            manager.adapt_interval = 0.01
+            manager._adapter.cancel()
+            with patch("math_agent.services.job_manager.read_host_sample",
+                       return_value=HostSample(0.1, 8 * GiB, 16 * GiB)):
+                manager._adapter = asyncio.create_task(manager._adapt_concurrency())
+                await wait_for(lambda: len(manager.running_jobs) == 2)
+                await asyncio.sleep(0.05)
+            
+            assert controller.limit.limit == 2
+            assert len(manager.running_jobs) == 2
+            assert CONCURRENCY_ADJUSTMENTS.value(direction="up") == ups + 1
+            fake_executor.release.set()
+            await wait_for(lambda: len(fake_executor.runs) == 3)
+        finally:
+            await manager.stop()
+
+    
+    @pytest.mark.asyncio
+    async def test_adaptive_limit_is_not_held_by_waiting_lane(self, tmp_path, fake_executor):
+        """Test jobs queued behind a saturated CLI tool leave adaptive slots to other tools"""
+        create_job(tmp_path, "claude-1", model="claude-opus-4")
+        create_job(tmp_path, "claude-2", model="claude-sonnet-4")
+        controller = ConcurrencyController(AdaptiveLimit(2), minimum=1, maximum=2)
+        manager = JobManager(tmp_path, max_concurrent_jobs=5, cli_limits={"claude": 1, "gemini": 1},
+                             controller=controller, adapt_interval=3600)
+        
+        await manager.start()
+        try:
+            await wait_for(lambda: len(manager.running_jobs) == 1)
+            await asyncio.sleep(0.05)
+            
+            create_job(tmp_path, "gemini-1", model="gemini-2.5-pro")
+            await manager.submit_job("gemini-1")
+            await wait_for(lambda: "gemini-1" in manager.running_jobs)
+            assert manager.get_running_per_cli() == {"claude": 1, "gemini": 1}
+            
+            fake_executor.release.set()
+            await wait_for(lambda: sorted(fake_executor.runs) == ["claude-1", "claude-2", "gemini-1"])
+        finally:
+            await manager.stop()
+
+
+class TestConcurrencyController:
+    """Test the ConcurrencyController class"""
+    
+    def test_additive_increase_multiplicative_decrease(self):
+        """Test the limit grows by one with headroom and demand, and halves under pressure"""
+        limit = AdaptiveLimit(4)
+        controller = ConcurrencyController(limit, minimum=1, maximum=8, max_load=1.0, min_free_memory=0.1)
+        idle = HostSample(0.2, 12 * GiB, 16 * GiB)
+        
+        assert controller.decide(idle) == (4, "no demand")
+        limit.waiting = 1
+        assert controller.decide(idle)[0] == 5
+        assert controller.decide(HostSample(0.9, 12 * GiB, 16 * GiB))[0] == 4
+        assert controller.decide(HostSample(1.5, 12 * GiB, 16 * GiB))[0] == 2
+        assert controller.decide(HostSample(0.2, GiB, 16 * GiB))[0] == 2
+        
+        # Another job of the observed size would not fit above the reserve
+        controller.observe_job_rss(2 * GiB)
+        assert controller.decide(HostSample(0.2, 3 * GiB, 16 * GiB))[0] == 4
+        assert controller.decide(HostSample(0.2, 4 * GiB, 16 * GiB))[0] == 5
+    
+    @pytest.mark.asyncio
+    async def test_adjust_stays_within_bounds(self):
+        """Test adjustments never leave [minimum, maximum] and report changes only"""
+        controller = ConcurrencyController(AdaptiveLimit(1), minimum=1, maximum=8)
+        assert await controller.adjust(HostSample(4.0, 0, 16 * GiB)) is None
+        assert await controller.adjust(None) is None
+        
+        controller.limit.limit = 3
+        assert await controller.adjust(HostSample(4.0, 0, 16 * GiB)) == (3, 1, "load 4.00 per CPU")
+
+
+class TestRateLimiter:
+    """Test the RateLimiter class"""
+    
+    @pytest.mark.asyncio
+    async def test_limits_starts_per_period(self):
+        """Test starts beyond the limit wait for the window to move"""
+        limiter = RateLimiter(max_starts=2, period=0.2)
+        loop = asyncio.get_running_loop()
+        
+        started = loop.time()
+        await limiter.acquire()
+        await limiter.acquire()
+        assert loop.time() - started < 0.1
+        
+        await limiter.acquire()
+        assert loop.time() - started >= 0.15
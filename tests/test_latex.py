@@ -0,0 +1,41 @@
+"""Tests for pdflatex rerun detection"""
+from math_agent.services.latex import aux_state, needs_rerun
+
+
+class TestRerunDetection:
+    """Test aux_state and needs_rerun"""
+
+    def test_boilerplate_aux_needs_no_rerun(self, tmp_path):
+        """Test a fresh document without cross-references settles in one pass"""
+        before = aux_state(tmp_path)
+        (tmp_path / "solution.aux").write_text("\\relax \n\\gdef \\@abspage@last{1}\n")
+        assert not needs_rerun(before, aux_state(tmp_path), "Output written on solution.pdf")
+
+    def test_new_labels_need_rerun(self, tmp_path):
+        """Test labels written by a pass trigger another pass"""
+        before = aux_state(tmp_path)
+        (tmp_path / "solution.aux").write_text("\\relax \n\\newlabel{eq:1}{{1}{1}}\n")
+        after = aux_state(tmp_path)
+        assert needs_rerun(before, after, "")
+        # A pass that rewrites the same labels has settled
+        assert not needs_rerun(after, aux_state(tmp_path), "")
+
+    def test_toc_needs_rerun(self, tmp_path):
+        """Test a table of contents written by a pass triggers another pass"""
+        before = aux_state(tmp_path)
+        (tmp_path / "solution.toc").write_text("\\contentsline {section}{Proof}{1}\n")
+        assert needs_rerun(before, aux_state(tmp_path), "")
+
+    def test_log_requests_rerun(self, tmp_path):
+        """Test rerun requests in the log trigger another pass"""
+        state = aux_state(tmp_path)
+        log = "LaTeX Warning: Label(s) may have changed. Rerun to get cross-references right."
+        assert needs_rerun(state, state, log)
+
+    def test_undefined_references_rerun_only_on_aux_change(self, tmp_path):
+        """Test a broken \\ref does not use up every pass"""
+        log = "LaTeX Warning: There were undefined references."
+        state = aux_state(tmp_path)
+        assert not needs_rerun(state, state, log)
+        (tmp_path / "solution.aux").write_text("\\relax \n\\newlabel{eq:1}{{1}{1}}\n")
+        assert needs_rerun(state, aux_state(tmp_path), log)
@@ -0,0 +1,71 @@
+"""Tests for the live log publish/subscribe hub"""
+import pytest
+
+from math_agent.services.log_hub import LogHub
+
+
+class TestLogHub:
+    """Test the LogHub class"""
+    
+    @pytest.mark.asyncio
+    async def test_publish_reaches_subscribers_of_job(self):
+        """Test events are delivered only to subscribers of the same job"""
+        hub = LogHub()
+        sub_a = hub.subscribe("job-a")
+        sub_b = hub.subscribe("job-b")
+        
+        hub.publish_log("job-a", {"type": "message", "content": "hi"}, 42)
+        hub.publish_status("job-a", {"status": "running"})
+        hub.close("job-a")
+        
+        event = await sub_a.get(timeout=1)
+        assert event.event == "log"
+        assert event.data == [{"type": "message", "content": "hi"}]
+        assert event.offset == 42
+        assert (await sub_a.get(timeout=1)).data == {"status": "running"}
+        assert (await sub_a.get(timeout=1)).event == "end"
+        
+        assert await sub_b.get(timeout=0.01) is None
+    
+    @pytest.mark.asyncio
+    async def test_slow_subscriber_is_dropped(self):
+        """Test a full buffer drops the subscriber instead of blocking"""
+        hub = LogHub(buffer_size=2)
+        slow = hub.subscribe("job-a")
+        
+        for offset in range(5):
+            hub.publish_log("job-a", {"n": offset}, offset)
+        
+        assert slow.overflowed
+        assert hub.subscriber_count("job-a") == 0
+        
+        # Buffered events are still delivered, then the stream ends
+        assert (await slow.get(timeout=1)).offset == 0
+        assert (await slow.get(timeout=1)).offset == 1
+        end = await slow.get(timeout=1)
+        assert end.event == "end"
+        assert end.data["reason"] == "overflow"
+    
+    @pytest.mark.asyncio
+    async def test_new_subscriber_gets_unflushed_entries(self):
+        """Test entries not yet on disk are replayed to late subscribers"""
+        hub = LogHub()
+        hub.publish_log("job-a", {"n": 1}, 10)
+        hub.publish_log("job-a", {"n": 2}, 20)
+        hub.flushed("job-a", 10)
+        
+        subscription = hub.subscribe("job-a")
+        
+        event = await subscription.get(timeout=1)
+        assert event.data == [{"n": 2}]
+        assert await subscription.get(timeout=0.01) is None
+    
+    def test_unsubscribe(self):
+        """Test unsubscribing removes the subscriber"""
+        hub = LogHub()
+        subscription = hub.subscribe("job-a")
+        assert hub.subscriber_count("job-a") == 1
+        
+        hub.unsubscribe(subscription)
+        hub.unsubscribe(subscription)
+        assert hub.subscriber_count("job-a") == 0
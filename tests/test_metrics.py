@@ -0,0 +1,59 @@
+"""Tests for the Prometheus metrics registry"""
+import pytest
+
+from math_agent.core.metrics import Counter, Gauge, Histogram, Registry
+
+
+class TestMetrics:
+    """Test metric types and the text exposition format"""
+
+    def test_counter_and_gauge(self):
+        """Test labelled counters and gauges render one sample per label set"""
+        registry = Registry()
+        counter = Counter("lines_total", "Lines", registry=registry)
+        gauge = Gauge("queue_depth", "Depth", ["queue"], registry=registry)
+
+        counter.inc()
+        counter.inc(2)
+        gauge.set(3, queue="claude-opus-4")
+        gauge.inc(queue="compile")
+        gauge.dec(queue="compile")
+
+        assert registry.render() == (
+            "# HELP lines_total Lines\n"
+            "# TYPE lines_total counter\n"
+            "lines_total 3\n"
+            "# HELP queue_depth Depth\n"
+            "# TYPE queue_depth gauge\n"
+            'queue_depth{queue="claude-opus-4"} 3\n'
+            'queue_depth{queue="compile"} 0\n'
+        )
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Test histogram buckets, sum and count"""
+        registry = Registry()
+        histogram = Histogram("latency_seconds", "Latency", ["route"], buckets=[0.1, 1], registry=registry)
+
+        for value in [0.05, 0.5, 0.5, 2]:
+            histogram.observe(value, route="/jobs")
+
+        lines = registry.render().splitlines()
+        assert lines[2:] == [
+            'latency_seconds_bucket{route="/jobs",le="0.1"} 1',
+            'latency_seconds_bucket{route="/jobs",le="1"} 3',
+            'latency_seconds_bucket{route="/jobs",le="+Inf"} 4',
+            'latency_seconds_sum{route="/jobs"} 3.05',
+            'latency_seconds_count{route="/jobs"} 4',
+        ]
+
+    def test_label_names_are_checked(self):
+        """Test observations must use exactly the declared labels"""
+        gauge = Gauge("workers", "Workers", ["pool"], registry=Registry())
+        with pytest.raises(ValueError):
+            gauge.inc(model="x")
+
+    def test_label_values_are_escaped(self):
+        """Test quotes and backslashes in label values are escaped"""
+        registry = Registry()
+        Counter("errors_total", "Errors", ["message"], registry=registry).inc(message='say "hi"\\')
+        assert 'errors_total{message="say \\"hi\\"\\\\"} 1' in registry.render()
@@ -0,0 +1,69 @@
+"""Tests for the compiled PDF cache"""
+import os
+
+from math_agent.services.pdf_cache import PdfCache
+
+
+def make_workspace(path, tex="\\documentclass{article}"):
+    path.mkdir(parents=True)
+    (path / "solution.tex").write_text(tex)
+    (path / "prompt.md").write_text("prompt")
+    return path
+
+
+class TestPdfCache:
+    """Test the PdfCache class"""
+
+    def test_key_ignores_generated_and_unrelated_files(self, tmp_path):
+        """Test the key only depends on LaTeX inputs"""
+        cache = PdfCache(tmp_path / "cache")
+        workspace = make_workspace(tmp_path / "ws")
+        key = cache.key_for(workspace)
+
+        (workspace / "prompt.md").write_text("different prompt")
+        (workspace / "solution.aux").write_text("aux")
+        (workspace / "solution.log").write_text("log")
+        (workspace / "solution.pdf").write_bytes(b"%PDF")
+        assert cache.key_for(workspace) == key
+
+        (workspace / "figure.png").write_bytes(b"png")
+        assert cache.key_for(workspace) != key
+
+    def test_key_changes_with_tex(self, tmp_path):
+        """Test different sources get different keys"""
+        cache = PdfCache(tmp_path / "cache")
+        a = make_workspace(tmp_path / "a")
+        b = make_workspace(tmp_path / "b")
+        c = make_workspace(tmp_path / "c", tex="\\documentclass{book}")
+        assert cache.key_for(a) == cache.key_for(b)
+        assert cache.key_for(a) != cache.key_for(c)
+
+    def test_store_and_fetch(self, tmp_path):
+        """Test a stored PDF is placed into another workspace"""
+        cache = PdfCache(tmp_path / "cache")
+        pdf = tmp_path / "solution.pdf"
+        pdf.write_bytes(b"%PDF-1.5")
+        dest = tmp_path / "other.pdf"
+
+        assert cache.fetch("ab" * 32, dest) is False
+        cache.store("ab" * 32, pdf)
+        assert cache.fetch("ab" * 32, dest) is True
+        assert dest.read_bytes() == b"%PDF-1.5"
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        """Test the cache stays within its size limit"""
+        cache = PdfCache(tmp_path / "cache", max_bytes=250)
+        pdf = tmp_path / "solution.pdf"
+        pdf.write_bytes(b"x" * 100)
+
+        cache.store("aa" * 32, pdf)
+        cache.store("bb" * 32, pdf)
+        # Make the first entry the oldest, then use it so the second one is
+        os.utime(cache._entry("aa" * 32), (1, 1))
+        os.utime(cache._entry("bb" * 32), (0, 0))
+        assert cache.fetch("aa" * 32, tmp_path / "used.pdf")
+        cache.store("cc" * 32, pdf)
+
+        assert cache._entry("aa" * 32).exists()
+        assert not cache._entry("bb" * 32).exists()
+        assert cache._entry("cc" * 32).exists()
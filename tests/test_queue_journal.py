@@ -0,0 +1,39 @@
+"""Tests for the queue journal"""
+from math_agent.services.queue_journal import FINISHED, QUEUED, STARTED, QueueJournal
+
+
+class TestQueueJournal:
+    """Test the QueueJournal class"""
+
+    def test_replay_keeps_queue_order(self, tmp_path):
+        """Test replay returns waiting and started jobs in the order they were queued"""
+        journal = QueueJournal(tmp_path / ".queue.journal")
+        for name in ["a", "b", "c", "d"]:
+            journal.append(QUEUED, name)
+        journal.append(STARTED, "c")
+        journal.append(STARTED, "a")
+        journal.append(FINISHED, "a")
+        journal.append(QUEUED, "b")  # requeued: moves to the back
+        journal.close()
+
+        assert QueueJournal(tmp_path / ".queue.journal").replay() == (["d", "b"], ["c"])
+
+    def test_replay_skips_torn_lines(self, tmp_path):
+        """Test a line cut short by a crash is ignored"""
+        path = tmp_path / ".queue.journal"
+        path.write_text('{"event": "queued", "job": "a"}\n{"event": "queued", "jo')
+        assert QueueJournal(path).replay() == (["a"], [])
+        assert QueueJournal(tmp_path / "missing").replay() == ([], [])
+
+    def test_rewrite_compacts(self, tmp_path):
+        """Test rewriting leaves only the given queue and appending continues after it"""
+        journal = QueueJournal(tmp_path / ".queue.journal")
+        for name in ["a", "b"]:
+            journal.append(QUEUED, name)
+            journal.append(STARTED, name)
+        journal.rewrite(["b", "c"])
+        journal.append(QUEUED, "d")
+        journal.close()
+
+        assert len((tmp_path / ".queue.journal").read_text().splitlines()) == 3
+        assert journal.replay() == (["b", "c", "d"], [])
@@ -0,0 +1,52 @@
+"""Tests for subprocess resource accounting"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+from math_agent.services.resources import ProcessMonitor, merge_usage, summarize_usage
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(not os.path.exists("/proc/self/stat"), reason="needs /proc")
+async def test_monitor_samples_subprocess():
+    """Test CPU time and peak RSS of a running subprocess are recorded"""
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, "-c", "import time\nend = time.process_time() + 0.3\nwhile time.process_time() < end: pass"
+    )
+    monitor = ProcessMonitor(process.pid, interval=0.05)
+    monitor.start()
+    await process.wait()
+    usage = await monitor.stop()
+    
+    assert usage["wallSeconds"] >= 0.2
+    assert usage["cpuUserSeconds"] + usage["cpuSystemSeconds"] > 0
+    assert usage["maxRssBytes"] > 0
+
+
+@pytest.mark.asyncio
+async def test_monitor_of_vanished_process_records_wall_time():
+    """Test a process that is already gone only gets wall time"""
+    process = await asyncio.create_subprocess_exec(sys.executable, "-c", "pass")
+    await process.wait()
+    monitor = ProcessMonitor(process.pid, interval=0.05)
+    monitor.start()
+    assert list(await monitor.stop()) == ["wallSeconds"]
+
+
+def test_merge_and_summarize_usage():
+    """Test passes of one phase add up and peak RSS is the maximum"""
+    first = {"wallSeconds": 1.0, "cpuUserSeconds": 0.5, "maxRssBytes": 300}
+    second = {"wallSeconds": 2.0, "cpuUserSeconds": 0.25, "maxRssBytes": 200}
+    merged = merge_usage(merge_usage(None, first), second)
+    assert merged == {"wallSeconds": 3.0, "cpuUserSeconds": 0.75, "maxRssBytes": 300}
+    
+    summary = summarize_usage({
+        "a": {"exercise": "ex1", "resources": {"compile": merged}},
+        "b": {"exercise": "ex1", "resources": {"compile": first}},
+        "c": {"exercise": "ex2"},
+    }, group_by="exercise")
+    assert list(summary) == ["ex1"]
+    assert summary["ex1"]["compile"]["jobs"] == 2
+    assert summary["ex1"]["compile"]["meanCpuSeconds"] == 0.62
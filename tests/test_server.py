@@ -1,7 +1,10 @@
 """Tests for the FastAPI server endpoints"""
 import json
+from unittest.mock import patch
 import pytest
 
+from math_agent.services.blob_store import digest_bytes
+
 
 def test_import_app():
     """Test that we can import the app"""
@@ -39,6 +42,144 @@ def test_jobs_list_endpoint(client, test_dirs):
     assert jobs["test-job"]["status"] == "completed"
 
 
+def test_jobs_list_filters_and_pages(client, test_dirs):
+    """Test filtering, sorting, pagination and projection of the job list"""
+    for i, (status, model) in enumerate([
+        ("completed", "claude-opus-4"),
+        ("error", "claude-opus-4"),
+        ("completed", "gemini-2.5-pro"),
+        ("completed", "claude-opus-4"),
+    ]):
+        job_dir = test_dirs["jobs"] / f"job-{i}"
+        job_dir.mkdir()
+        (job_dir / "status.json").write_text(json.dumps({
+            "status": status,
+            "model": model,
+            "exercise": "test_course/test_ex_01",
+            "createdAt": f"2024-01-0{i + 1}T00:00:00Z"
+        }))
+    
+    response = client.get("/jobs", params={"status": "completed", "model": "claude-opus-4"})
+    assert list(response.json()) == ["job-3", "job-0"]
+    assert response.headers["X-Total-Count"] == "2"
+    
+    response = client.get("/jobs", params={"sort": "createdAt", "limit": 2, "offset": 1, "fields": "status"})
+    assert response.json() == {"job-1": {"status": "error"}, "job-2": {"status": "completed"}}
+    assert response.headers["X-Total-Count"] == "4"
+    
+    response = client.get("/jobs", params={"created_after": "2024-01-02", "created_before": "2024-01-04"})
+    assert sorted(response.json()) == ["job-1", "job-2"]
+    
+    assert client.get("/jobs", params={"sort": "data"}).status_code == 400
+
+
+def test_job_changes_feed(client, test_dirs):
+    """Test the change feed returns only jobs changed since the last sequence number"""
+    for name in ["job-a", "job-b"]:
+        job_dir = test_dirs["jobs"] / name
+        job_dir.mkdir()
+        (job_dir / "status.json").write_text(json.dumps({"status": "completed", "model": "m"}))
+    
+    data = client.get("/jobs/changes", params={"since": 0, "fields": "status"}).json()
+    assert data["changes"] == {"job-a": {"status": "completed"}, "job-b": {"status": "completed"}}
+    assert data["reset"] is False
+    seq = data["seq"]
+    
+    # Nothing changed
+    data = client.get("/jobs/changes", params={"since": seq}).json()
+    assert data == {"seq": seq, "reset": False, "changes": {}}
+    
+    # A job is created through the API
+    response = client.post("/jobs/create", json={
+        "name": "job-c",
+        "model": "claude-opus-4",
+        "exercise": "test_course/test_ex_01",
+        "prompt": "Solve it"
+    })
+    assert response.status_code == 200
+    data = client.get("/jobs/changes", params={"since": seq}).json()
+    assert list(data["changes"]) == ["job-c"]
+    assert data["seq"] > seq
+    
+    # A sequence number from before a catalog rebuild resets the client
+    data = client.get("/jobs/changes", params={"since": data["seq"] + 100}).json()
+    assert data["reset"] is True
+    assert set(data["changes"]) == {"job-a", "job-b", "job-c"}
+
+
+def test_jobs_list_etag(client, test_dirs):
+    """Test an unchanged job list is answered with 304"""
+    job_dir = test_dirs["jobs"] / "test-job"
+    job_dir.mkdir()
+    (job_dir / "status.json").write_text(json.dumps({"status": "setup"}))
+    
+    response = client.get("/jobs")
+    etag = response.headers["ETag"]
+    assert etag.startswith('W/"')
+    
+    response = client.get("/jobs", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    
+    # A different query of the same catalog state gets its own tag
+    response = client.get("/jobs", params={"status": "completed"}, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json() == {}
+    assert response.headers["ETag"] != etag
+    # Equivalent queries share one
+    filtered = response.headers["ETag"]
+    response = client.get("/jobs", params={"status": "completed,completed"}, headers={"If-None-Match": filtered})
+    assert response.status_code == 304
+    
+    # A job created through the API invalidates the tag
+    client.post("/jobs/create", json={
+        "name": "new-job",
+        "model": "claude-opus-4",
+        "exercise": "test_course/test_ex_01",
+        "prompt": "Solve it"
+    })
+    response = client.get("/jobs", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert set(response.json()) == {"test-job", "new-job"}
+
+
+def test_resource_usage_per_model(client, test_dirs):
+    """Test resource usage is aggregated per model"""
+    usage = {"wallSeconds": 10, "cpuUserSeconds": 3, "cpuSystemSeconds": 1,
+             "maxRssBytes": 100, "readBytes": 5, "writeBytes": 7}
+    for i, model in enumerate(["claude-opus-4", "claude-opus-4", "gemini-2.5-pro"]):
+        job_dir = test_dirs["jobs"] / f"job-{i}"
+        job_dir.mkdir()
+        (job_dir / "status.json").write_text(json.dumps({
+            "status": "completed",
+            "model": model,
+            "resources": {"agent": dict(usage, maxRssBytes=100 * (i + 1))}
+        }))
+    
+    response = client.get("/jobs/resources")
+    assert response.status_code == 200
+    groups = response.json()["groups"]
+    assert sorted(groups) == ["claude-opus-4", "gemini-2.5-pro"]
+    agent = groups["claude-opus-4"]["agent"]
+    assert agent["jobs"] == 2
+    assert agent["cpuSeconds"] == 8
+    assert agent["meanWallSeconds"] == 10
+    assert agent["maxRssBytes"] == 200
+    assert agent["writeBytes"] == 14
+    
+    assert client.get("/jobs/resources", params={"group_by": "data"}).status_code == 422
+
+
+def test_metrics_endpoint(client):
+    """Test metrics are exposed in the Prometheus text format"""
+    client.get("/jobs")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "# TYPE math_agent_queue_depth gauge" in response.text
+    assert "# TYPE math_agent_http_request_duration_seconds histogram" in response.text
+
+
 def test_models_endpoint(client):
     """Test getting available models"""
     response = client.get("/data/models")
@@ -59,6 +200,28 @@ def test_exercises_endpoint(client):
     assert "test_course/test_ex_01" in exercises
 
 
+def test_exercises_filter_and_details(client, test_dirs):
+    """Test filtering exercises by course and sheet and listing their metadata"""
+    other_course = test_dirs["exercises"] / "other_course"
+    other_course.mkdir()
+    (other_course / "sheet_02_ex_01.tex").write_text("Sheet 2")
+    (other_course / "sheet_03_ex_01.tex").write_text("Sheet 3")
+    
+    assert client.get("/data/exercises", params={"course": "other_course"}).json() == [
+        "other_course/sheet_02_ex_01", "other_course/sheet_03_ex_01",
+    ]
+    response = client.get("/data/exercises", params={"sheet": 2, "details": True})
+    assert response.json() == [{
+        "id": "other_course/sheet_02_ex_01",
+        "course": "other_course",
+        "name": "sheet_02_ex_01",
+        "sheet": 2,
+        "number": 1,
+        "digest": digest_bytes(b"Sheet 2"),
+        "size": 7,
+    }]
+
+
 def test_prompts_endpoint(client):
     """Test listing prompts"""
     response = client.get("/data/prompts")
@@ -99,6 +262,145 @@ def test_get_job_details(client, test_dirs):
     assert data["log"][0]["content"] == "Job started"
 
 
+def test_get_job_details_since_cursor(client, test_dirs):
+    """Test polling the log incrementally with a byte-offset cursor"""
+    job_dir = test_dirs["jobs"] / "test-job"
+    job_dir.mkdir()
+    (job_dir / "status.json").write_text(json.dumps({"status": "running"}))
+    log_file = job_dir / "log.jsonl"
+    log_file.write_text(json.dumps({"type": "system", "content": "first"}) + "\n")
+    
+    data = client.get("/jobs/test-job").json()
+    assert [e["content"] for e in data["log"]] == ["first"]
+    cursor = data["cursor"]
+    assert cursor == log_file.stat().st_size
+    
+    # Nothing new since the cursor
+    data = client.get(f"/jobs/test-job?since={cursor}").json()
+    assert data["log"] == []
+    assert data["cursor"] == cursor
+    
+    # A complete line and a partially written one are appended
+    with open(log_file, "a") as f:
+        f.write(json.dumps({"type": "system", "content": "second"}) + "\n")
+        f.write('{"type": "system", "con')
+    
+    data = client.get(f"/jobs/test-job?since={cursor}").json()
+    assert [e["content"] for e in data["log"]] == ["second"]
+    assert data["reset"] is False
+    
+    # The partial line is returned once it is complete
+    with open(log_file, "a") as f:
+        f.write('tent": "third"}\n')
+    
+    data = client.get(f"/jobs/test-job?since={data['cursor']}").json()
+    assert [e["content"] for e in data["log"]] == ["third"]
+    assert data["cursor"] == log_file.stat().st_size
+
+
+def test_get_job_details_cursor_past_end_resets(client, test_dirs):
+    """Test a cursor beyond the end of the log restarts from the beginning"""
+    job_dir = test_dirs["jobs"] / "test-job"
+    job_dir.mkdir()
+    (job_dir / "status.json").write_text(json.dumps({"status": "running"}))
+    (job_dir / "log.jsonl").write_text(json.dumps({"type": "system", "content": "only"}) + "\n")
+    
+    data = client.get("/jobs/test-job?since=100000").json()
+    assert data["reset"] is True
+    assert [e["content"] for e in data["log"]] == ["only"]
+
+
+def test_get_job_details_etag(client, test_dirs):
+    """Test an unchanged job is answered with 304 until its log grows"""
+    job_dir = test_dirs["jobs"] / "etag-job"
+    job_dir.mkdir()
+    (job_dir / "status.json").write_text(json.dumps({"status": "running"}))
+    log_file = job_dir / "log.jsonl"
+    log_file.write_text(json.dumps({"type": "system", "content": "a"}) + "\n")
+    
+    response = client.get("/jobs/etag-job")
+    etag = response.headers["ETag"]
+    cursor = response.json()["cursor"]
+    
+    with patch("math_agent.api.routes.jobs.read_log_entries") as mock_read:
+        response = client.get("/jobs/etag-job", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    mock_read.assert_not_called()
+    
+    # Another cursor is another representation
+    response = client.get(f"/jobs/etag-job?since={cursor}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    
+    with open(log_file, "a") as f:
+        f.write(json.dumps({"type": "system", "content": "b"}) + "\n")
+    response = client.get(f"/jobs/etag-job?since={cursor}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert [entry["content"] for entry in response.json()["log"]] == ["b"]
+
+
+def test_archived_log(client, test_dirs):
+    """Test archived logs are served transparently"""
+    from math_agent.services.job_log import archive_log
+    
+    job_dir = test_dirs["jobs"] / "archived-job"
+    job_dir.mkdir()
+    (job_dir / "status.json").write_text(json.dumps({"status": "completed"}))
+    log_text = "".join(json.dumps({"type": "system", "content": str(i)}) + "\n" for i in range(20))
+    (job_dir / "log.jsonl").write_text(log_text)
+    archive_log(job_dir / "log.jsonl")
+    
+    response = client.get("/jobs/archived-job")
+    assert [entry["content"] for entry in response.json()["log"]] == [str(i) for i in range(20)]
+    
+    # Clients without gzip support get the plain log
+    response = client.get("/jobfiles/archived-job/log.jsonl", headers={"Accept-Encoding": "identity"})
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+    assert response.text == log_text
+    response = client.get("/jobfiles/archived-job/log.jsonl", headers={"Accept-Encoding": "gzip;q=0, identity"})
+    assert "content-encoding" not in response.headers
+    assert response.text == log_text
+    
+    # Others get the archive as-is
+    response = client.get("/jobfiles/archived-job/log.jsonl", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.text == log_text  # decoded by the client
+    
+    assert client.get("/jobfiles/missing-job/log.jsonl").status_code == 404
+
+
+def test_stream_finished_job(client, test_dirs):
+    """Test the event stream sends status and existing log, then ends"""
+    job_dir = test_dirs["jobs"] / "done-job"
+    job_dir.mkdir()
+    (job_dir / "status.json").write_text(json.dumps({"status": "completed"}))
+    log_file = job_dir / "log.jsonl"
+    log_file.write_text(
+        json.dumps({"type": "system", "content": "first"}) + "\n" +
+        json.dumps({"type": "system", "content": "second"}) + "\n"
+    )
+    first_line_end = len(json.dumps({"type": "system", "content": "first"})) + 1
+    
+    response = client.get("/jobs/done-job/stream", headers={"Last-Event-ID": str(first_line_end)})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    
+    events = [block.split("\n") for block in response.text.strip().split("\n\n")]
+    assert [lines[0] for lines in events] == ["event: status", "event: log", "event: end"]
+    
+    log_event = events[1]
+    assert log_event[1] == f"id: {log_file.stat().st_size}"
+    entries = json.loads(log_event[2][len("data: "):])
+    assert [e["content"] for e in entries] == ["second"]
+
+
+def test_stream_nonexistent_job(client):
+    """Test streaming a job that doesn't exist"""
+    response = client.get("/jobs/nonexistent/stream")
+    assert response.status_code == 404
+
+
 def test_get_nonexistent_job(client):
     """Test getting details for a job that doesn't exist"""
     response = client.get("/jobs/nonexistent")
@@ -152,6 +454,57 @@ def test_create_job(client, mock_job_manager):
     
     # Verify job manager was called
     mock_job_manager.submit_job.assert_called_once_with("test-new-job")
+    
+    # Inputs are recorded by content hash
+    status = client.get("/jobs/test-new-job").json()["status"]
+    assert sorted(status["inputs"]) == ["prompt.md", "test_ex_01.tex"]
+
+
+def test_create_job_upload(client, test_dirs, mock_job_manager, monkeypatch):
+    """Test creating a job with attachments streamed as multipart/form-data"""
+    fields = {
+        "name": "upload-job",
+        "model": "claude-opus-4",
+        "exercise": "test_course/test_ex_01",
+        "prompt": "@test_prompt",
+    }
+    response = client.post("/jobs/upload", data=fields, files={"files": ("data.csv", b"a,b\n1,2\n")})
+    assert response.status_code == 200
+    mock_job_manager.submit_job.assert_called_once_with("upload-job")
+    
+    workspace_dir = test_dirs["jobs"] / "upload-job" / "workspace"
+    assert (workspace_dir / "data.csv").read_bytes() == b"a,b\n1,2\n"
+    assert (workspace_dir / "prompt.md").read_text() == "Test prompt content"
+    # The agent may edit attachments, but only reads the exercise and prompt
+    assert (workspace_dir / "data.csv").stat().st_mode & 0o200
+    assert (workspace_dir / "prompt.md").stat().st_mode & 0o222 == 0
+    assert (workspace_dir / "test_ex_01.tex").stat().st_mode & 0o222 == 0
+    status = json.loads((test_dirs["jobs"] / "upload-job" / "status.json").read_text())
+    assert sorted(status["inputs"]) == ["data.csv", "prompt.md", "test_ex_01.tex"]
+    
+    # A taken name is rejected before the attachment is stored
+    response = client.post("/jobs/upload", data=fields, files={"files": ("other.csv", b"other")})
+    assert response.status_code == 409
+    
+    monkeypatch.setattr("math_agent.api.routes.jobs.MAX_UPLOAD_FILE_BYTES", 4)
+    response = client.post("/jobs/upload", data=dict(fields, name="big-job"), files={"files": ("big.bin", b"12345")})
+    assert response.status_code == 413
+    assert not (test_dirs["jobs"] / "big-job").exists()
+    
+    blobs = [p for p in (test_dirs["jobs"] / ".blobs").rglob("*") if p.is_file()]
+    assert len(blobs) == 3
+    
+    assert client.post("/jobs/upload", json=fields).status_code == 400
+    assert client.post("/jobs/upload", data={"name": "no-model"}, files={"files": ("x", b"x")}).status_code == 422
+    response = client.post("/jobs/upload", data=dict(fields, name="bad-exercise", exercise="test_course/missing"),
+                           files={"files": ("y", b"y")})
+    assert response.status_code == 404
+    
+    # An empty file input is skipped
+    response = client.post("/jobs/upload", data=dict(fields, name="no-files"), files={"files": ("", b"")})
+    assert response.status_code == 200
+    status = json.loads((test_dirs["jobs"] / "no-files" / "status.json").read_text())
+    assert sorted(status["inputs"]) == ["prompt.md", "test_ex_01.tex"]
 
 
 def test_create_job_duplicate_name(client, test_dirs):
@@ -174,6 +527,23 @@ def test_create_job_duplicate_name(client, test_dirs):
     assert "Job already exists" in response.json()["detail"]
 
 
+@pytest.mark.parametrize("name", ["batch", "changes", "resources", "sweeps"])
+def test_create_job_reserved_name(client, test_dirs, name):
+    """Test names of collection routes are rejected, as /jobs/{name} would not reach the job"""
+    job_data = {
+        "name": name,
+        "model": "claude-opus-4",
+        "exercise": "test_course/test_ex_01",
+        "prompt": "Test prompt",
+        "disallowedTools": "",
+        "additionalFiles": {}
+    }
+    
+    response = client.post("/jobs/create", json=job_data)
+    assert response.status_code == 400
+    assert not (test_dirs["jobs"] / name).exists()
+
+
 def test_cancel_job(client, test_dirs, mock_job_manager):
     """Test cancelling a running job"""
     # Create a running job
@@ -208,4 +578,124 @@ def test_cancel_completed_job(client, test_dirs):
     
     response = client.post("/jobs/completed-job/cancel")
     assert response.status_code == 400
-    assert "Cannot cancel job in completed state" in response.json()["detail"]
\ No newline at end of file
+    assert "Cannot cancel job in completed state" in response.json()["detail"]
+
+def test_create_batch(client, test_dirs, mock_job_manager):
+    """Test creating a sweep expands the matrix and queues all jobs"""
+    batch_data = {
+        "models": ["claude-opus-4", "gemini-2.5-pro"],
+        "exercises": ["test_course/test_ex_01"],
+        "prompts": ["@test_prompt", "Inline prompt"],
+        "replicates": 2,
+        "sweep": "sweep-1"
+    }
+    
+    response = client.post("/jobs/batch", json=batch_data)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["sweep"] == "sweep-1"
+    assert len(data["job_names"]) == 8
+    assert "sweep-1-claude-opus-4-test_ex_01-test_prompt-r1" in data["job_names"]
+    assert "sweep-1-gemini-2.5-pro-test_ex_01-p2-r2" in data["job_names"]
+    
+    job_dir = test_dirs["jobs"] / "sweep-1-claude-opus-4-test_ex_01-test_prompt-r2"
+    assert (job_dir / "workspace" / "prompt.md").read_text() == "Test prompt content"
+    assert (job_dir / "workspace" / "test_ex_01.tex").exists()
+    status = json.loads((job_dir / "status.json").read_text())
+    assert status["status"] == "setup"
+    assert status["sweep"] == "sweep-1"
+    
+    # Inputs are stored once and shared by every workspace
+    other_dir = test_dirs["jobs"] / "sweep-1-gemini-2.5-pro-test_ex_01-test_prompt-r1"
+    other_status = json.loads((other_dir / "status.json").read_text())
+    assert other_status["inputs"] == status["inputs"]
+    assert status["inputs"]["prompt.md"].startswith("sha256:")
+    blobs = [p for p in (test_dirs["jobs"] / ".blobs").rglob("*") if p.is_file()]
+    assert len(blobs) == 3
+    assert ".blobs" not in client.get("/jobs").json()
+    
+    mock_job_manager.submit_jobs.assert_called_once_with(data["job_names"])
+    
+    # The sweep can be queried as a group
+    response = client.get("/jobs/sweeps/sweep-1")
+    assert response.status_code == 200
+    assert response.json()["counts"] == {"setup": 8}
+
+
+def test_create_batch_conflict_creates_nothing(client, test_dirs):
+    """Test a batch with an existing job name is rejected as a whole"""
+    (test_dirs["jobs"] / "s-claude-opus-4-test_ex_01-p1-r1").mkdir()
+    batch_data = {
+        "models": ["claude-opus-4"],
+        "exercises": ["test_course/test_ex_01"],
+        "prompts": ["Prompt"],
+        "replicates": 2,
+        "sweep": "s"
+    }
+    
+    response = client.post("/jobs/batch", json=batch_data)
+    assert response.status_code == 409
+    assert not (test_dirs["jobs"] / "s-claude-opus-4-test_ex_01-p1-r2").exists()
+
+
+def test_create_batch_concurrent_conflict_rolls_back(client, test_dirs, monkeypatch):
+    """Test a job created concurrently during a batch write undoes the batch"""
+    import math_agent.api.routes.jobs as jobs_routes
+    link_inputs = jobs_routes._link_inputs
+    
+    def link_then_collide(workspace_dir, inputs):
+        link_inputs(workspace_dir, inputs)
+        (test_dirs["jobs"] / "s-claude-opus-4-test_ex_01-p1-r2").mkdir(exist_ok=True)
+    
+    monkeypatch.setattr(jobs_routes, "_link_inputs", link_then_collide)
+    response = client.post("/jobs/batch", json={
+        "models": ["claude-opus-4"],
+        "exercises": ["test_course/test_ex_01"],
+        "prompts": ["Prompt"],
+        "replicates": 2,
+        "sweep": "s"
+    })
+    assert response.status_code == 409
+    assert "s-claude-opus-4-test_ex_01-p1-r2" in response.json()["detail"]
+    assert not (test_dirs["jobs"] / "s-claude-opus-4-test_ex_01-p1-r1").exists()
+
+
+def test_create_batch_duplicate_names(client):
+    """Test a template that maps several jobs to one name is rejected"""
+    batch_data = {
+        "models": ["claude-opus-4"],
+        "exercises": ["test_course/test_ex_01"],
+        "prompts": ["Prompt"],
+        "replicates": 2,
+        "nameTemplate": "{sweep}-{model}"
+    }
+    
+    response = client.post("/jobs/batch", json=batch_data)
+    assert response.status_code == 400
+    assert "duplicate" in response.json()["detail"]
+
+
+def test_cancel_sweep(client, mock_job_manager):
+    """Test cancelling a sweep cancels its unfinished jobs"""
+    mock_job_manager.cancel_job.return_value = False
+    batch_data = {
+        "models": ["claude-opus-4"],
+        "exercises": ["test_course/test_ex_01"],
+        "prompts": ["Prompt"],
+        "replicates": 3,
+        "sweep": "sweep-c"
+    }
+    names = client.post("/jobs/batch", json=batch_data).json()["job_names"]
+    
+    response = client.post("/jobs/sweeps/sweep-c/cancel")
+    assert response.status_code == 200
+    assert sorted(response.json()["cancelled"]) == sorted(names)
+    
+    counts = client.get("/jobs/sweeps/sweep-c").json()["counts"]
+    assert counts == {"cancelled": 3}
+
+
+def test_get_unknown_sweep(client):
+    """Test querying a sweep that doesn't exist"""
+    response = client.get("/jobs/sweeps/nope")
+    assert response.status_code == 404
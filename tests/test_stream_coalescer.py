@@ -0,0 +1,92 @@
+"""Tests for stream-json event coalescing"""
+from math_agent.services.stream_coalescer import StreamCoalescer
+
+
+def feed_all(events):
+    coalescer = StreamCoalescer()
+    records = []
+    for event in events:
+        records.extend(coalescer.feed(event))
+    records.extend(coalescer.flush())
+    return coalescer, records
+
+
+def strip_timestamps(records):
+    return [{k: v for k, v in record.items() if k != "timestamp"} for record in records]
+
+
+class TestStreamCoalescer:
+    """Test the StreamCoalescer class"""
+
+    def test_merges_text_deltas(self):
+        """Test delta events become one message per role"""
+        coalescer, records = feed_all([
+            {"type": "init", "session_id": "s"},
+            {"type": "message", "role": "assistant", "content": "Let ", "delta": True},
+            {"type": "message", "role": "assistant", "content": "me ", "delta": True},
+            {"type": "message", "role": "assistant", "content": "think.", "delta": True},
+            {"type": "tool_use", "tool_name": "Read", "tool_id": "t1", "parameters": {"file_path": "a.tex"}},
+            {"type": "tool_result", "tool_id": "t1", "status": "success", "output": "content"},
+            {"type": "message", "role": "assistant", "content": "Done", "delta": True},
+        ])
+
+        assert strip_timestamps(records) == [
+            {"type": "init", "session_id": "s"},
+            {"type": "message", "role": "assistant", "content": "Let me think."},
+            {"type": "tool_use", "tool": "Read", "id": "t1", "input": {"file_path": "a.tex"}},
+            {"type": "tool_result", "tool_use_id": "t1", "content": "content", "is_error": False},
+            {"type": "message", "role": "assistant", "content": "Done"},
+        ]
+        assert coalescer.events == 7
+        assert coalescer.records == 5
+
+    def test_unwraps_message_envelopes(self):
+        """Test assistant and user envelopes become message, tool call and tool result records"""
+        _, records = feed_all([
+            {"type": "stream_event", "event": {"type": "message_start", "message": {"id": "m1"}}},
+            {"type": "stream_event", "event": {"type": "content_block_delta", "delta": {"type": "text_delta", "text": "Writ"}}},
+            {"type": "assistant", "message": {"id": "m1", "content": [
+                {"type": "text", "text": "Writing the solution."},
+                {"type": "tool_use", "id": "t1", "name": "Write", "input": {"file_path": "solution.tex"}},
+            ]}},
+            {"type": "user", "message": {"content": [
+                {"type": "tool_result", "tool_use_id": "t1", "content": [{"type": "text", "text": "ok"}]},
+            ]}},
+            {"type": "result", "subtype": "success"},
+        ])
+
+        assert strip_timestamps(records) == [
+            {"type": "message", "role": "assistant", "content": "Writing the solution."},
+            {"type": "tool_use", "tool": "Write", "id": "t1", "input": {"file_path": "solution.tex"}},
+            {"type": "tool_result", "tool_use_id": "t1", "content": "ok", "is_error": False},
+            {"type": "result", "subtype": "success"},
+        ]
+
+    def test_keeps_unfinished_partial_message(self):
+        """Test partial text is kept if the stream ends before the full message"""
+        _, records = feed_all([
+            {"type": "stream_event", "event": {"type": "message_start", "message": {"id": "m1"}}},
+            {"type": "stream_event", "event": {"type": "content_block_delta", "delta": {"type": "text_delta", "text": "Half a "}}},
+            {"type": "stream_event", "event": {"type": "content_block_delta", "delta": {"type": "text_delta", "text": "thought"}}},
+        ])
+
+        assert strip_timestamps(records) == [
+            {"type": "message", "role": "assistant", "content": "Half a thought", "partial": True},
+        ]
+
+    def test_malformed_content_blocks(self):
+        """Test blocks and contents of unexpected shapes are logged, not fatal"""
+        _, records = feed_all([
+            {"type": "assistant", "message": {"content": ["oops", {"type": "text", "text": "fine"}]}},
+            {"type": "user", "message": {"content": [42, {"type": "text", "text": "hi"}]}},
+            {"type": "assistant", "message": {"id": ["m1"], "content": {"text": "not a list"}}},
+            {"type": "stream_event", "event": {"type": "message_start", "message": "m2"}},
+            {"type": "stream_event", "event": "garbage"},
+        ])
+
+        assert strip_timestamps(records) == [
+            {"type": "message", "role": "assistant", "content": '"oops"'},
+            {"type": "message", "role": "assistant", "content": "fine"},
+            {"type": "message", "role": "user", "content": "hi"},
+            {"type": "assistant", "message": {"id": ["m1"], "content": {"text": "not a list"}}},
+        ]
@@ -0,0 +1,87 @@
+"""Tests for streaming multipart uploads"""
+import pytest
+
+from math_agent.services.blob_store import BlobStore, digest_bytes
+from math_agent.services.upload import MultipartUpload, UploadError, UploadTooLarge
+
+BOUNDARY = "----boundary"
+
+
+def multipart_body(fields, files):
+    """Encode form fields and (filename, content) files as multipart/form-data"""
+    body = b""
+    for name, value in fields.items():
+        body += (f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"{name}\"\r\n\r\n{value}\r\n").encode()
+    for filename, content in files:
+        body += (f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"files\"; filename=\"{filename}\"\r\n"
+                 "Content-Type: application/octet-stream\r\n\r\n").encode() + content + b"\r\n"
+    return body + f"--{BOUNDARY}--\r\n".encode()
+
+
+def feed(upload, body, chunk_size):
+    for i in range(0, len(body), chunk_size):
+        upload.feed(body[i:i + chunk_size])
+    upload.finish()
+
+
+class TestMultipartUpload:
+    """Test the MultipartUpload class"""
+
+    def test_streams_files_into_blob_store(self, tmp_path):
+        """Test fields and files survive arbitrary chunk boundaries"""
+        store = BlobStore(tmp_path / ".blobs")
+        content = bytes(range(256)) * 40
+        seen = []
+        upload = MultipartUpload(f"multipart/form-data; boundary={BOUNDARY}", store,
+                                 on_field=lambda name, value: seen.append(name))
+        feed(upload, multipart_body({"name": "job", "prompt": "Prove it"},
+                                    [("data.bin", content), ("notes.txt", b"notes")]), chunk_size=7)
+
+        assert upload.fields == {"name": "job", "prompt": "Prove it"}
+        assert seen == ["name", "prompt"]
+        assert upload.files == {"data.bin": digest_bytes(content), "notes.txt": digest_bytes(b"notes")}
+        assert store.path(upload.files["data.bin"]).read_bytes() == content
+
+    def test_limits(self, tmp_path):
+        """Test oversized files and bodies are rejected while streaming"""
+        store = BlobStore(tmp_path / ".blobs")
+        body = multipart_body({}, [("big.bin", b"x" * 100)])
+
+        upload = MultipartUpload(f"multipart/form-data; boundary={BOUNDARY}", store, max_file_bytes=50)
+        with pytest.raises(UploadTooLarge):
+            feed(upload, body, chunk_size=16)
+        upload.abort()
+        assert [p for p in store.root.rglob("*") if p.is_file()] == []
+
+        upload = MultipartUpload(f"multipart/form-data; boundary={BOUNDARY}", store, max_bytes=len(body) - 1)
+        with pytest.raises(UploadTooLarge):
+            feed(upload, body, chunk_size=16)
+        upload.abort()
+
+    def test_rejects_malformed_uploads(self, tmp_path):
+        """Test hidden filenames and non-multipart bodies are refused"""
+        store = BlobStore(tmp_path / ".blobs")
+        with pytest.raises(UploadError):
+            MultipartUpload("application/json", store)
+
+        upload = MultipartUpload(f"multipart/form-data; boundary={BOUNDARY}", store)
+        with pytest.raises(UploadError):
+            feed(upload, multipart_body({}, [(".bashrc", b"x")]), chunk_size=1024)
+
+    def test_skips_empty_file_inputs(self, tmp_path):
+        """Test a file input left empty is ignored rather than rejected"""
+        store = BlobStore(tmp_path / ".blobs")
+        upload = MultipartUpload(f"multipart/form-data; boundary={BOUNDARY}", store)
+        feed(upload, multipart_body({"name": "job"}, [("", b""), ("notes.txt", b"notes")]), chunk_size=5)
+
+        assert upload.fields == {"name": "job"}
+        assert upload.files == {"notes.txt": digest_bytes(b"notes")}
+
+    def test_abort_keeps_stored_blobs(self, tmp_path):
+        """Test aborting leaves stored parts, which another job may share, to garbage collection"""
+        store = BlobStore(tmp_path / ".blobs")
+        upload = MultipartUpload(f"multipart/form-data; boundary={BOUNDARY}", store)
+        feed(upload, multipart_body({}, [("a.txt", b"shared")]), chunk_size=1024)
+
+        upload.abort()
+        assert store.path(digest_bytes(b"shared")).exists()